@@ -0,0 +1,456 @@
+# agent/checkpoint.py
+"""
+Persistent LangGraph checkpoints on local SQLite, keyed by run ID (thread_id).
+
+  SqliteSaver        BaseCheckpointSaver over one SQLite file. Every value is
+                     serialised with the graph's serde and zlib-compressed;
+                     strings of TEXT_MIN chars or more (page text, drafts) are
+                     stored once in a content-addressed `texts` table and
+                     referenced by hash, so the docs list that every node passes
+                     along (and every pending write of it) costs a few bytes
+                     after the first copy.
+  prepare_run()      config + input for a new run. A finished, undegraded
+                     search/fetch of the same question (depth + normalised
+                     query, younger than CHECKPOINT_REUSE_TTL) is forked into the
+                     new run, which then only re-runs the writer.
+  resume_run()       config + input continuing a failed/interrupted run from its
+                     last completed node (with a fresh deadline if it had a budget).
+
+Knobs:
+  CHECKPOINT_DB=<CACHE_DIR>/checkpoints.sqlite
+  CHECKPOINT_REUSE_TTL=21600   seconds a stored search/fetch stays reusable
+  CHECKPOINT_KEEP_DAYS=7       runs untouched for longer are pruned on open
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from tools.deadline import Deadline
+from tools.diskcache import cache_dir
+from tools.search import normalize_query
+
+TEXT_MIN = 256
+_REF = "$text"
+
+# State carried over when a new run reuses an earlier run's search and fetch.
+REUSED_KEYS = ("query", "depth", "subtasks", "search_results", "docs", "fetch_stats")
+# Degradation marks (agent/nodes.py) that leave search results / docs incomplete.
+COLLECTION_CUTS = frozenset({"searches_dropped", "fetches_cancelled"})
+
+
+def _stash(value: Any, found: Dict[str, str], text_min: int) -> Any:
+    """Replace long strings (recursively in dicts/lists) with {"$text": sha1}; collects them in `found`."""
+    if isinstance(value, str):
+        if len(value) < text_min:
+            return value
+        h = hashlib.sha1(value.encode("utf-8")).hexdigest()
+        found[h] = value
+        return {_REF: h}
+    if isinstance(value, dict):
+        return {k: _stash(v, found, text_min) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_stash(v, found, text_min) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_stash(v, found, text_min) for v in value)
+    return value
+
+
+def _restore(value: Any, lookup: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and _REF in value:
+            return lookup(value[_REF])
+        return {k: _restore(v, lookup) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_restore(v, lookup) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_restore(v, lookup) for v in value)
+    return value
+
+
+class SqliteSaver(BaseCheckpointSaver[str]):
+    def __init__(self, path: Optional[Path] = None, serde: Any = None, text_min: int = TEXT_MIN) -> None:
+        super().__init__(serde=serde)
+        self.path = Path(path) if path else Path(os.getenv("CHECKPOINT_DB") or cache_dir() / "checkpoints.sqlite")
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.text_min = int(text_min)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS checkpoints ("
+            " thread_id TEXT, ns TEXT, checkpoint_id TEXT, parent_id TEXT, type TEXT, checkpoint BLOB,"
+            " metadata BLOB, created REAL, PRIMARY KEY (thread_id, ns, checkpoint_id));"
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " thread_id TEXT, ns TEXT, channel TEXT, version TEXT, type TEXT, value BLOB,"
+            " PRIMARY KEY (thread_id, ns, channel, version));"
+            "CREATE TABLE IF NOT EXISTS writes ("
+            " thread_id TEXT, ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER, channel TEXT,"
+            " type TEXT, value BLOB, task_path TEXT,"
+            " PRIMARY KEY (thread_id, ns, checkpoint_id, task_id, idx));"
+            "CREATE TABLE IF NOT EXISTS texts (hash TEXT PRIMARY KEY, data BLOB, size INTEGER);"
+            "CREATE TABLE IF NOT EXISTS text_refs (thread_id TEXT, hash TEXT, PRIMARY KEY (thread_id, hash));"
+            "CREATE TABLE IF NOT EXISTS runs ("
+            " run_id TEXT PRIMARY KEY, key TEXT, query TEXT, depth TEXT, status TEXT,"
+            " reused_from TEXT, created REAL, updated REAL);"
+            "CREATE INDEX IF NOT EXISTS runs_key ON runs(key, updated);"
+        )
+        self._texts: Dict[str, str] = {}  # small read-through cache (hash -> text)
+        keep_days = float(os.getenv("CHECKPOINT_KEEP_DAYS", "7"))
+        if keep_days > 0:
+            self.prune(keep_days * 86400)
+
+    # -- storage helpers -------------------------------------------------
+
+    @contextmanager
+    def _tx(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+
+    def _pack(self, db: sqlite3.Connection, thread_id: str, value: Any) -> Tuple[str, bytes]:
+        found: Dict[str, str] = {}
+        type_, data = self.serde.dumps_typed(_stash(value, found, self.text_min))
+        for h, text in found.items():
+            raw = text.encode("utf-8")
+            db.execute("INSERT OR IGNORE INTO texts VALUES (?, ?, ?)", (h, zlib.compress(raw, 6), len(raw)))
+            db.execute("INSERT OR IGNORE INTO text_refs VALUES (?, ?)", (thread_id, h))
+        return type_, zlib.compress(data, 6)
+
+    def _text(self, h: str) -> str:
+        text = self._texts.get(h)
+        if text is None:
+            with self._lock:
+                row = self._db.execute("SELECT data FROM texts WHERE hash = ?", (h,)).fetchone()
+            text = zlib.decompress(row[0]).decode("utf-8") if row else ""
+            if len(self._texts) > 2048:
+                self._texts.clear()
+            self._texts[h] = text
+        return text
+
+    def _unpack(self, type_: str, data: bytes) -> Any:
+        return _restore(self.serde.loads_typed((type_, zlib.decompress(data))), self._text)
+
+    def _values(self, thread_id: str, ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        with self._lock:
+            for channel, version in versions.items():
+                row = self._db.execute(
+                    "SELECT type, value FROM blobs WHERE thread_id = ? AND ns = ? AND channel = ? AND version = ?",
+                    (thread_id, ns, channel, str(version)),
+                ).fetchone()
+                if row and row[0] != "empty":
+                    out[channel] = row
+        return {channel: self._unpack(*row) for channel, row in out.items()}
+
+    def _pending(self, thread_id: str, ns: str, checkpoint_id: str) -> List[Tuple[str, str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT task_id, idx, channel, type, value, task_path FROM writes"
+                " WHERE thread_id = ? AND ns = ? AND checkpoint_id = ?",
+                (thread_id, ns, checkpoint_id),
+            ).fetchall()
+        rows.sort(key=lambda r: writes_sort_key(r[5] or "", r[0], r[1]))
+        return [(r[0], r[2], self._unpack(r[3], r[4])) for r in rows]
+
+    def _tuple(self, row: Sequence[Any]) -> CheckpointTuple:
+        thread_id, ns, checkpoint_id, parent_id, type_, blob, metadata = row
+        checkpoint = self._unpack(type_, blob)
+        cfg = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint_id}}
+        return CheckpointTuple(
+            config=cfg,
+            checkpoint={**checkpoint, "channel_values": self._values(thread_id, ns, checkpoint["channel_versions"])},
+            metadata=self._unpack("msgpack", metadata),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=self._pending(thread_id, ns, checkpoint_id),
+        )
+
+    # -- BaseCheckpointSaver ---------------------------------------------
+
+    def get_tuple(self, config: Dict[str, Any]) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        cols = "thread_id, ns, checkpoint_id, parent_id, type, checkpoint, metadata"
+        with self._lock:
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._db.execute(
+                    f"SELECT {cols} FROM checkpoints WHERE thread_id = ? AND ns = ? AND checkpoint_id = ?",
+                    (thread_id, ns, checkpoint_id),
+                ).fetchone()
+            else:
+                row = self._db.execute(
+                    f"SELECT {cols} FROM checkpoints WHERE thread_id = ? AND ns = ?"
+                    " ORDER BY checkpoint_id DESC LIMIT 1",
+                    (thread_id, ns),
+                ).fetchone()
+        return self._tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[Dict[str, Any]],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[Dict[str, Any]] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        where, args = [], []
+        if config:
+            where.append("thread_id = ?")
+            args.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                where.append("ns = ?")
+                args.append(config["configurable"]["checkpoint_ns"])
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                args.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            args.append(before_id)
+        sql = "SELECT thread_id, ns, checkpoint_id, parent_id, type, checkpoint, metadata FROM checkpoints"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        with self._lock:
+            rows = self._db.execute(sql + " ORDER BY checkpoint_id DESC", args).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._unpack("msgpack", row[6])
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                limit -= 1
+            yield self._tuple(row)
+
+    def put(
+        self,
+        config: Dict[str, Any],
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> Dict[str, Any]:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        c = dict(checkpoint)
+        values = c.pop("channel_values", {})
+        with self._tx() as db:
+            for channel, version in new_versions.items():
+                type_, data = self._pack(db, thread_id, values[channel]) if channel in values else ("empty", b"")
+                db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)",
+                           (thread_id, ns, channel, str(version), type_, data))
+            type_, data = self._pack(db, thread_id, c)
+            _, meta = self._pack(db, thread_id, get_checkpoint_metadata(config, metadata))
+            db.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, ns, checkpoint["id"], config["configurable"].get("checkpoint_id"), type_, data, meta,
+                 time.time()),
+            )
+            db.execute("UPDATE runs SET updated = ? WHERE run_id = ?", (time.time(), thread_id))
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config: Dict[str, Any], writes: Sequence[Tuple[str, Any]], task_id: str,
+                   task_path: str = "") -> None:
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        with self._tx() as db:
+            for n, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, n)
+                type_, data = self._pack(db, thread_id, value)
+                # Regular writes are idempotent per (task, idx); special channels (errors...) overwrite.
+                verb = "INSERT OR IGNORE" if idx >= 0 else "INSERT OR REPLACE"
+                db.execute(f"{verb} INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                           (thread_id, ns, checkpoint_id, task_id, idx, channel, type_, data, task_path))
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._tx() as db:
+            for table in ("checkpoints", "blobs", "writes", "text_refs", "runs"):
+                db.execute(f"DELETE FROM {table} WHERE {'run_id' if table == 'runs' else 'thread_id'} = ?",
+                           (thread_id,))
+            db.execute("DELETE FROM texts WHERE hash NOT IN (SELECT hash FROM text_refs)")
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # Same scheme as InMemorySaver: sortable strings "<n zero-padded>.<random>".
+        if current is None:
+            n = 0
+        elif isinstance(current, int):
+            n = current
+        else:
+            n = int(str(current).split(".")[0])
+        return f"{n + 1:032}.{random.random():016}"
+
+    async def aget_tuple(self, config: Dict[str, Any]) -> Optional[CheckpointTuple]:
+        return self.get_tuple(config)
+
+    async def aput(self, config: Dict[str, Any], checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> Dict[str, Any]:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config: Dict[str, Any], writes: Sequence[Tuple[str, Any]], task_id: str,
+                          task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    # -- runs --------------------------------------------------------------
+
+    def record_run(self, run_id: str, key: str, query: str, depth: str, reused_from: Optional[str] = None) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, 'running', ?, ?, ?)",
+                (run_id, key, query, depth, reused_from, now, now),
+            )
+
+    def set_status(self, run_id: str, status: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE runs SET status = ?, updated = ? WHERE run_id = ?", (status, time.time(), run_id))
+
+    def run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return dict(zip(("run_id", "key", "query", "depth", "status", "reused_from", "created", "updated"), row)) if row else None
+
+    def runs_for(self, key: str, max_age_s: float) -> List[str]:
+        """Run ids for this question key, newest first."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT run_id FROM runs WHERE key = ? AND updated >= ? ORDER BY updated DESC",
+                (key, time.time() - max_age_s),
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def prune(self, older_than_s: float) -> int:
+        """Drop runs (and checkpoint threads) untouched for `older_than_s`; returns how many."""
+        cutoff = time.time() - older_than_s
+        with self._lock:
+            stale = [r[0] for r in self._db.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created) < ?", (cutoff,)
+            ).fetchall()]
+        for thread_id in stale:
+            self.delete_thread(thread_id)
+        return len(stale)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            q = self._db.execute
+            out = {
+                "runs": q("SELECT COUNT(*) FROM runs").fetchone()[0],
+                "checkpoints": q("SELECT COUNT(*) FROM checkpoints").fetchone()[0],
+                "texts": q("SELECT COUNT(*) FROM texts").fetchone()[0],
+                "text_bytes": q("SELECT COALESCE(SUM(size), 0) FROM texts").fetchone()[0],
+                "stored_bytes": sum(
+                    q(f"SELECT COALESCE(SUM(LENGTH({col})), 0) FROM {table}").fetchone()[0]
+                    for table, col in (("checkpoints", "checkpoint"), ("blobs", "value"), ("writes", "value"),
+                                       ("texts", "data"))
+                ),
+            }
+        out["file_bytes"] = sum(p.stat().st_size for p in (self.path, Path(f"{self.path}-wal")) if p.exists())
+        return out
+
+
+def default_saver() -> SqliteSaver:
+    from tools import runtime
+
+    return runtime.shared(("checkpointer", os.getenv("CHECKPOINT_DB") or str(cache_dir())), SqliteSaver)
+
+
+def run_key(query: str, depth: str) -> str:
+    return f"{depth}:{normalize_query(query)}"
+
+
+def _config(run_id: str) -> Dict[str, Any]:
+    # not metadata["run_id"]: LangGraph reads that as re-entry into a running invocation and drops new input
+    return {"configurable": {"thread_id": run_id}, "metadata": {"research_run_id": run_id}}
+
+
+def _reusable(graph: Any, saver: SqliteSaver, key: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    (run_id, values) of the newest run of this question whose search/fetch stage
+    finished in full; runs cut short by their budget would hand on a partial doc set.
+    """
+    ttl = float(os.getenv("CHECKPOINT_REUSE_TTL", "21600"))
+    for run_id in saver.runs_for(key, ttl):
+        for snap in graph.get_state_history(_config(run_id)):
+            if "write" in snap.next or (not snap.next and snap.values.get("draft")):
+                cut = COLLECTION_CUTS.intersection(snap.values.get("degraded") or ())
+                if snap.values.get("docs") and not cut:
+                    return run_id, snap.values
+                break
+    return None
+
+
+def prepare_run(
+    graph: Any,
+    state: Dict[str, Any],
+    run_id: Optional[str] = None,
+    reuse: bool = True,
+    saver: Optional[SqliteSaver] = None,
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    (config, input, reused_from) for a new checkpointed run of `state`; ValueError if
+    an explicit run_id already has checkpoints. When an earlier run of the same
+    question got through search/fetch, its state is copied into the new run as if
+    dedupe had just finished, and input is None (continue).
+    """
+    saver = saver or default_saver()
+    if run_id and saver.get_tuple(_config(run_id)) is not None:
+        raise ValueError(f"run {run_id} already has checkpoints; resume it or pick another id")
+    run_id = run_id or uuid.uuid4().hex[:16]
+    query = state.get("query") or state.get("question") or state.get("prompt") or ""
+    depth = state.get("depth") or "standard"
+    key = run_key(query, depth)
+    config = _config(run_id)
+
+    found = _reusable(graph, saver, key) if reuse else None
+    saver.record_run(run_id, key, query, depth, reused_from=found[0] if found else None)
+    if not found:
+        return config, state, None
+    values = {k: found[1][k] for k in REUSED_KEYS if k in found[1]}
+    values.update(state)  # this run's wording, writer settings, budget
+    graph.update_state(config, values, as_node="dedupe")
+    return config, None, found[0]
+
+
+def resume_run(graph: Any, run_id: str, saver: Optional[SqliteSaver] = None) -> Tuple[Dict[str, Any], None]:
+    """(config, None) continuing `run_id` from its last completed node. Raises KeyError if unknown or done."""
+    saver = saver or default_saver()
+    config = _config(run_id)
+    snap = graph.get_state(config)
+    if not snap.values and not snap.next:
+        raise KeyError(f"no checkpoints for run {run_id}")
+    if not snap.next:
+        raise KeyError(f"run {run_id} already finished")
+    budget = snap.values.get("budget_s")
+    if budget:
+        graph.update_state(config, {"deadline": Deadline(seconds=budget).as_dict(), "degraded": []})
+    saver.set_status(run_id, "running")
+    return config, None
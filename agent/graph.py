@@ -1,17 +1,80 @@
+from typing import Any, Dict, Iterator, Optional
+
 from langgraph.graph import StateGraph, END
 from agent.state import AgentState
 from agent import nodes
+from tools import runtime
+from tools.telemetry import traced
 
-def build_app():
+def build_app(pipelined: Optional[bool] = None, checkpointer: Any = None):
+    """
+    plan -> gather -> dedupe -> write, where gather overlaps searching and
+    fetching and hands over early (nodes.gather). pipelined=False (or
+    AGENT_PIPELINE=0) builds the staged plan -> search -> browse -> ... graph.
+    With a checkpointer (agent/checkpoint.py) every node's result is saved
+    under the run's thread_id, so a run can be resumed or its search reused.
+    """
+    if pipelined is None:
+        pipelined = nodes.pipeline_enabled()
     g = StateGraph(AgentState)
-    g.set_entry_point("search")
-    g.add_node("search", nodes.web_search)
-    g.add_node("browse", nodes.browse)
-    g.add_node("write", nodes.write)
+    g.set_entry_point("plan")
+    g.add_node("plan", traced("node.plan")(nodes.plan))
+    g.add_node("dedupe", traced("node.dedupe")(nodes.dedupe))
+    g.add_node("write", traced("node.write")(nodes.write))
 
-    g.add_edge("search", "browse")
-    g.add_edge("browse", "write")
+    if pipelined:
+        g.add_node("gather", traced("node.gather")(nodes.gather))
+        g.add_edge("plan", "gather")
+        g.add_edge("gather", "dedupe")
+    else:
+        g.add_node("search", traced("node.search")(nodes.web_search))
+        g.add_node("browse", traced("node.browse")(nodes.browse))
+        g.add_edge("plan", "search")
+        g.add_edge("search", "browse")
+        g.add_edge("browse", "dedupe")
+    g.add_edge("dedupe", "write")
     g.add_edge("write", END)
-    return g.compile()
+    return g.compile(checkpointer=checkpointer)
+
+def get_app():
+    """The default compiled graph, built on first use and shared by every entry point."""
+    return runtime.shared("graph", build_app)
+
+
+def get_checkpointed_app():
+    """The default graph compiled with the on-disk SqliteSaver (CHECKPOINT_DB)."""
+    def build():
+        from agent.checkpoint import default_saver
+
+        return build_app(checkpointer=default_saver())
+
+    return runtime.shared("graph.checkpointed", build)
+
+
+def __getattr__(name: str) -> Any:
+    # `from agent.graph import app` keeps working; compiling waits until someone asks.
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-app = build_app()
+def stream_events(
+    state: Optional[Dict[str, Any]], graph: Any = None, config: Optional[Dict[str, Any]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Run the graph and yield progress as it happens:
+      {"type": "stage", "stage": "plan"|"search"|"browse"|"dedupe"|"write", "status": "start"|"done", ...}
+      {"type": "doc", "url": ..., "ok": bool, "ms": ...}   (pipelined mode, per fetched page)
+      {"type": "token", "text": "..."}          (writer output, as generated)
+      {"type": "final", "state": {...}}         (always last)
+    With a checkpointed graph, `config` names the run ({"configurable": {"thread_id": ...}})
+    and state=None continues it from its last checkpoint (agent/checkpoint.py).
+    """
+    graph = graph or get_app()
+    final: Dict[str, Any] = dict(state or {})
+    for mode, chunk in graph.stream(state, config, stream_mode=["custom", "values"]):
+        if mode == "custom":
+            yield chunk
+        else:
+            final = chunk
+    yield {"type": "final", "state": final}
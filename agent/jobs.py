@@ -0,0 +1,231 @@
+# agent/jobs.py
+"""
+Asyncio job manager behind server.py (kept free of FastAPI so it can be
+reused and tested on its own).
+
+- submit() coalesces identical questions (normalised query + depth) onto the
+  job already queued or running for them, so a trending question runs once.
+- Admission control: at most JOB_QUEUE_MAX jobs wait for one of JOB_WORKERS
+  workers; beyond that submit() raises QueueFull.
+- Each job keeps its event log (stage/doc/token events from
+  agent.graph.stream_events), so a subscriber joining late replays what it
+  missed and then follows live.
+- Finished jobs (with their event logs) are kept for status/result lookups
+  for JOB_RETENTION_S seconds, and never more than JOB_HISTORY of them.
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from tools.search import normalize_query
+from tools.telemetry import log, run_scope
+
+RunFn = Callable[[Dict[str, Any]], Iterator[Dict[str, Any]]]
+
+TERMINAL = ("done", "error")
+
+
+class QueueFull(RuntimeError):
+    pass
+
+
+class Job:
+    def __init__(self, query: str, depth: str, key: str, budget_s: Optional[float] = None) -> None:
+        self.id = uuid.uuid4().hex[:16]
+        self.query = query
+        self.depth = depth
+        self.budget_s = budget_s
+        self.key = key
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.subscribers_total = 1
+        self.events: List[Dict[str, Any]] = []
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._listeners: List[asyncio.Queue] = []
+
+    def publish(self, event: Dict[str, Any]) -> None:
+        self.events.append(event)
+        for q in self._listeners:
+            q.put_nowait(event)
+
+    async def follow(self) -> AsyncIterator[Dict[str, Any]]:
+        """Replay the events so far, then yield new ones until the job ends."""
+        q: asyncio.Queue = asyncio.Queue()
+        backlog = list(self.events)
+        self._listeners.append(q)
+        try:
+            for ev in backlog:
+                yield ev
+            if self.status in TERMINAL:
+                return
+            while True:
+                ev = await q.get()
+                yield ev
+                if ev.get("type") == "end":
+                    return
+        finally:
+            self._listeners.remove(q)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "query": self.query,
+            "depth": self.depth,
+            "budget_s": self.budget_s,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "subscribers": self.subscribers_total,
+            "error": self.error,
+        }
+
+
+def _default_run(state: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    from agent.graph import stream_events
+
+    return stream_events(state)
+
+
+class JobManager:
+    def __init__(
+        self,
+        run: Optional[RunFn] = None,
+        workers: Optional[int] = None,
+        queue_max: Optional[int] = None,
+        history: Optional[int] = None,
+        retention_s: Optional[float] = None,
+    ) -> None:
+        self.run = run or _default_run
+        self.workers = workers or int(os.getenv("JOB_WORKERS", "2"))
+        self.queue_max = queue_max or int(os.getenv("JOB_QUEUE_MAX", "32"))
+        self.history = history or int(os.getenv("JOB_HISTORY", "1000"))
+        self.retention_s = retention_s if retention_s is not None else float(os.getenv("JOB_RETENTION_S", "3600"))
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._inflight: Dict[str, Job] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self.counters: Dict[str, int] = {
+            "submitted": 0, "coalesced": 0, "rejected": 0, "completed": 0, "failed": 0, "evicted": 0,
+        }
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue(maxsize=self.queue_max)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, query: str, depth: str = "standard", budget_s: Optional[float] = None) -> Tuple[Job, bool]:
+        """
+        Returns (job, coalesced). Raises QueueFull when the wait queue is at capacity.
+        Only requests with the same time budget share a run.
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager.start() has not been awaited")
+        key = f"{depth}:{normalize_query(query)}" + (f":{budget_s:g}s" if budget_s else "")
+        self.counters["submitted"] += 1
+        job = self._inflight.get(key)
+        if job is not None:
+            job.subscribers_total += 1
+            self.counters["coalesced"] += 1
+            return job, True
+        job = Job(query, depth, key, budget_s)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.counters["rejected"] += 1
+            raise QueueFull(f"{self.queue_max} jobs already waiting")
+        self._inflight[key] = job
+        self.jobs[job.id] = job
+        self._evict()
+        job.publish({"type": "status", "status": "queued"})
+        return job, False
+
+    def _evict(self) -> None:
+        """Drop finished jobs past the retention window, then the oldest finished ones beyond the history cap."""
+        cutoff = time.time() - self.retention_s
+        excess = len(self.jobs) - self.history
+        for job in [j for j in self.jobs.values() if j.status in TERMINAL]:
+            if excess > 0 or (job.finished or 0.0) <= cutoff:
+                del self.jobs[job.id]
+                excess -= 1
+                self.counters["evicted"] += 1
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = dict(self.counters)
+        out.update(
+            queued=self._queue.qsize() if self._queue else 0,
+            running=sum(1 for j in self._inflight.values() if j.status == "running"),
+            queue_max=self.queue_max,
+            workers=self.workers,
+        )
+        return out
+
+    async def _worker(self, n: int) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                self._queue.task_done()
+
+    async def _execute(self, job: Job) -> None:
+        loop = asyncio.get_running_loop()
+        job.status = "running"
+        job.started = time.time()
+        job.publish({"type": "status", "status": "running"})
+
+        def _pump() -> Optional[Dict[str, Any]]:
+            final = None
+            state: Dict[str, Any] = {"query": job.query, "depth": job.depth}
+            if job.budget_s:
+                state["budget_s"] = job.budget_s
+            with run_scope(job.id):  # spans, counters and logs of this job carry its id
+                for ev in self.run(state):
+                    if ev.get("type") == "final":
+                        final = ev.get("state") or {}
+                    else:
+                        loop.call_soon_threadsafe(job.publish, ev)
+            return final
+
+        try:
+            final = await loop.run_in_executor(None, _pump) or {}
+            job.result = {
+                "draft": final.get("draft"),
+                "subtasks": final.get("subtasks") or [],
+                "degraded": final.get("degraded") or [],
+                "sources": [
+                    {"url": d.get("url"), "title": d.get("title"), "alt_urls": d.get("alt_urls") or []}
+                    for d in final.get("docs") or []
+                ],
+            }
+            job.status = "done"
+            self.counters["completed"] += 1
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "error"
+            self.counters["failed"] += 1
+            log("jobs", f"{job.id} failed: {job.error}")
+        finally:
+            job.finished = time.time()
+            self._inflight.pop(job.key, None)
+            # publish after queued call_soon_threadsafe events so "end" is last
+            await asyncio.sleep(0)
+            job.publish({"type": "end", "status": job.status, "error": job.error})
+            self._evict()
@@ -1,73 +1,229 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import os
+import threading
+import time
+import re
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
 
-from dotenv import load_dotenv, find_dotenv
 from tools.search import web_search as real_search
-from tools.scrape import scrape as real_scrape
+from tools.scrape import FetchCancelled, scrape as real_scrape
 from tools.llm import LLM  
+from tools.context import context_budget, count_tokens, pack_context
+from tools.deadline import Deadline, DeadlineExceeded
+from tools.http_pool import KeyedLimiter
+from tools.runtime import load_env
+from tools.telemetry import bind, log
 
 
 
 
 
-load_dotenv(find_dotenv(), override=False)
+load_env()
 
+try:
+    from langgraph.config import get_stream_writer
+except ImportError:  # older langgraph without custom stream events
+    get_stream_writer = None
 
 
+def _emit(event: Dict[str, Any]) -> None:
+    """Publish a progress event to app.stream(..., stream_mode="custom") consumers."""
+    if get_stream_writer is None:
+        return
+    try:
+        get_stream_writer()(event)
+    except Exception:
+        pass  # not running inside a graph (direct node call)
 
 
 
-def web_search(state: dict) -> dict:
+
+
+
+# Run budget (state["budget_s"] / RUN_BUDGET_S; see tools/deadline.py). When a
+# run has one, stages shrink to fit instead of overrunning it:
+#   WRITE_RESERVE=0.35     share of the budget held back for the writer; search and
+#                          fetching stop by then (unfinished pages fall back to snippets)
+#   WRITE_MIN_S=1          with less than this left the writer answers from snippets
+#                          without an LLM call
+#   WRITE_MARGIN_S=0.25    reserved on top of WRITE_MIN_S for dedupe and hand-over, so
+#                          small budgets still reach the writer with WRITE_MIN_S left
+#   LLM_TOKENS_PER_S=40    generation speed used to shorten max_tokens near the deadline
+WRITE_RESERVE = float(os.getenv("WRITE_RESERVE", "0.35"))
+WRITE_MIN_S = float(os.getenv("WRITE_MIN_S", "1"))
+WRITE_MARGIN_S = float(os.getenv("WRITE_MARGIN_S", "0.25"))
+LLM_TOKENS_PER_S = float(os.getenv("LLM_TOKENS_PER_S", "40"))
+
+
+def _collect_window(dl: Deadline, cap: float) -> float:
+    """Seconds search/fetch may still use: `cap`, minus whatever the writer needs."""
+    if not dl.bounded:
+        return cap
+    reserve = max(WRITE_RESERVE * dl.budget, WRITE_MIN_S + WRITE_MARGIN_S)
+    return max(0.0, min(cap, dl.remaining() - reserve))
+
+
+def _degrade(state: Dict, what: str) -> None:
+    """Note a shortcut taken to stay within the budget (state["degraded"])."""
+    marks = state.setdefault("degraded", [])
+    if what not in marks:
+        marks.append(what)
+        log("deadline", f"degrading: {what}")
+
+
+# depth -> (sub-queries searched, search results kept, pages browsed)
+DEPTH_PROFILES: Dict[str, Tuple[int, int, int]] = {
+    "shallow": (1, 12, 10),
+    "standard": (3, 12, 10),
+    "deep": (6, 20, 16),
+}
+SEARCH_DEADLINE_S = float(os.getenv("SEARCH_DEADLINE_S", "20"))
+SEARCH_FANOUT = int(os.getenv("SEARCH_FANOUT", "4"))
+
+_FACETS = ("overview", "latest research evidence", "criticism limitations", "statistics data", "explained examples", "history background")
+_LIST_MARK = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+
+
+def _profile(state: Dict) -> Tuple[int, int, int]:
+    return DEPTH_PROFILES.get((state.get("depth") or "standard").lower(), DEPTH_PROFILES["standard"])
+
+
+def _parse_subqueries(text: str) -> List[str]:
+    out = []
+    for line in (text or "").splitlines():
+        line = _LIST_MARK.sub("", line).strip().strip('"').strip()
+        if 3 <= len(line) <= 200:
+            out.append(line)
+    return out
+
+
+def plan(state: Dict) -> Dict:
+    """Expand the question into depth-dependent sub-queries (state["subtasks"]), original first."""
     q = state.get("query") or state.get("question") or state.get("prompt")
     if not q:
         raise KeyError("No query/question/prompt found in state.")
+    state["query"] = q
+    dl = Deadline.of(state)
+    n = _profile(state)[0]
+    subs: List[str] = [q]
+    if n > 1:
+        _emit({"type": "stage", "stage": "plan", "status": "start"})
+        try:
+            llm = LLM(temperature=0.0, max_tokens=200, timeout=dl.share(0.15, 60), deadline=dl)
+            text = llm.chat(
+                "You plan web research. Reply with search-engine queries only, one per line, no numbering.",
+                f"Question: {q}\n\nWrite {n - 1} distinct web search queries that together cover the "
+                "different aspects needed to answer it.",
+            )
+            subs += _parse_subqueries(text)
+        except Exception as e:
+            log("plan", f"LLM planning failed ({e}); using facet queries")
+        if len(subs) < n:
+            subs += [f"{q} {facet}" for facet in _FACETS]
+        seen, uniq = set(), []
+        for s in subs:
+            if s.casefold() not in seen:
+                seen.add(s.casefold())
+                uniq.append(s)
+        subs = uniq[:n]
+        log("plan", f"{len(subs)} sub-queries: {subs}")
+        _emit({"type": "stage", "stage": "plan", "status": "done", "subtasks": len(subs)})
+    state["subtasks"] = subs
+    return state
 
-    # Call search tool safely
+
+def _search_one(query: str, dl: Optional[Deadline] = None) -> List[Dict]:
     try:
-        results = real_search(q) or []
+        results = real_search(query, deadline=dl) or []
     except Exception as e:
-        print(f"[web_search] search backend error: {e}")
-        results = []
-
-    if not isinstance(results, list):
-        print("[web_search] non-list result from search tool; coercing to []")
-        results = []
+        log("web_search", f"search backend error for {query!r}: {e}")
+        return []
+    return results if isinstance(results, list) else []
+
+
+def _search_many(queries: List[str], dl: Optional[Deadline] = None) -> List[List[Dict]]:
+    """Run queries concurrently; anything unfinished at SEARCH_DEADLINE_S (or the run budget) yields []."""
+    dl = dl or Deadline()
+    window = _collect_window(dl, SEARCH_DEADLINE_S)
+    if len(queries) == 1:
+        return [_search_one(queries[0], dl)]
+    pool = ThreadPoolExecutor(max_workers=max(1, min(SEARCH_FANOUT, len(queries))), thread_name_prefix="search")
+    futures = [pool.submit(bind(_search_one), sq, dl) for sq in queries]
+    done, pending = wait(futures, timeout=window)
+    pool.shutdown(wait=False, cancel_futures=True)
+    if pending:
+        log("web_search", f"deadline {window:.0f}s hit; dropped {len(pending)} sub-queries")
+    return [f.result() if f in done else [] for f in futures]
+
+
+def _interleave(lists: List[List[Dict]]) -> List[Dict]:
+    """Round-robin merge so every sub-query contributes its best hits first."""
+    out: List[Dict] = []
+    for rank in range(max((len(x) for x in lists), default=0)):
+        out.extend(x[rank] for x in lists if rank < len(x))
+    return out
 
-    # Normalize + dedupe by domain (robust)
-    normalized, seen_domains = {}, set()
-    i = 1
 
-    def _domain(u: str) -> str:
-        try:
-            if "://" in u:
-                return u.split("/", 3)[2]
-            return u.split("/", 1)[0]
-        except Exception:
-            return u
+def _domain(u: str) -> str:
+    try:
+        if "://" in u:
+            return u.split("/", 3)[2]
+        return u.split("/", 1)[0]
+    except Exception:
+        return u
+
+
+def _add_result(normalized: Dict[str, Dict[str, str]], seen_domains: set, item: Any) -> str:
+    """Append a search hit as r{n} unless its domain is already present; returns the id or ""."""
+    if not isinstance(item, dict):
+        return ""
+    url = (item.get("url") or "").strip()
+    if not url:
+        return ""
+    dom = _domain(url)
+    if dom in seen_domains:
+        return ""
+    seen_domains.add(dom)
+    rid = f"r{len(normalized) + 1}"
+    normalized[rid] = {
+        "url": url,
+        "title": (item.get("title") or url).strip(),
+        "snippet": (item.get("snippet") or "").strip(),
+    }
+    return rid
 
-    for item in results:
-        if not isinstance(item, dict):
-            continue
-        url = (item.get("url") or "").strip()
-        if not url:
-            continue
-        title = (item.get("title") or url).strip()
-        snippet = (item.get("snippet") or "").strip()
 
-        dom = _domain(url)
-        if dom in seen_domains:
-            continue
-        seen_domains.add(dom)
+def web_search(state: dict) -> dict:
+    q = state.get("query") or state.get("question") or state.get("prompt")
+    if not q:
+        raise KeyError("No query/question/prompt found in state.")
+    state["query"] = q
+    queries = state.get("subtasks") or [q]
+    max_results = _profile(state)[1]
+    dl = Deadline.of(state)
+    _emit({"type": "stage", "stage": "search", "status": "start", "queries": len(queries)})
+
+    t0 = time.perf_counter()
+    per_query = _search_many(queries, dl)
+    if dl.bounded and any(not r for r in per_query) and _collect_window(dl, 1.0) <= 0:
+        _degrade(state, "searches_dropped")
+    results = _interleave(per_query)
+    log("web_search", f"{len(queries)} queries -> {len(results)} hits in {(time.perf_counter() - t0) * 1000:.0f} ms")
 
-        normalized[f"r{i}"] = {"url": url, "title": title, "snippet": snippet}
-        i += 1
-        if i > 12:
+    # Normalize + dedupe by domain (robust)
+    normalized: Dict[str, Dict[str, str]] = {}
+    seen_domains: set = set()
+    for item in results:
+        _add_result(normalized, seen_domains, item)
+        if len(normalized) >= max_results:
             break
 
    
     if not normalized:
-        print("[web_search] domain dedupe produced 0; falling back to first results")
+        log("web_search", "domain dedupe produced 0; falling back to first results")
         j = 1
         for item in results[:6]:
             if not isinstance(item, dict):
@@ -83,7 +239,8 @@ def web_search(state: dict) -> dict:
             j += 1
 
     state["search_results"] = normalized
-    print(f"[web_search] stored {len(normalized)} results")
+    log("web_search", f"stored {len(normalized)} results")
+    _emit({"type": "stage", "stage": "search", "status": "done", "results": len(normalized)})
     return state
 
 
@@ -93,75 +250,384 @@ MIN_CHARS = 300
 MAX_DOCS = 10
 MAX_TEXT_PER_DOC = 10000
 
-def _safe_scrape(url: str) -> Dict[str, str]:
+# Fetch concurrency: global worker cap per browse() call, plus a per-host cap
+# so a handful of results from the same site don't hammer it in parallel.
+BROWSE_CONCURRENCY = int(os.getenv("BROWSE_CONCURRENCY", "6"))
+BROWSE_PER_HOST = int(os.getenv("BROWSE_PER_HOST", "2"))
+
+_host_limiter = KeyedLimiter(BROWSE_PER_HOST)
+
+
+def _host_slot(url: str) -> ContextManager[None]:
+    return _host_limiter.hold((urlsplit(url).hostname or url).lower())
+
+def _safe_scrape(url: str, dl: Optional[Deadline] = None, cancel: Optional[threading.Event] = None) -> Dict[str, str]:
     try:
-       
-        page = real_scrape(url, timeout=20)  
+        page = real_scrape(url, timeout=20, max_chars=MAX_TEXT_PER_DOC, deadline=dl, cancel=cancel)
         if not isinstance(page, dict):
-            print(f"[browse] scrape non-dict for {url}")
+            log("browse", f"scrape non-dict for {url}")
             return {}
         text = (page.get("text") or "").strip()
         if not text:
-            print(f"[browse] empty text for {url}")
+            log("browse", f"empty text for {url}")
             return {}
         if len(text) < MIN_CHARS:
-            print(f"[browse] thin page ({len(text)} chars) for {url}")
+            log("browse", f"thin page ({len(text)} chars) for {url}")
            
         return {
             "url": (page.get("url") or url).strip(),
             "title": (page.get("title") or url).strip(),
             "text": text[:MAX_TEXT_PER_DOC],
         }
+    except DeadlineExceeded:
+        log("browse", f"out of time for {url}")
+        return {}
+    except FetchCancelled:
+        return {}
     except Exception as e:
-        print(f"[browse] scrape error for {url}: {e}")
+        log("browse", f"scrape error for {url}: {e}")
         return {}
 
-def browse(state: Dict) -> Dict:
-    results: List[Dict] = list(state.get("search_results", {}).values())[:MAX_DOCS]
-    print(f"[browse] incoming results: {len(results)}")
+def _timed_scrape(url: str, dl: Optional[Deadline] = None,
+                  cancel: Optional[threading.Event] = None) -> Tuple[Dict[str, str], Any]:
+    """
+    Scrape under the per-host slot; returns (page, fetch latency in ms), ms=None
+    if out of time. Setting `cancel` closes the download mid-body (and frees the
+    slot, the pooled connection and the thread) instead of letting it run on.
+    """
+    with _host_slot(url):
+        if (dl is not None and dl.expired()) or (cancel is not None and cancel.is_set()):
+            return {}, None
+        t0 = time.perf_counter()
+        page = _safe_scrape(url, dl, cancel)
+        return page, (time.perf_counter() - t0) * 1000.0
+
+
+def _fetch_all(urls: List[str], dl: Optional[Deadline] = None, window: Optional[float] = None) -> List[Tuple[Dict[str, str], Any]]:
+    """Fetch pages concurrently; results come back in the order of `urls` (({}, None) past `window` s)."""
+    if not urls:
+        return []
+    workers = max(1, min(BROWSE_CONCURRENCY, len(urls)))
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="browse")
+    cancel = threading.Event()
+    futures = [pool.submit(bind(_timed_scrape), u, dl, cancel) for u in urls]
+    done, _ = wait(futures, timeout=window)
+    cancel.set()  # stragglers close their streams; queued ones never start
+    pool.shutdown(wait=False, cancel_futures=True)
+    return [f.result() if f in done else ({}, None) for f in futures]
+
+
+def _assemble(results: List[Dict], pages: List[Tuple[Dict[str, str], Any]]) -> Tuple[List[Dict], List[Dict[str, Any]]]:
+    """Pair search hits with fetched pages (ms=None: fetch cancelled); snippets fill the gaps."""
     docs: List[Dict] = []
-
-    for r in results:
+    fetch_stats: List[Dict[str, Any]] = []
+    for r, (page, ms) in zip(results, pages):
         url = (r.get("url") or "").strip()
         title = (r.get("title") or url).strip()
         snippet = (r.get("snippet") or "").strip()
-        if not url:
-            continue
 
-        page = _safe_scrape(url)
+        if ms is None:
+            fetch_stats.append({"url": url, "ms": None, "ok": False, "cancelled": True})
+            log("browse", f"cancel          {url}")
+        else:
+            fetch_stats.append({"url": url, "ms": round(ms, 1), "ok": bool(page)})
+            log("browse", f"{'ok  ' if page else 'fail'} {ms:7.0f} ms  {url}")
 
         if page:
-            
-            page["snippet"] = snippet
+            page = dict(page, snippet=snippet)
             docs.append(page)
+        elif snippet:
+            log("browse", f"using snippet fallback for {url}")
+            docs.append({
+                "url": url,
+                "title": title,
+                "text": snippet[:MAX_TEXT_PER_DOC],
+                "snippet": snippet,
+            })
         else:
-           
-            if snippet:
-                print(f"[browse] using snippet fallback for {url}")
-                docs.append({
-                    "url": url,
-                    "title": title,
-                    "text": snippet[:MAX_TEXT_PER_DOC],
-                    "snippet": snippet,
-                })
-            else:
-                print(f"[browse] skipped {url}: no scrape and no snippet")
-
-    print(f"[browse] docs collected: {len(docs)}")
+            log("browse", f"skipped {url}: no scrape and no snippet")
+    return docs, fetch_stats
+
+
+def browse(state: Dict) -> Dict:
+    results: List[Dict] = list(state.get("search_results", {}).values())[: _profile(state)[2]]
+    log("browse", f"incoming results: {len(results)}")
+    _emit({"type": "stage", "stage": "browse", "status": "start", "urls": len(results)})
+
+    results = [r for r in results if (r.get("url") or "").strip()]
+    dl = Deadline.of(state)
+    t0 = time.perf_counter()
+    pages = _fetch_all([r["url"].strip() for r in results], dl, _collect_window(dl, math.inf) if dl.bounded else None)
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    docs, fetch_stats = _assemble(results, pages)
+    if any(s.get("cancelled") for s in fetch_stats):
+        _degrade(state, "fetches_cancelled")
+
+    log("browse", f"docs collected: {len(docs)} in {wall_ms:.0f} ms")
+    state["docs"] = docs
+    state["fetch_stats"] = fetch_stats
+    _emit({"type": "stage", "stage": "browse", "status": "done", "docs": len(docs), "ms": round(wall_ms, 1)})
+    return state
+
+
+# Pipelined mode (AGENT_PIPELINE=1, the default): fetches start as soon as a
+# search returns, and the writer starts once PIPELINE_MIN_DOCS full pages are in
+# or PIPELINE_DEADLINE_S has passed; unfinished fetches are cancelled.
+PIPELINE_MIN_DOCS = int(os.getenv("PIPELINE_MIN_DOCS", "6"))
+PIPELINE_DEADLINE_S = float(os.getenv("PIPELINE_DEADLINE_S", "30"))
+
+
+def pipeline_enabled() -> bool:
+    return os.getenv("AGENT_PIPELINE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def gather(state: Dict) -> Dict:
+    """search + browse as one producer/consumer stage (fills search_results, docs, fetch_stats)."""
+    q = state.get("query") or state.get("question") or state.get("prompt")
+    if not q:
+        raise KeyError("No query/question/prompt found in state.")
+    state["query"] = q
+    queries = state.get("subtasks") or [q]
+    _, max_results, max_docs = _profile(state)
+    limit = min(max_results, max_docs)
+    enough = max(1, min(PIPELINE_MIN_DOCS, limit))
+    dl = Deadline.of(state)
+    window = _collect_window(dl, PIPELINE_DEADLINE_S)
+    _emit({"type": "stage", "stage": "search", "status": "start", "queries": len(queries)})
+    _emit({"type": "stage", "stage": "browse", "status": "start"})
+
+    t0 = time.perf_counter()
+    deadline = time.monotonic() + window
+    search_pool = ThreadPoolExecutor(max_workers=max(1, min(SEARCH_FANOUT, len(queries))), thread_name_prefix="search")
+    fetch_pool = ThreadPoolExecutor(max_workers=max(1, BROWSE_CONCURRENCY), thread_name_prefix="browse")
+    cancel = threading.Event()
+    pending: Dict[Any, Tuple[str, str]] = {search_pool.submit(bind(_search_one), sq, dl): ("search", sq) for sq in queries}
+    normalized: Dict[str, Dict[str, str]] = {}
+    seen_domains: set = set()
+    pages: Dict[str, Tuple[Dict[str, str], float]] = {}
+    full = searches = 0
+    try:
+        while pending:
+            done, _ = wait(list(pending), timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                log("gather", f"deadline {window:.0f}s hit")
+                if window < PIPELINE_DEADLINE_S:
+                    _degrade(state, "fetches_cancelled")
+                break
+            for f in done:
+                kind, key = pending.pop(f)
+                if kind == "search":
+                    searches += 1
+                    for item in f.result():
+                        if len(normalized) >= limit:
+                            break
+                        rid = _add_result(normalized, seen_domains, item)
+                        if rid:
+                            pending[fetch_pool.submit(bind(_timed_scrape), normalized[rid]["url"], dl, cancel)] = ("fetch", rid)
+                else:
+                    page, ms = f.result()
+                    pages[key] = (page, ms)
+                    if len(page.get("text", "")) >= MIN_CHARS:
+                        full += 1
+                    _emit({"type": "doc", "url": normalized[key]["url"], "ok": bool(page),
+                           "ms": round(ms, 1) if ms is not None else None})
+            if full >= enough:
+                log("gather", f"{full} full pages in; writing without waiting for the rest")
+                break
+    finally:
+        cancel.set()  # running fetches close their streams; queued ones never start
+        search_pool.shutdown(wait=False, cancel_futures=True)
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+    stragglers = sum(1 for kind, _ in pending.values() if kind == "fetch")
+    results = list(normalized.values())
+    docs, fetch_stats = _assemble(results, [pages.get(rid, ({}, None)) for rid in normalized])
+
+    log("gather", f"{searches}/{len(queries)} searches, {len(docs)} docs, {stragglers} fetches cancelled in {wall_ms:.0f} ms")
+    state["search_results"] = normalized
+    state["docs"] = docs
+    state["fetch_stats"] = fetch_stats
+    _emit({"type": "stage", "stage": "search", "status": "done", "results": len(normalized)})
+    _emit({"type": "stage", "stage": "browse", "status": "done", "docs": len(docs), "ms": round(wall_ms, 1), "cancelled": stragglers})
+    return state
+
+
+def dedupe(state: Dict) -> Dict:
+    """Collapse syndicated/mirrored docs; their URLs survive as `alt_urls` citations."""
+    docs: List[Dict] = state.get("docs", [])
+    from tools.dedupe import collapse_duplicates, enabled as dedupe_enabled  # numpy on first use only
+
+    if not dedupe_enabled() or len(docs) < 2:
+        return state
+    _emit({"type": "stage", "stage": "dedupe", "status": "start", "docs": len(docs)})
+    try:
+        docs, removed = collapse_duplicates(docs)
+    except Exception as e:
+        log("dedupe", f"skipped: {e}")
+        removed = 0
+    log("dedupe", f"{len(docs)} docs after removing {removed} near-duplicates")
     state["docs"] = docs
+    _emit({"type": "stage", "stage": "dedupe", "status": "done", "docs": len(docs), "removed": removed})
     return state
 
 
-def _chunks(s: str, size: int = 1200, max_chunks: int = 6):
-    out, i = [], 0
-    while i < len(s) and len(out) < max_chunks:
-        out.append(s[i:i+size])
-        i += size
+def _generate(llm: Any, system: str, user: str) -> Iterator[str]:
+    stream = getattr(llm, "stream", None)
+    if stream is None:
+        yield llm.chat(system, user)
+        return
+    yield from stream(system, user)
+
+
+# Map-reduce writer: each doc is condensed to query-focused notes by parallel
+# LLM calls, then the draft is written from the notes (covers every doc
+# instead of the few chunks that fit one prompt).
+#   WRITER_MODE=auto|single|mapreduce   auto = mapreduce for depth "deep"
+#   MAP_CONCURRENCY=6                   parallel note calls
+#   MAP_DOC_TOKENS=1500                 doc text per note call
+#   MAP_NOTE_TOKENS=250                 max_tokens per note (less when many docs share the budget)
+#   NOTES_MAX_TOKENS=16000              reduce-step context for the notes (not CONTEXT_MAX_TOKENS);
+#                                       the model window still bounds it
+#   MAP_MERGE_TOKENS=4000               notes per merge call when they still overflow: notes
+#                                       are merged (up to 2 passes), never silently dropped
+MAP_CONCURRENCY = int(os.getenv("MAP_CONCURRENCY", "6"))
+MAP_DOC_TOKENS = int(os.getenv("MAP_DOC_TOKENS", "1500"))
+MAP_NOTE_TOKENS = int(os.getenv("MAP_NOTE_TOKENS", "250"))
+NOTES_MAX_TOKENS = int(os.getenv("NOTES_MAX_TOKENS", "16000"))
+MAP_MERGE_TOKENS = int(os.getenv("MAP_MERGE_TOKENS", "4000"))
+_CITE = re.compile(r"\[(\d+)\]")
+
+
+def _map_reduce(state: Dict) -> bool:
+    mode = os.getenv("WRITER_MODE", "auto").lower()
+    if mode in ("single", "mapreduce"):
+        return mode == "mapreduce"
+    return (state.get("depth") or "").lower() == "deep"
+
+
+def _note(q: str, doc: Dict, sid: int, seen: Dict[str, int], model: str, dl: Optional[Deadline] = None,
+          max_tokens: int = MAP_NOTE_TOKENS) -> str:
+    """Condense one doc into cited bullet notes; "" if it has nothing relevant or the call fails."""
+    blocks = pack_context(q, [doc], seen, MAP_DOC_TOKENS, model=model)
+    if not blocks:
+        return ""
+    system = (
+        "You extract evidence for a research question from one source."
+        " Reply with at most 6 short bullet points of facts, figures and claims from the source"
+        f" that help answer the question, each ending with the citation [{sid}]."
+        " Reply NONE if the source has nothing relevant. Never add outside knowledge."
+    )
+    user = f"Question: {q}\n\n" + "\n\n".join(blocks)
+    try:
+        note = LLM(temperature=0.0, max_tokens=max_tokens, deadline=dl).chat(system, user).strip()
+    except Exception as e:
+        log("write", f"note failed for source {sid}: {e}")
+        return ""
+    if not note or note.upper().startswith("NONE"):
+        return ""
+    return f"(Source {sid}: {(doc.get('title') or doc.get('url') or '').strip()})\n{note}"
+
+
+def _map_notes(q: str, docs: List[Dict], seen: Dict[str, int], model: str, dl: Optional[Deadline] = None,
+               budget: int = NOTES_MAX_TOKENS) -> List[str]:
+    """
+    Run _note over every cited doc with bounded concurrency; notes come back in
+    source order, each sized so that all of them together fit `budget`.
+    """
+    jobs = [(d, seen[(d.get("url") or "").strip()]) for d in docs if (d.get("url") or "").strip() in seen]
+    if not jobs:
+        return []
+    note_tokens = max(60, min(MAP_NOTE_TOKENS, budget // len(jobs) - 24))  # 24: "(Source n: title)" + separator
+    workers = max(1, min(MAP_CONCURRENCY, len(jobs)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notes") as pool:
+        notes = list(pool.map(bind(lambda job: _note(q, job[0], job[1], seen, model, dl, note_tokens)), jobs))
+    return [n for n in notes if n]
+
+
+def _merge(q: str, group: List[str], max_tokens: int, dl: Optional[Deadline] = None) -> str:
+    """Condense several notes into one block that keeps every citation; the notes as-is if the call fails."""
+    ids = sorted({int(i) for i in _CITE.findall("\n".join(group))})
+    system = (
+        "You merge evidence notes for a research question."
+        f" Rewrite them as at most {max(4, max_tokens // 40)} dense bullet points, keeping each fact's"
+        " citation [n] exactly as written. Every source cited in the notes must still be cited."
+        " Never add outside knowledge."
+    )
+    user = f"Question: {q}\n\n" + "\n\n".join(group)
+    try:
+        merged = LLM(temperature=0.0, max_tokens=max_tokens, deadline=dl).chat(system, user).strip()
+    except Exception as e:
+        log("write", f"merging notes for sources {ids} failed: {e}")
+        return "\n\n".join(group)
+    return f"(Sources {', '.join(map(str, ids))}: merged notes)\n{merged}" if merged else "\n\n".join(group)
+
+
+def _reduce_notes(q: str, notes: List[str], budget: int, model: str, dl: Optional[Deadline] = None,
+                  separator: str = "\n\n---\n\n", passes: int = 2) -> List[str]:
+    """Merge neighbouring notes (MAP_MERGE_TOKENS per call, in parallel) until they fit `budget`."""
+    sep = count_tokens(separator, model)
+    for _ in range(passes):
+        sizes = [count_tokens(n, model) for n in notes]
+        if sum(sizes) + sep * len(notes) <= budget or len(notes) < 2:
+            break
+        groups: List[List[str]] = [[]]
+        used = 0
+        for note, size in zip(notes, sizes):
+            if groups[-1] and used + size > MAP_MERGE_TOKENS:
+                groups.append([])
+                used = 0
+            groups[-1].append(note)
+            used += size
+        target = max(80, budget // len(groups) - sep - 16)
+        workers = max(1, min(MAP_CONCURRENCY, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="notes") as pool:
+            notes = list(pool.map(bind(lambda g: _merge(q, g, target, dl)), groups))
+        log("write", f"merged {len(sizes)} notes into {len(notes)} to fit a {budget}-token budget")
+    return notes
+
+
+def _fit(blocks: List[str], budget: int, model: str, separator: str = "\n\n---\n\n") -> List[str]:
+    """Keep blocks in order while they fit the token budget."""
+    out, used, sep = [], 0, count_tokens(separator, model)
+    for b in blocks:
+        cost = count_tokens(b, model) + (sep if out else 0)
+        if used + cost > budget:
+            continue
+        out.append(b)
+        used += cost
     return out
 
+
+def _answer_tokens(dl: Deadline, cap: int = 700) -> int:
+    """max_tokens for the answer: `cap`, or what fits in the time left at LLM_TOKENS_PER_S."""
+    if not dl.bounded:
+        return cap
+    return max(120, min(cap, int((dl.remaining() - 1.0) * LLM_TOKENS_PER_S)))
+
+
+def _snippet_answer(docs: List[Dict], seen: Dict[str, int], limit: int = 8) -> str:
+    """Out-of-time answer: cited excerpts we already hold, no LLM call."""
+    lines = []
+    for d in docs:
+        sid = seen.get((d.get("url") or "").strip())
+        text = " ".join((d.get("snippet") or d.get("text") or "").split())
+        if sid and text:
+            lines.append(f"- {text[:300]}{'…' if len(text) > 300 else ''} [{sid}]")
+        if len(lines) >= limit:
+            break
+    return ("_The time budget ran out before a full answer could be written; "
+            "the most relevant excerpts from the sources follow._\n\n" + "\n".join(lines))
+
+
 def write(state: Dict) -> Dict:
-    llm = LLM(temperature=0.2, max_tokens=700)  
+    dl = Deadline.of(state)
+    max_tokens = _answer_tokens(dl)
+    if max_tokens < 700:
+        _degrade(state, "short_answer")
+    llm = LLM(temperature=0.2, max_tokens=max_tokens, deadline=dl)  
     q = state["query"]
+    _emit({"type": "stage", "stage": "write", "status": "start"})
     docs: List[Dict] = state.get("docs", [])
 
     if not docs:
@@ -169,6 +635,7 @@ def write(state: Dict) -> Dict:
             f"# Draft\n\n**Question.** {q}\n\n"
             "I couldn’t fetch any usable sources. Please check API keys/network or try a different query.\n"
         )
+        _emit({"type": "stage", "stage": "write", "status": "done", "chars": 0})
         return state
 
    
@@ -179,24 +646,17 @@ def write(state: Dict) -> Dict:
         if not url or url in seen:
             continue
         seen[url] = idx
-        refs.append(f"[{idx}] {title} — {url}")
+        alts = [u for u in d.get("alt_urls") or [] if u != url]
+        also = f" (also: {', '.join(alts)})" if alts else ""
+        refs.append(f"[{idx}] {title} — {url}{also}")
 
    
-    context_blocks = []
-    for d in docs[:5]:
-        title = d.get("title") or d.get("url")
-        cid = seen.get(d.get("url"))
-        for ch in _chunks(d.get("text",""))[:2]:
-            context_blocks.append(f"(Source {cid}: {title})\n{ch}")
-
-    context = "\n\n---\n\n".join(context_blocks[:8])
-
     system = (
         "You are a careful research writer. Use only the provided context."
         " When asserting facts, add inline citations like [1], [2]."
         " Never invent sources or numbers not present in context."
     )
-    user = f"""Question: {q}
+    template = """Question: {q}
 
 Use ONLY these snippets (may be partial). If you aren't sure, say so briefly.
 
@@ -204,10 +664,56 @@ Use ONLY these snippets (may be partial). If you aren't sure, say so briefly.
 
 Write a clear, self-contained answer (~250–400 words) with inline citations [n].
 End with a short 2–3 bullet 'Key sources' section listing the cited source numbers."""
-    body = llm.chat(system, user)
+
+    model = getattr(llm, "model", None) or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    overhead = count_tokens(system, model) + count_tokens(template.format(q=q, context=""), model)
+    budget = context_budget(model, getattr(llm, "max_tokens", max_tokens), overhead)
+    context_blocks: List[str] = []
+    if _map_reduce(state) and dl.bounded and dl.fraction_left() < 0.5:
+        _degrade(state, "notes_skipped")  # a second round of LLM calls would not fit
+    elif _map_reduce(state):
+        t0 = time.perf_counter()
+        _emit({"type": "stage", "stage": "notes", "status": "start", "docs": len(docs)})
+        notes_budget = context_budget(model, getattr(llm, "max_tokens", max_tokens), overhead, cap=NOTES_MAX_TOKENS)
+        notes = _map_notes(q, docs, seen, model, dl, notes_budget)
+        state["notes"] = notes
+        context_blocks = _fit(_reduce_notes(q, notes, notes_budget, model, dl), notes_budget, model)
+        kept = set(_CITE.findall("\n".join(context_blocks)))
+        dropped = sorted({int(i) for i in _CITE.findall("\n".join(notes))} - {int(i) for i in kept})
+        if dropped:
+            _degrade(state, "notes_dropped")
+            log("write", f"notes for sources {dropped} did not fit the {notes_budget}-token budget")
+        log("write", f"{len(notes)} notes from {len(docs)} docs in {(time.perf_counter() - t0) * 1000:.0f} ms; "
+                     f"{len(context_blocks)} blocks fit a {notes_budget}-token budget")
+        _emit({"type": "stage", "stage": "notes", "status": "done", "notes": len(notes)})
+    if not context_blocks:
+        # Rank chunks from every doc against the question and fill an exact token budget
+        context_blocks = pack_context(q, docs, seen, budget, model=model)
+        log("write", f"packed {len(context_blocks)} chunks into a {budget}-token context budget")
+    context = "\n\n---\n\n".join(context_blocks)
+
+    user = template.format(q=q, context=context)
+    parts: List[str] = []
+    if dl.remaining() >= WRITE_MIN_S:
+        try:
+            for token in _generate(llm, system, user):
+                parts.append(token)
+                _emit({"type": "token", "text": token})
+        except Exception:
+            if not (dl.bounded and dl.remaining() < WRITE_MIN_S):
+                raise  # a real failure, not the budget running out
+        if dl.bounded and dl.expired():
+            _degrade(state, "answer_cut")
+    body = "".join(parts).strip()
+    if not body and dl.bounded and dl.remaining() < WRITE_MIN_S:
+        _degrade(state, "snippets_only")
+        body = _snippet_answer(docs, seen)
+        _emit({"type": "token", "text": body})
 
     refs_md = "\n".join(f"- {r}" for r in refs) if refs else "- (no references)"
     state["draft"] = (
         f"# Draft\n\n**Question.** {q}\n\n{body}\n\n## References\n{refs_md}\n"
     )
+    _emit({"type": "stage", "stage": "write", "status": "done", "chars": len(body),
+           "degraded": list(state.get("degraded") or [])})
     return state
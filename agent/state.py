@@ -5,9 +5,13 @@ from typing import Dict, List, Optional, TypedDict, Any
 class AgentState(TypedDict, total=False):
     query: str                     
     depth: str
+    budget_s: float                # whole-run latency budget (tools/deadline.py)
+    deadline: Dict[str, float]     # {"start", "at"} epoch seconds, set by the first node
+    degraded: List[str]            # shortcuts taken to meet the deadline
     subtasks: List[str]
     search_results: Dict[str, Dict[str, str]]  
     docs: List[Dict[str, str]]                  
+    fetch_stats: List[Dict[str, Any]]
     chunks: List[Dict[str, Any]]
     citations: List[Dict[str, str]]
     notes: List[str]
@@ -5,12 +5,9 @@ from __future__ import annotations
 from tools.env_bootstrap import *  
 
 import sys
-from dotenv import load_dotenv
 
 from agent.graph import app
 
-load_dotenv()
-
 def main():
     q = " ".join(sys.argv[1:]).strip() or "Impacts of microplastics on human health"
     state = {
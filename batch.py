@@ -0,0 +1,205 @@
+# batch.py
+"""
+Run many research questions in one process.
+
+    python batch.py questions.jsonl [--workers 4] [--depth standard] [--out-dir out/batch]
+    cat questions.jsonl | python batch.py -
+
+Each input line is a JSON object {"query": ..., "depth"?: ..., "out"?: ..., "id"?: ...}
+("question"/"prompt" also work) or a bare question. Questions run on a thread
+pool sharing the process-wide HTTP pool, caches and compiled graph. Each draft
+is written as soon as it is done, and one line per question is appended to the
+results JSONL, which doubles as the checkpoint: a restarted batch skips ids
+already recorded as "ok" (use --fresh to redo them).
+"""
+from __future__ import annotations
+
+from tools.env_bootstrap import *
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from tools import telemetry
+
+DEPTHS = ("shallow", "standard", "deep")
+
+
+def _item_id(query: str, depth: str) -> str:
+    return hashlib.sha1(f"{depth}\n{query}".encode("utf-8")).hexdigest()[:12]
+
+
+def read_items(lines: Iterable[str], default_depth: str = "standard") -> List[Dict[str, Any]]:
+    """Parse JSONL (or bare-question) lines into {id, query, depth, out} items; duplicates are dropped."""
+    items, seen = [], set()
+    for n, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            obj = json.loads(line)
+        except json.JSONDecodeError:
+            obj = line
+        if isinstance(obj, str):
+            obj = {"query": obj}
+        if not isinstance(obj, dict):
+            print(f"BATCH: line {n}: expected an object or a question; skipped", flush=True)
+            continue
+        query = (obj.get("query") or obj.get("question") or obj.get("prompt") or "").strip()
+        if not query:
+            print(f"BATCH: line {n}: no query; skipped", flush=True)
+            continue
+        depth = obj.get("depth") or default_depth
+        if depth not in DEPTHS:
+            print(f"BATCH: line {n}: unknown depth {depth!r}; using {default_depth}", flush=True)
+            depth = default_depth
+        item_id = str(obj.get("id") or _item_id(query, depth))
+        if item_id in seen:
+            continue
+        seen.add(item_id)
+        items.append({"id": item_id, "query": query, "depth": depth, "out": obj.get("out")})
+    return items
+
+
+def finished_ids(results_path: Path) -> Set[str]:
+    done: Set[str] = set()
+    if not results_path.exists():
+        return done
+    for line in results_path.read_text(encoding="utf-8").splitlines():
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # torn last line from a killed run
+        if rec.get("status") == "ok":
+            done.add(rec.get("id"))
+    return done
+
+
+def run_item(graph: Any, item: Dict[str, Any], out_dir: Path) -> Dict[str, Any]:
+    """Run one question; returns its results record (never raises)."""
+    state = {"query": item["query"], "depth": item["depth"]}
+    rec: Dict[str, Any] = {"id": item["id"], "query": item["query"], "depth": item["depth"]}
+    stages: Dict[str, float] = {}
+    t0 = last = time.perf_counter()
+    final: Dict[str, Any] = dict(state)
+    try:
+        with telemetry.run_scope(item["id"]):  # trace records of this question carry its id
+            for mode, chunk in graph.stream(state, stream_mode=["updates", "values"]):
+                if mode == "updates":
+                    now = time.perf_counter()
+                    for node in chunk:
+                        stages[node] = round(stages.get(node, 0.0) + now - last, 3)
+                    last = now
+                else:
+                    final = chunk
+        draft = final.get("draft") or "# Empty draft\n"
+        out = Path(item.get("out") or out_dir / f"{item['id']}.md")
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(draft, encoding="utf-8")
+        rec.update(status="ok", out=str(out), docs=len(final.get("docs") or []))
+        if final.get("degraded"):
+            rec["degraded"] = final["degraded"]
+    except Exception as e:
+        rec.update(status="error", error=f"{type(e).__name__}: {e}")
+    rec.update(seconds=round(time.perf_counter() - t0, 3), stages=stages)
+    return rec
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def run_batch(
+    items: List[Dict[str, Any]],
+    results_path: Path,
+    out_dir: Path,
+    workers: int = 4,
+    fresh: bool = False,
+    graph: Optional[Any] = None,
+) -> Dict[str, Any]:
+    if graph is None:
+        from agent.graph import app as graph
+
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    if fresh and results_path.exists():
+        results_path.unlink()
+    done = finished_ids(results_path)
+    todo = [it for it in items if it["id"] not in done]
+    print(f"BATCH: {len(items)} questions, {len(items) - len(todo)} already done, {len(todo)} to run "
+          f"on {workers} workers", flush=True)
+
+    lock = threading.Lock()
+    records: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    with results_path.open("a", encoding="utf-8") as fh, ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = {pool.submit(run_item, graph, it, out_dir): it for it in todo}
+        for f in as_completed(futures):
+            rec = f.result()
+            with lock:
+                fh.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                fh.flush()
+                records.append(rec)
+            mark = "✅" if rec["status"] == "ok" else "❌"
+            print(f"BATCH: {mark} [{len(records)}/{len(todo)}] {rec['seconds']:.1f}s {rec['query'][:70]}"
+                  + (f" ({rec['error']})" if rec["status"] != "ok" else ""), flush=True)
+    wall = time.perf_counter() - t0
+
+    ok = [r["seconds"] for r in records if r["status"] == "ok"]
+    summary = {
+        "questions": len(items),
+        "skipped": len(items) - len(todo),
+        "ok": len(ok),
+        "failed": len(records) - len(ok),
+        "wall_seconds": round(wall, 2),
+        "questions_per_minute": round(len(ok) / wall * 60.0, 2) if wall > 0 else 0.0,
+        "p50_seconds": round(_percentile(ok, 0.5), 2),
+        "p95_seconds": round(_percentile(ok, 0.95), 2),
+    }
+    return summary
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description="Deep Research batch mode")
+    p.add_argument("input", help="JSONL file of questions, or - for stdin")
+    p.add_argument("--depth", choices=DEPTHS, default="standard", help="default depth for items without one")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--out-dir", default="out/batch")
+    p.add_argument("--results", default=None, help="results JSONL (default: <out-dir>/results.jsonl)")
+    p.add_argument("--fresh", action="store_true", help="ignore the checkpoint and rerun everything")
+    p.add_argument("--no-cache", action="store_true", help="bypass the scrape, search and LLM response caches")
+    p.add_argument("--budget", type=float, metavar="SECONDS", help="per-question time budget (RUN_BUDGET_S)")
+    args = p.parse_args()
+
+    if args.budget:
+        os.environ["RUN_BUDGET_S"] = str(args.budget)
+
+    if args.no_cache:
+        os.environ["SCRAPE_CACHE"] = "0"
+        os.environ["SEARCH_CACHE"] = "0"
+        os.environ["LLM_CACHE"] = "0"
+
+    if args.input == "-":
+        items = read_items(sys.stdin, args.depth)
+    else:
+        with open(args.input, encoding="utf-8") as fh:
+            items = read_items(fh, args.depth)
+
+    out_dir = Path(args.out_dir)
+    results = Path(args.results) if args.results else out_dir / "results.jsonl"
+    summary = run_batch(items, results, out_dir, workers=args.workers, fresh=args.fresh)
+    print("BATCH: summary " + json.dumps(summary), flush=True)
+    print(f"✅ Results in {results.resolve()}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,234 @@
+# bench/bench_e2e.py
+"""
+Offline end-to-end benchmark: the real graph and cli.py against the local
+stand-ins in bench/stubs.py (web corpus, Tavily/SerpAPI, OpenAI).
+
+    python -m bench.bench_e2e [--questions 8] [--concurrency 2] [--depth standard]
+                              [--latency-ms 40] [--slow-pct 10] [--fail-pct 5] [--page-kb 0]
+                              [--search-down tavily] [--budget SECONDS]
+                              [--cli-runs 1] [--warm] [--save NAME] [--compare NAME]
+
+Reports per-span p50/p95 (graph nodes, tools, LLM calls; via tools.telemetry),
+per-question latency and questions per minute, peak RSS, and bytes moved.
+--save writes bench/baselines/NAME.json (with the git commit); --compare NAME
+prints the current run against that baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List
+
+from bench.stubs import StubConfig, Stubs
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINES = Path(__file__).with_name("baselines")
+
+QUESTIONS = [
+    "Impacts of microplastics on human health",
+    "How does quantum annealing differ from gate-model quantum computing",
+    "Evidence on carbon pricing and emissions reductions",
+    "Risk factors for population mortality in heat waves",
+    "Does ocean sediment store microplastic polymers long term",
+    "Error correction approaches for superconducting qubits",
+    "Uncertainty in climate policy scenario models",
+    "Bias in randomised trial outcome measurement",
+]
+
+
+def _pct(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+def _rss_mb(who: int = resource.RUSAGE_SELF) -> float:
+    kb = resource.getrusage(who).ru_maxrss
+    return round(kb / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip()
+    except Exception:
+        return ""
+
+
+def run_graph(questions: List[str], depth: str, concurrency: int, budget: float = 0.0) -> Dict[str, Any]:
+    """Run the compiled graph over the questions; returns latency, span and byte stats."""
+    from agent.graph import app
+    from tools import http_pool, telemetry
+    from tools.scrape import download_stats
+    from tools.search import search_backend_stats
+
+    spans: Dict[str, List[float]] = {}
+    lock = threading.Lock()
+
+    def collect(record: Dict[str, Any]) -> None:
+        if record.get("kind") == "span":
+            with lock:
+                spans.setdefault(record["name"], []).append(record["ms"])
+
+    telemetry.configure(enabled=True, quiet=True)
+    telemetry.add_exporter(collect)
+    before = download_stats()
+
+    def one(q: str) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        state: Dict[str, Any] = {"query": q, "depth": depth}
+        if budget:
+            state["budget_s"] = budget
+        out = app.invoke(state)
+        return {"seconds": time.perf_counter() - t0, "docs": len(out.get("docs") or []),
+                "draft_chars": len(out.get("draft") or ""), "degraded": bool(out.get("degraded"))}
+
+    t0 = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            runs = list(pool.map(one, questions))
+    finally:
+        telemetry.remove_exporter(collect)
+        telemetry.configure(enabled=False, quiet=False)
+    wall = time.perf_counter() - t0
+
+    after = download_stats()
+    secs = [r["seconds"] for r in runs]
+    return {
+        "wall_s": round(wall, 3),
+        "questions_per_minute": round(len(runs) / wall * 60.0, 2),
+        "question_p50_s": round(_pct(secs, 0.5), 3),
+        "question_p95_s": round(_pct(secs, 0.95), 3),
+        "docs_per_question": round(statistics.mean(r["docs"] for r in runs), 2),
+        "empty_drafts": sum(1 for r in runs if r["draft_chars"] == 0),
+        "degraded_runs": sum(1 for r in runs if r["degraded"]),
+        "spans": {
+            name: {"n": len(v), "p50_ms": round(_pct(v, 0.5), 1), "p95_ms": round(_pct(v, 0.95), 1)}
+            for name, v in sorted(spans.items())
+        },
+        "bytes_downloaded": after["bytes_downloaded"] - before["bytes_downloaded"],
+        "http_pool": {k: v for k, v in http_pool.pool_stats().items() if k != "per_host"},
+        "search_backends": search_backend_stats(),
+    }
+
+
+def run_cli(question: str, depth: str, env: Dict[str, str], runs: int) -> Dict[str, Any]:
+    """Time `python cli.py` end to end (includes interpreter start-up and imports)."""
+    times, failures = [], 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(runs):
+            t0 = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "cli.py", question, "--depth", depth, "--out", str(Path(tmp) / f"{i}.md")],
+                cwd=ROOT, env=env, capture_output=True, text=True, timeout=300,
+            )
+            times.append(time.perf_counter() - t0)
+            failures += int(proc.returncode != 0)
+    return {
+        "runs": runs,
+        "failures": failures,
+        "p50_s": round(_pct(times, 0.5), 3),
+        "p95_s": round(_pct(times, 0.95), 3),
+        "peak_rss_mb": _rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for k, v in report.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = float(v)
+    return out
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    cur, base = _flatten(current["results"]), _flatten(baseline["results"])
+    print(f"\n{'metric':<48}{'baseline':>12}{'current':>12}{'change':>9}")
+    for key in sorted(set(cur) & set(base)):
+        if key.startswith(("graph.http_pool.", "graph.search_backends.")):
+            continue
+        b, c = base[key], cur[key]
+        change = f"{(c - b) / b * 100:+.0f}%" if b else ""
+        print(f"{key:<48}{b:>12g}{c:>12g}{change:>9}")
+    print(f"(baseline {baseline.get('name')} @ {baseline.get('commit') or '?'})")
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--questions", type=int, default=8)
+    p.add_argument("--concurrency", type=int, default=2)
+    p.add_argument("--depth", choices=["shallow", "standard", "deep"], default="standard")
+    p.add_argument("--hosts", type=int, default=8)
+    p.add_argument("--latency-ms", type=float, default=40.0)
+    p.add_argument("--slow-pct", type=float, default=10.0)
+    p.add_argument("--slow-ms", type=float, default=1500.0)
+    p.add_argument("--fail-pct", type=float, default=5.0)
+    p.add_argument("--page-kb", type=int, default=0)
+    p.add_argument("--llm-ttft-ms", type=float, default=150.0)
+    p.add_argument("--search-down", default="", help="search backends answering 503, e.g. tavily")
+    p.add_argument("--budget", type=float, default=0.0, help="per-question time budget in seconds (0 = none)")
+    p.add_argument("--cli-runs", type=int, default=1, help="0 skips the cli.py measurement")
+    p.add_argument("--warm", action="store_true", help="keep caches on and measure a second, warm pass")
+    p.add_argument("--save", metavar="NAME")
+    p.add_argument("--compare", metavar="NAME")
+    args = p.parse_args()
+
+    config = StubConfig(
+        hosts=args.hosts, latency_ms=args.latency_ms, slow_pct=args.slow_pct, slow_ms=args.slow_ms,
+        fail_pct=args.fail_pct, page_kb=args.page_kb, llm_ttft_ms=args.llm_ttft_ms,
+        search_down=args.search_down,
+    )
+    questions = [QUESTIONS[i % len(QUESTIONS)] + (f" ({i // len(QUESTIONS)})" if i >= len(QUESTIONS) else "")
+                 for i in range(args.questions)]
+
+    with Stubs(config) as stubs, tempfile.TemporaryDirectory() as cache_dir:
+        env = dict(os.environ, **stubs.env(), CACHE_DIR=cache_dir)
+        if not args.warm:
+            env.update(SCRAPE_CACHE="0", SEARCH_CACHE="0", LLM_CACHE="0", EMBED_CACHE="0")
+        os.environ.update(env)
+
+        graph = run_graph(questions, args.depth, args.concurrency, args.budget)
+        if args.warm:
+            graph = {"cold": graph, "warm": run_graph(questions, args.depth, args.concurrency, args.budget)}
+        cli = run_cli(questions[0], args.depth, env, args.cli_runs) if args.cli_runs else {}
+        stub_stats = stubs.stats()
+
+    report = {
+        "name": args.save or "",
+        "commit": _commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "params": {"questions": args.questions, "concurrency": args.concurrency, "depth": args.depth, "budget": args.budget,
+                   "warm": args.warm, "stubs": config.as_dict()},
+        "results": {"graph": graph, "cli": cli, "stubs": stub_stats, "peak_rss_mb": _rss_mb()},
+    }
+    print(json.dumps(report["results"], indent=2))
+
+    if args.compare:
+        path = BASELINES / f"{args.compare}.json"
+        if path.exists():
+            compare(report, json.loads(path.read_text(encoding="utf-8")))
+        else:
+            print(f"⚠️ no baseline at {path}")
+    if args.save:
+        BASELINES.mkdir(parents=True, exist_ok=True)
+        path = BASELINES / f"{args.save}.json"
+        path.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+        print(f"✅ Saved baseline {path}")
+
+
+if __name__ == "__main__":
+    main()
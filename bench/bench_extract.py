@@ -0,0 +1,67 @@
+# bench/bench_extract.py
+"""
+Benchmark the tools.extract engines on the fixed corpus (bench/corpus.py).
+
+    python -m bench.bench_extract [--extractors lxml,bs4,trafilatura,readability]
+                                  [--max-chars 10000] [--repeat 5]
+
+Reports median wall time per page, peak Python-heap allocation (tracemalloc;
+memory lxml allocates in C is not counted) and output size for each
+extractor, with the original BeautifulSoup path (bs4) as the baseline.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+import tracemalloc
+
+from bench.corpus import load_corpus
+from tools.extract import EXTRACTORS, _REGISTRY
+
+
+def _measure(fn, html: str, max_chars, repeat: int):
+    times = []
+    out = {}
+    for _ in range(repeat):
+        t = time.perf_counter()
+        out = fn(html, max_chars)
+        times.append(time.perf_counter() - t)
+    tracemalloc.start()
+    fn(html, max_chars)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return statistics.median(times), peak, out
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--extractors", default=",".join(EXTRACTORS))
+    p.add_argument("--max-chars", type=int, default=10000, help="0 = no budget")
+    p.add_argument("--repeat", type=int, default=5)
+    args = p.parse_args()
+
+    corpus = load_corpus()
+    max_chars = args.max_chars or None
+    names = [n.strip() for n in args.extractors.split(",") if n.strip()]
+    base = {}
+
+    print(f"{'page':<18}{'size':>9}  {'extractor':<12}{'median ms':>10}{'py MB':>9}{'chars':>8}{'vs bs4':>8}")
+    for page, html in corpus.items():
+        for name in ["bs4"] + [n for n in names if n != "bs4"]:
+            try:
+                secs, peak, out = _measure(_REGISTRY[name], html, max_chars, args.repeat)
+            except ImportError:
+                print(f"{page:<18}{'':>9}  {name:<12}{'(not installed)':>10}")
+                continue
+            if name == "bs4":
+                base[page] = secs
+            speedup = base[page] / secs if secs else float("inf")
+            print(
+                f"{page:<18}{len(html) / 1024:>7.0f}KB  {name:<12}{secs * 1e3:>10.1f}"
+                f"{peak / 2**20:>9.1f}{len(out.get('text', '')):>8}{speedup:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# bench/bench_startup.py
+"""
+Start-up profile: wall time of short entry points and the heaviest imports.
+
+    python -m bench.bench_startup [--repeat 3] [--top 15]
+
+Each command runs in a fresh interpreter; the median of --repeat runs is
+reported. The import table comes from `python -X importtime` for `import cli`
+followed by first use of the compiled graph, as self time summed per
+top-level package.
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "cli.py --help": [sys.executable, "cli.py", "--help"],
+    "import cli": [sys.executable, "-c", "import cli"],
+    "graph ready": [sys.executable, "-c", "from agent.graph import app; app.get_graph()"],
+    "pytest --collect-only": [sys.executable, "-m", "pytest", "--collect-only", "-q", "-p", "no:cacheprovider"],
+}
+
+
+def _time(cmd: List[str], repeat: int) -> float:
+    runs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, capture_output=True, check=False)
+        runs.append(time.perf_counter() - t0)
+    return statistics.median(runs)
+
+
+def import_profile() -> Dict[str, int]:
+    """Import time (us, self time summed per top-level package) for cli start-up plus graph build."""
+    code = "import cli\nfrom agent.graph import app\napp.get_graph()"
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, capture_output=True, text=True)
+    totals: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        own, _, name = line.split("|", 2)
+        own = own.replace("import time:", "").strip()
+        if not own.isdigit():
+            continue  # header line
+        pkg = name.strip().split(".")[0]
+        totals[pkg] = totals.get(pkg, 0) + int(own)
+    return dict(sorted(totals.items(), key=lambda kv: kv[1], reverse=True))
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--top", type=int, default=15)
+    args = p.parse_args()
+
+    print(f"{'command':<26}{'median s':>10}")
+    for name, cmd in COMMANDS.items():
+        print(f"{name:<26}{_time(cmd, args.repeat):>10.2f}")
+
+    profile = import_profile()
+    print(f"\n{'top-level import':<26}{'ms':>10}")
+    for pkg, us in list(profile.items())[: args.top]:
+        print(f"{pkg:<26}{us / 1000:>10.0f}")
+    print(f"{'total':<26}{sum(profile.values()) / 1000:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
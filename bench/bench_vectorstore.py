@@ -0,0 +1,85 @@
+# bench/bench_vectorstore.py
+"""
+Micro-benchmark: VectorStore insert + query scaling vs. the original
+vstack / renormalise-per-query / full-argsort implementation.
+
+    python -m bench.bench_vectorstore [--sizes 1000,5000,20000] [--dim 1536]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+os.environ.setdefault("OPENAI_API_KEY", "bench")  # the client is never called here
+
+from tools.vectorestore import VectorStore, _topk_rows
+
+
+class _Baseline:
+    """The pre-optimisation algorithm, kept verbatim for comparison."""
+
+    def __init__(self, dim: int) -> None:
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+
+    def add(self, vecs: np.ndarray) -> None:
+        self.vectors = vecs if self.vectors.size == 0 else np.vstack([self.vectors, vecs])
+
+    def topk(self, q: np.ndarray, k: int):
+        A = self.vectors / (np.linalg.norm(self.vectors, axis=1, keepdims=True) + 1e-8)
+        qn = q / (np.linalg.norm(q) + 1e-8)
+        sims = A @ qn
+        return np.argsort(-sims)[:k]
+
+
+def _run(n: int, dim: int, batch: int, queries: int, k: int) -> None:
+    rng = np.random.default_rng(0)
+    data = rng.standard_normal((n, dim), dtype=np.float32)
+    Q = rng.standard_normal((queries, dim), dtype=np.float32)
+
+    base = _Baseline(dim)
+    t = time.perf_counter()
+    for i in range(0, n, batch):
+        base.add(data[i : i + batch])
+    base_add = time.perf_counter() - t
+    t = time.perf_counter()
+    for q in Q:
+        base.topk(q, k)
+    base_q = (time.perf_counter() - t) / queries
+
+    vs = VectorStore(dim=dim)
+    t = time.perf_counter()
+    for i in range(0, n, batch):
+        vs.add_vectors(data[i : i + batch], [""] * len(data[i : i + batch]))
+    new_add = time.perf_counter() - t
+    t = time.perf_counter()
+    for q in Q:
+        vs._cosine_topk(q, k)
+    new_q = (time.perf_counter() - t) / queries
+    t = time.perf_counter()
+    sims = Q @ vs.vectors.T
+    _topk_rows(sims, k)
+    many_q = (time.perf_counter() - t) / queries
+
+    print(
+        f"n={n:>7}  add: {base_add*1e3:9.1f} ms -> {new_add*1e3:8.1f} ms   "
+        f"query: {base_q*1e3:8.2f} ms -> {new_q*1e3:7.2f} ms  (batched {many_q*1e3:6.2f} ms/q)"
+    )
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sizes", default="1000,5000,20000")
+    p.add_argument("--dim", type=int, default=1536)
+    p.add_argument("--batch", type=int, default=16, help="texts per add() call")
+    p.add_argument("--queries", type=int, default=32)
+    p.add_argument("-k", type=int, default=5)
+    args = p.parse_args()
+    for n in (int(s) for s in args.sizes.split(",")):
+        _run(n, args.dim, args.batch, args.queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+# bench/corpus.py
+"""
+Fixed corpus of realistic HTML pages for the benchmarks.
+
+Pages are generated deterministically (seeded) the first time and saved under
+bench/corpus/, so every run and every commit measures the same bytes. The mix
+mirrors what browse() meets in practice: a news article buried in navigation,
+ads and inline scripts; a documentation page with code and tables; a very long
+encyclopedia-style page; a forum thread; and a bare page with no <main>.
+"""
+from __future__ import annotations
+
+import json
+import random
+from pathlib import Path
+from typing import Dict, List
+
+CORPUS_DIR = Path(__file__).with_name("corpus")
+
+_WORDS = (
+    "microplastics exposure health particles study cohort analysis evidence tissue human "
+    "inflammation polymer ocean sediment ingestion toxicity dose response meta review "
+    "quantum annealing gate model qubit error correction circuit energy landscape Ising "
+    "climate policy emissions carbon model scenario uncertainty sampling confidence trial "
+    "randomised outcome mortality risk factor population survey measurement bias the of and "
+    "in to a is that for with as was on by are be this which from at or an were their"
+).split()
+
+
+def _sentence(rng: random.Random, lo: int = 8, hi: int = 24) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(lo, hi))]
+    return " ".join(words).capitalize() + rng.choice([".", ".", ".", "?", ";"])
+
+
+def _para(rng: random.Random, n: int) -> str:
+    return "<p>" + " ".join(_sentence(rng) for _ in range(n)) + "</p>"
+
+
+def _nav(rng: random.Random, links: int) -> str:
+    items = "".join(f'<li><a href="/section/{i}">{rng.choice(_WORDS).title()} {i}</a></li>' for i in range(links))
+    return f'<nav class="site-nav"><ul>{items}</ul></nav>'
+
+
+def _script(rng: random.Random, kb: int) -> str:
+    blob = json.dumps({"state": [{"id": i, "v": rng.random(), "t": _sentence(rng)} for i in range(kb * 8)]})
+    return f"<script>window.__STATE__ = {blob};</script>"
+
+
+def _page(title: str, head_extra: str, body: str) -> str:
+    return (
+        "<!DOCTYPE html><html lang=\"en\"><head><meta charset=\"utf-8\">"
+        f"<title>{title}</title>{head_extra}"
+        "<style>body{font-family:sans-serif} .ad{display:none}</style></head>"
+        f"<body>{body}</body></html>"
+    )
+
+
+def _news(rng: random.Random) -> str:
+    ads = "".join(f'<div class="ad"><script>loadAd({i})</script></div>' for i in range(20))
+    article = "".join(_para(rng, rng.randint(3, 7)) for _ in range(25))
+    body = (
+        f"<header>{_nav(rng, 60)}</header>{ads}"
+        f"<main><article><h1>Microplastics found in human tissue</h1>{article}</article></main>"
+        f"<aside>{_nav(rng, 30)}</aside><footer>{_nav(rng, 40)}<p>© News Corp</p></footer>"
+        f"{_script(rng, 120)}"
+    )
+    return _page("Microplastics found in human tissue | News", _script(rng, 40), body)
+
+
+def _docs(rng: random.Random) -> str:
+    sections = []
+    for s in range(12):
+        rows = "".join(
+            f"<tr><td>{rng.choice(_WORDS)}</td><td>{rng.randint(0, 999)}</td><td>{_sentence(rng, 3, 6)}</td></tr>"
+            for _ in range(15)
+        )
+        code = "\n".join(f"    result_{i} = anneal(model, steps={rng.randint(10, 999)})" for i in range(10))
+        sections.append(
+            f"<section><h2>Section {s}</h2>{_para(rng, 4)}<pre><code>{code}</code></pre>"
+            f"<table><tbody>{rows}</tbody></table>{_para(rng, 3)}</section>"
+        )
+    body = f"<header>{_nav(rng, 25)}</header><main>{''.join(sections)}</main><footer>{_nav(rng, 10)}</footer>"
+    return _page("Annealer SDK reference", "", body)
+
+
+def _encyclopedia(rng: random.Random) -> str:
+    content = "".join(f"<h2>{_sentence(rng, 2, 4)}</h2>" + _para(rng, rng.randint(4, 9)) for _ in range(900))
+    body = f"<header>{_nav(rng, 40)}</header><main><div id=\"content\">{content}</div></main>{_script(rng, 60)}"
+    return _page("Quantum annealing - Encyclopedia", "", body)
+
+
+def _forum(rng: random.Random) -> str:
+    posts = "".join(
+        f'<div class="post"><div class="author">user{rng.randint(1, 9999)}</div>'
+        f'<div class="body">{_para(rng, rng.randint(1, 4))}</div><div class="sig">{_sentence(rng, 3, 6)}</div></div>'
+        for _ in range(150)
+    )
+    body = f"<header>{_nav(rng, 30)}</header><main><div class=\"thread\">{posts}</div></main><footer>{_nav(rng, 20)}</footer>"
+    return _page("Thread: is annealing really quantum?", _script(rng, 20), body)
+
+
+def _bare(rng: random.Random) -> str:
+    body = "<div id=\"wrap\">" + "".join(_para(rng, 5) for _ in range(30)) + "</div>"
+    return _page("Plain report", "", body)
+
+
+_GENERATORS = {
+    "news.html": _news,
+    "docs.html": _docs,
+    "encyclopedia.html": _encyclopedia,
+    "forum.html": _forum,
+    "bare.html": _bare,
+}
+
+
+KINDS = tuple(name.split(".")[0] for name in _GENERATORS)
+
+
+def render_page(kind: str, seed: int) -> str:
+    """One page of the given kind with seed-specific text (same structure, different words)."""
+    return _GENERATORS[f"{kind}.html"](random.Random(seed))
+
+
+def build_corpus(directory: Path = CORPUS_DIR) -> List[Path]:
+    """Write the corpus if missing; returns the page paths in a fixed order."""
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, (name, gen) in enumerate(_GENERATORS.items()):
+        path = directory / name
+        if not path.exists():
+            path.write_text(gen(random.Random(1000 + i)), encoding="utf-8")
+        paths.append(path)
+    return paths
+
+
+def load_corpus(directory: Path = CORPUS_DIR) -> Dict[str, str]:
+    return {p.name: p.read_text(encoding="utf-8") for p in build_corpus(directory)}
+
+
+if __name__ == "__main__":
+    for p in build_corpus():
+        print(f"{p.stat().st_size / 1024:8.1f} KB  {p}")
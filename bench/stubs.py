@@ -0,0 +1,337 @@
+# bench/stubs.py
+"""
+Local stand-ins for everything the pipeline talks to, so end-to-end runs are
+offline and repeatable:
+
+  web      corpus pages (bench/corpus.py generators, seeded per URL) served on
+           several loopback addresses (127.0.0.2, 127.0.0.3, ...) so they look
+           like distinct hosts, with injected latency, slow hosts, failures
+           and padding
+  search   Tavily-compatible POST /tavily/search and SerpAPI-compatible
+           GET /serpapi/search, returning links into the web stand-in
+  llm      OpenAI-compatible POST /v1/chat/completions (streaming and not),
+           with time-to-first-token and per-token delays and usage counts
+
+    with Stubs(StubConfig(latency_ms=50, fail_pct=5)) as stubs:
+        os.environ.update(stubs.env())
+        ...
+
+Every response is a deterministic function of the request and the config, so
+two runs of the same benchmark see the same bytes.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import socket
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from bench.corpus import KINDS, render_page
+
+
+class StubConfig:
+    def __init__(
+        self,
+        hosts: int = 8,
+        latency_ms: float = 40.0,
+        slow_pct: float = 10.0,
+        slow_ms: float = 1500.0,
+        fail_pct: float = 5.0,
+        page_kb: int = 0,
+        search_ms: float = 120.0,
+        search_down: str = "",
+        llm_ttft_ms: float = 150.0,
+        llm_token_ms: float = 2.0,
+        llm_tokens: int = 300,
+    ) -> None:
+        self.hosts = hosts  # distinct web hosts
+        self.latency_ms = latency_ms  # per page, +-50% jitter
+        self.slow_pct = slow_pct  # share of URLs that take slow_ms instead
+        self.slow_ms = slow_ms
+        self.fail_pct = fail_pct  # share of URLs answering 503
+        self.page_kb = page_kb  # pad pages to at least this size (0 = as generated)
+        self.search_ms = search_ms
+        self.search_down = search_down  # comma-separated backends answering 503 (tavily,serpapi)
+        self.llm_ttft_ms = llm_ttft_ms
+        self.llm_token_ms = llm_token_ms
+        self.llm_tokens = llm_tokens  # completion length cap
+
+    def as_dict(self) -> Dict[str, Any]:
+        return dict(vars(self))
+
+
+def _h(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+@lru_cache(maxsize=256)
+def _page(kind: str, seed: int, page_kb: int) -> bytes:
+    html = render_page(kind, seed)
+    if page_kb and len(html) < page_kb * 1024:
+        pad = "<script>/*" + "x" * (page_kb * 1024 - len(html)) + "*/</script>"
+        html = html.replace("</body>", pad + "</body>")
+    return html.encode("utf-8")
+
+
+class _Counters:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.data: Dict[str, int] = {}
+
+    def add(self, **kw: int) -> None:
+        with self.lock:
+            for k, v in kw.items():
+                self.data[k] = self.data.get(k, 0) + v
+
+    def snapshot(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.data)
+
+
+_WORD = re.compile(r"[A-Za-z]{4,}")
+
+
+def _completion(system: str, user: str, limit: int) -> str:
+    """Deterministic answer citing the sources present in the prompt."""
+    if "search-engine queries" in system:
+        q = user.split("\n", 1)[0].replace("Question:", "").strip()
+        return "\n".join(f"{q} {facet}" for facet in ("evidence", "review", "statistics", "criticism", "history"))
+    sources = sorted({int(n) for n in re.findall(r"\(Source (\d+)", user)}) or [1]
+    words = _WORD.findall(user)[-400:] or ["evidence"]
+    out: List[str] = []
+    for i in range(limit // 12):
+        sid = sources[i % len(sources)]
+        chunk = " ".join(words[(i * 7) % len(words) : (i * 7) % len(words) + 9])
+        out.append(f"{chunk.capitalize()} [{sid}].")
+    return " ".join(out)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        pass  # clients hanging up mid-response (cancelled fetches) are expected
+
+
+class Stubs:
+    """Starts the API server (search + LLM) and one web server per host; use as a context manager."""
+
+    def __init__(self, config: Optional[StubConfig] = None) -> None:
+        self.config = config or StubConfig()
+        self.counters = _Counters()
+        self._servers: List[ThreadingHTTPServer] = []
+        self.web_hosts: List[str] = []
+        self.api_url = ""
+
+    # -- lifecycle -----------------------------------------------------------------
+    def __enter__(self) -> "Stubs":
+        self.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+    def start(self) -> None:
+        api = self._serve("127.0.0.1", self._api_handler())
+        self.api_url = f"http://127.0.0.1:{api.server_port}"
+        handler = self._web_handler()
+        for i in range(self.config.hosts):
+            try:
+                srv = self._serve(f"127.0.0.{i + 2}", handler)
+                self.web_hosts.append(f"127.0.0.{i + 2}:{srv.server_port}")
+            except OSError:  # no 127/8 aliases (macOS): fall back to one address, many ports
+                srv = self._serve("127.0.0.1", handler)
+                self.web_hosts.append(f"localhost:{srv.server_port}")
+
+    def stop(self) -> None:
+        for srv in self._servers:
+            srv.shutdown()
+            srv.server_close()
+        self._servers.clear()
+
+    def _serve(self, host: str, handler: type) -> ThreadingHTTPServer:
+        srv = _Server((host, 0), handler)
+        srv.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        self._servers.append(srv)
+        return srv
+
+    def env(self) -> Dict[str, str]:
+        """Environment pointing the pipeline at the stand-ins."""
+        return {
+            "TAVILY_API_KEY": "stub",
+            "TAVILY_URL": f"{self.api_url}/tavily/search",
+            "SERPAPI_API_KEY": "stub",
+            "SERPAPI_URL": f"{self.api_url}/serpapi/search",
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_BASE_URL": f"{self.api_url}/v1",
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return self.counters.snapshot()
+
+    # -- search --------------------------------------------------------------------
+    def results(self, query: str, k: int) -> List[Dict[str, str]]:
+        out = []
+        for i in range(k):
+            seed = _h(f"{query}|{i}")
+            kind = KINDS[seed % len(KINDS)]
+            host = self.web_hosts[seed % len(self.web_hosts)]
+            slug = re.sub(r"\W+", "-", query.lower()).strip("-")[:40]
+            out.append({
+                "title": f"{query.title()} — {kind} {i + 1}",
+                "url": f"http://{host}/{kind}/{slug}-{seed % 100000}.html",
+                "snippet": f"{kind.title()} page {i + 1} about {query}.",
+            })
+        return out
+
+    # -- handlers ------------------------------------------------------------------
+    def _api_handler(self) -> type:
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def _json(self, obj: Any, status: int = 200) -> None:
+                body = json.dumps(obj).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+                stubs.counters.add(api_bytes=len(body))
+
+            def _body(self) -> Dict[str, Any]:
+                n = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(n) or b"{}")
+
+            def do_GET(self) -> None:
+                parts = urlsplit(self.path)
+                if parts.path == "/serpapi/search":
+                    qs = parse_qs(parts.query)
+                    q, k = qs.get("q", [""])[0], int(qs.get("num", ["6"])[0])
+                    time.sleep(stubs.config.search_ms / 1000.0)
+                    stubs.counters.add(search_requests=1)
+                    if "serpapi" in stubs.config.search_down:
+                        return self._json({"error": "unavailable"}, 503)
+                    items = stubs.results(q, k)
+                    self._json({"organic_results": [
+                        {"title": r["title"], "link": r["url"], "snippet": r["snippet"]} for r in items
+                    ]})
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def do_POST(self) -> None:
+                path = urlsplit(self.path).path
+                req = self._body()
+                if path == "/tavily/search":
+                    time.sleep(stubs.config.search_ms / 1000.0)
+                    stubs.counters.add(search_requests=1)
+                    if "tavily" in stubs.config.search_down:
+                        return self._json({"error": "unavailable"}, 503)
+                    items = stubs.results(req.get("query", ""), int(req.get("max_results") or 6))
+                    self._json({"results": [
+                        {"title": r["title"], "url": r["url"], "content": r["snippet"]} for r in items
+                    ]})
+                elif path.endswith("/chat/completions"):
+                    self._chat(req)
+                else:
+                    self._json({"error": "not found"}, 404)
+
+            def _chat(self, req: Dict[str, Any]) -> None:
+                msgs = req.get("messages") or []
+                system = next((m["content"] for m in msgs if m.get("role") == "system"), "")
+                user = next((m["content"] for m in msgs if m.get("role") == "user"), "")
+                limit = min(int(req.get("max_tokens") or 500), stubs.config.llm_tokens)
+                text = _completion(system, user, limit)
+                tokens = text.split(" ")
+                usage = {"prompt_tokens": (len(system) + len(user)) // 4, "completion_tokens": len(tokens)}
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                stubs.counters.add(llm_requests=1, llm_prompt_tokens=usage["prompt_tokens"],
+                                   llm_completion_tokens=len(tokens))
+                time.sleep(stubs.config.llm_ttft_ms / 1000.0)
+                base = {"id": "stub", "object": "chat.completion", "created": 0, "model": req.get("model", "stub")}
+                if not req.get("stream"):
+                    time.sleep(stubs.config.llm_token_ms * len(tokens) / 1000.0)
+                    self._json(dict(base, choices=[{
+                        "index": 0, "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": text},
+                    }], usage=usage))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                base["object"] = "chat.completion.chunk"
+
+                def send(obj: Any) -> None:
+                    data = f"data: {obj if isinstance(obj, str) else json.dumps(obj)}\n\n".encode("utf-8")
+                    self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                    self.wfile.flush()
+                    stubs.counters.add(api_bytes=len(data))
+
+                for i, tok in enumerate(tokens):
+                    time.sleep(stubs.config.llm_token_ms / 1000.0)
+                    delta = tok if i == 0 else " " + tok
+                    send(dict(base, choices=[{"index": 0, "delta": {"content": delta}, "finish_reason": None}]))
+                send(dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+                if (req.get("stream_options") or {}).get("include_usage"):
+                    send(dict(base, choices=[], usage=usage))
+                send("[DONE]")
+                self.wfile.write(b"0\r\n\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def _web_handler(self) -> type:
+        stubs = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args: Any) -> None:
+                pass
+
+            def do_HEAD(self) -> None:
+                self._respond(head=True)
+
+            def do_GET(self) -> None:
+                self._respond(head=False)
+
+            def _respond(self, head: bool) -> None:
+                cfg = stubs.config
+                # Host without the port: the listen ports change between runs, the outcome must not.
+                url = f"{self.headers.get('Host', '').rsplit(':', 1)[0]}{self.path}"
+                seed = _h(url)
+                roll = seed % 10000 / 100.0
+                slow = roll < cfg.slow_pct
+                failing = cfg.slow_pct <= roll < cfg.slow_pct + cfg.fail_pct
+                jitter = 0.5 + (seed >> 20) % 1000 / 1000.0
+                time.sleep((cfg.slow_ms if slow else cfg.latency_ms * jitter) / 1000.0)
+
+                kind = self.path.strip("/").split("/", 1)[0]
+                if failing or kind not in KINDS:
+                    body, status = b"unavailable", 503 if failing else 404
+                    ctype = "text/plain"
+                else:
+                    body, status = _page(kind, seed, cfg.page_kb), 200
+                    ctype = "text/html; charset=utf-8"
+                self.send_response(status)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if not head:
+                    self.wfile.write(body)
+                stubs.counters.add(web_requests=1, web_bytes=0 if head else len(body),
+                                   web_failures=int(failing), web_slow=int(slow))
+
+        return Handler
@@ -2,32 +2,114 @@
 
 from tools.env_bootstrap import *  
 
-import argparse, sys, traceback
+import argparse, json, os, sys, traceback, uuid
 from pathlib import Path
 
 print("CLI: loaded", flush=True)
 
-try:
-    from app import app
-    print("CLI: imported app", flush=True)
-except Exception:
-    print("CLI: no app; using dummy", flush=True)
-    class DummyApp:
-        def invoke(self, state): 
-            q = state.get("question") or state.get("prompt") or "(no question)"
-            return {"draft": f"# Draft\n\nYou asked: {q}\n\n(DummyApp fallback)"}
-    app = DummyApp()
+class DummyApp:
+    def invoke(self, state): 
+        q = state.get("query") or state.get("question") or state.get("prompt") or "(no question)"
+        return {"draft": f"# Draft\n\nYou asked: {q}\n\n(DummyApp fallback)"}
+
+def _load_app(checkpointed=False):
+    """Import the graph only once we know there is work to do (keeps --help fast)."""
+    try:
+        if checkpointed:
+            from agent.graph import get_checkpointed_app
+            app = get_checkpointed_app()
+        else:
+            from app import app
+        print("CLI: imported app", flush=True)
+        return app
+    except Exception:
+        print("CLI: no app; using dummy", flush=True)
+        return DummyApp()
+
+def _run(state, app=None, config=None):
+    """Stream stage events and writer tokens to stdout; returns the final state."""
+    app = app or _load_app()
+    if not hasattr(app, "stream"):
+        return app.invoke(state)
+    from agent.graph import stream_events
+
+    final = {}
+    for ev in stream_events(state, graph=app, config=config):
+        kind = ev.get("type")
+        if kind == "token":
+            print(ev["text"], end="", flush=True)
+        elif kind == "stage":
+            extra = " ".join(f"{k}={v}" for k, v in ev.items() if k not in ("type", "stage", "status"))
+            print(f"\nCLI: [{ev['stage']}] {ev['status']} {extra}".rstrip(), flush=True)
+        elif kind == "final":
+            final = ev["state"]
+    return final
 
 def main():
     p = argparse.ArgumentParser(description="Deep Research CLI")
-    p.add_argument("prompt")
+    p.add_argument("prompt", nargs="?")
     p.add_argument("--depth", choices=["shallow","standard","deep"], default="standard")
     p.add_argument("--out", default="out/draft.md")
+    p.add_argument("--no-cache", action="store_true", help="bypass the scrape, search and LLM response caches")
+    p.add_argument("--cache-stats", action="store_true", help="print cache statistics after the run")
+    p.add_argument("--budget", type=float, metavar="SECONDS", help="answer within this many seconds (degrades near the deadline)")
+    p.add_argument("--trace", metavar="PATH", help="write spans, token/byte counters and node logs as JSON lines")
+    p.add_argument("--run-id", metavar="ID", help="checkpoint this run under ID (default: a new random id)")
+    p.add_argument("--resume", metavar="ID", help="continue a failed or interrupted run from its last completed node")
+    p.add_argument("--fresh", action="store_true", help="search and fetch again even if this question was researched recently")
+    p.add_argument("--no-checkpoint", action="store_true", help="don't save per-node checkpoints (CHECKPOINTS=0)")
     args = p.parse_args()
+    if not args.prompt and not args.resume:
+        p.error("a prompt is required unless --resume is given")
+    checkpointed = not args.no_checkpoint and os.getenv("CHECKPOINTS", "1") != "0"
+    if args.resume and not checkpointed:
+        p.error("--resume needs checkpoints (drop --no-checkpoint / CHECKPOINTS=0)")
+
+    if args.no_cache:
+        os.environ["SCRAPE_CACHE"] = "0"
+        os.environ["SEARCH_CACHE"] = "0"
+        os.environ["LLM_CACHE"] = "0"
+
+    from tools import telemetry
+    if args.trace:
+        telemetry.configure(jsonl=args.trace)
+
+    print(f"CLI: prompt='{args.prompt or ''}' depth={args.depth}", flush=True)
+    app = _load_app(checkpointed)
+    state = {"query": args.prompt, "depth": args.depth}
+    if args.budget:
+        state["budget_s"] = args.budget
+
+    config, saver, run_id = None, None, None
+    if checkpointed and hasattr(app, "get_state"):
+        from agent.checkpoint import default_saver, prepare_run, resume_run
+        saver = default_saver()
+        if args.resume:
+            config, state = resume_run(app, args.resume, saver=saver)
+        else:
+            try:
+                config, state, reused = prepare_run(
+                    app, state, run_id=args.run_id, reuse=not (args.fresh or args.no_cache), saver=saver)
+            except ValueError as e:
+                p.error(str(e))
+            if reused:
+                print(f"CLI: reusing search results and docs from run {reused}", flush=True)
+        run_id = config["configurable"]["thread_id"]
+        print(f"CLI: run id {run_id}", flush=True)
+    telemetry.set_run(run_id or uuid.uuid4().hex[:16])  # trace records carry the run id
 
-    print(f"CLI: prompt='{args.prompt}' depth={args.depth}", flush=True)
     print("CLI: invoking app…", flush=True)
-    final = app.invoke({"question": args.prompt, "depth": args.depth})
+    try:
+        final = _run(state, app, config)
+    except BaseException:
+        if saver:
+            saver.set_status(run_id, "failed")
+            print(f"CLI: run failed; continue it with --resume {run_id}", file=sys.stderr, flush=True)
+        raise
+    if saver:
+        saver.set_status(run_id, "done")
+    if (final or {}).get("degraded"):
+        print(f"CLI: degraded to meet the budget: {', '.join(final['degraded'])}", flush=True)
     print(f"CLI: got keys -> {list((final or {}).keys())}", flush=True)
 
     content = (final or {}).get("draft") or "# Empty draft\n"
@@ -36,6 +118,18 @@ def main():
     out.write_text(content, encoding="utf-8")
     print(f"✅ Saved {out.resolve()}", flush=True)
 
+    if args.cache_stats:
+        from tools.scrape import download_stats, scrape_cache_stats
+        from tools.search import search_backend_stats, search_cache_stats
+        from tools.llm_cache import llm_cache_stats
+        print("CLI: scrape cache " + json.dumps(scrape_cache_stats()), flush=True)
+        print("CLI: search cache " + json.dumps(search_cache_stats()), flush=True)
+        print("CLI: search backends " + json.dumps(search_backend_stats()), flush=True)
+        print("CLI: llm cache " + json.dumps(llm_cache_stats()), flush=True)
+        print("CLI: downloads " + json.dumps(download_stats()), flush=True)
+        if saver:
+            print("CLI: checkpoints " + json.dumps(saver.stats()), flush=True)
+
 if __name__ == "__main__":
     try:
         main()
@@ -0,0 +1,131 @@
+# server.py
+"""
+HTTP research service around agent.graph.app.
+
+    uvicorn server:api --host 0.0.0.0 --port 8000
+
+  POST /jobs                 {"query": ..., "depth": "standard", "budget_s"?: 30} -> 202 {job_id, status, coalesced}
+                             429 + Retry-After when the job queue is full
+  GET  /jobs/{id}            status
+  GET  /jobs/{id}/events     Server-Sent Events: status, stage, doc and token events, then "end"
+  GET  /jobs/{id}/result     {draft, subtasks, sources} once done (409 while running)
+  POST /research             submit + stream in one call (SSE)
+  GET  /health               queue and coalescing counters, search backend health
+  GET  /metrics              Prometheus metrics (tools.telemetry)
+
+Identical questions submitted while one is queued or running share that run
+(agent.jobs.JobManager). JOB_WORKERS, JOB_QUEUE_MAX, JOB_HISTORY and
+JOB_RETENTION_S size it.
+"""
+from __future__ import annotations
+
+from tools.env_bootstrap import *
+
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from agent.jobs import Job, JobManager, QueueFull
+from tools import telemetry
+from tools.search import search_backend_stats
+
+manager = JobManager()
+
+
+@asynccontextmanager
+async def _lifespan(_: FastAPI) -> AsyncIterator[None]:
+    await manager.start()
+    try:
+        yield
+    finally:
+        await manager.stop()
+
+
+api = FastAPI(title="Deep Research Agent", lifespan=_lifespan)
+
+
+class ResearchRequest(BaseModel):
+    query: str = Field(min_length=3, max_length=2000)
+    depth: str = Field(default="standard", pattern="^(shallow|standard|deep)$")
+    budget_s: Optional[float] = Field(default=None, gt=0, le=600, description="answer within this many seconds")
+
+
+def _submit(req: ResearchRequest) -> Tuple[Job, bool]:
+    try:
+        return manager.submit(req.query.strip(), req.depth, req.budget_s)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+
+
+def _job(job_id: str) -> Job:
+    job = manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return job
+
+
+async def _sse(job: Job) -> AsyncIterator[bytes]:
+    yield f"event: job\ndata: {json.dumps(job.summary())}\n\n".encode("utf-8")
+    async for ev in job.follow():
+        yield f"event: {ev.get('type', 'message')}\ndata: {json.dumps(ev, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+def _stream(job: Job) -> StreamingResponse:
+    return StreamingResponse(
+        _sse(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.post("/jobs", status_code=202)
+async def create_job(req: ResearchRequest) -> Dict[str, Any]:
+    job, coalesced = _submit(req)
+    return {"job_id": job.id, "status": job.status, "coalesced": coalesced}
+
+
+@api.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> Dict[str, Any]:
+    return _job(job_id).summary()
+
+
+@api.get("/jobs/{job_id}/events")
+async def job_events(job_id: str) -> StreamingResponse:
+    return _stream(_job(job_id))
+
+
+@api.get("/jobs/{job_id}/result")
+async def job_result(job_id: str) -> Any:
+    job = _job(job_id)
+    if job.status == "error":
+        return JSONResponse(status_code=500, content=job.summary())
+    if job.status != "done":
+        return JSONResponse(status_code=409, content=job.summary())
+    return dict(job.summary(), **(job.result or {}))
+
+
+@api.post("/research")
+async def research(req: ResearchRequest) -> StreamingResponse:
+    return _stream(_submit(req)[0])
+
+
+@api.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> str:
+    """Prometheus text format: span histograms and counters (TELEMETRY=1) plus cache gauges."""
+    return telemetry.prometheus_text()
+
+
+@api.get("/health")
+async def health() -> Dict[str, Any]:
+    return {"ok": True, "jobs": manager.stats(), "search_backends": search_backend_stats()}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(api, host=os.getenv("HOST", "127.0.0.1"), port=int(os.getenv("PORT", "8000")))
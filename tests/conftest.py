@@ -0,0 +1,14 @@
+# tests/conftest.py
+from __future__ import annotations
+
+import pytest
+
+from tools import runtime
+
+
+@pytest.fixture(autouse=True)
+def _fresh_runtime():
+    """Each test builds its own graph, clients and search scheduler (no breaker state leaking across tests)."""
+    runtime.reset()
+    yield
+    runtime.reset()
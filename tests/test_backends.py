@@ -0,0 +1,131 @@
+# tests/test_backends.py
+from __future__ import annotations
+
+import threading
+import time
+
+from tools import runtime, search as search_mod
+from tools.backends import Backend, CircuitBreaker, Scheduler, remaining
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _boom(*args):
+    raise RuntimeError("down")
+
+
+def test_breaker_opens_then_probes_after_cooldown():
+    clock = _Clock()
+    b = CircuitBreaker(failures=2, cooldown_s=10, clock=clock)
+    b.failure()
+    assert b.allow()
+    b.failure()
+    assert b.state == "open" and not b.allow()
+
+    clock.now = 10.0
+    assert b.allow() and not b.allow()  # exactly one probe while half-open
+    b.failure()
+    assert b.state == "open" and not b.allow()
+
+    clock.now = 20.0
+    assert b.allow()
+    b.success()
+    assert b.state == "closed" and b.allow() and b.allow()
+
+
+def test_open_backend_is_skipped_without_waiting():
+    calls = []
+
+    def primary(q):
+        calls.append(q)
+        raise RuntimeError("down")
+
+    sched = Scheduler(
+        [Backend("a", primary, CircuitBreaker(failures=2, cooldown_s=60)), Backend("b", lambda q: [q])],
+        mode="fallback",
+    )
+    for i in range(4):
+        assert sched.call(f"q{i}") == ("b", [f"q{i}"])
+    assert calls == ["q0", "q1"]
+    stats = sched.stats()["a"]
+    assert stats["state"] == "open" and stats["errors"] == 2 and stats["short_circuited"] == 2
+
+
+def test_hedge_fires_secondary_when_primary_is_slow():
+    def slow(q):
+        time.sleep(1.0)
+        return ["slow"]
+
+    sched = Scheduler([Backend("a", slow), Backend("b", lambda q: ["fast"])], mode="hedge",
+                      hedge_min_ms=50, hedge_max_ms=100)
+    t0 = time.perf_counter()
+    assert sched.call("q") == ("b", ["fast"])
+    assert time.perf_counter() - t0 < 0.5
+    assert sched.stats()["b"]["hedges"] == 1
+
+
+def test_hedge_delay_tracks_primary_latency_and_race_takes_first_good():
+    fast = Backend("a", lambda q: ["a"])
+    sched = Scheduler([fast], hedge_pct=90, hedge_min_ms=10, hedge_max_ms=4000, hedge_samples=3)
+    assert sched.hedge_delay(fast) == 4.0
+    for ms in (100, 120, 200):
+        fast.latencies.append(ms)
+    assert sched.hedge_delay(fast) == 0.2
+
+    def slow(q):
+        time.sleep(0.5)
+        return ["slow"]
+
+    race = Scheduler([Backend("slow", slow), Backend("empty", lambda q: []), Backend("fast", lambda q: ["x"])],
+                     mode="race")
+    assert race.call("q") == ("fast", ["x"])
+    assert race.call("q", accept=lambda r: r == ["slow"]) == ("slow", ["slow"])
+
+
+def test_abandoned_calls_are_bounded_by_the_callers_deadline():
+    release = threading.Event()
+    budgets = []
+
+    def stuck(q):
+        budgets.append(remaining(30.0))
+        release.wait(5)
+        return [q]
+
+    sched = Scheduler([Backend("a", stuck)], mode="fallback", callers=1)
+    assert sched._pool._max_workers == 1
+    assert sched.call("q0", timeout_s=0.2) == (None, None)
+    assert budgets[0] <= 0.2  # the backend could cap its own request at the caller's deadline
+    assert sched.call("q1", timeout_s=0.1) == (None, None)  # queued behind the abandoned call
+    release.set()
+    for _ in range(100):
+        if sched.stats()["a"]["expired"]:
+            break
+        time.sleep(0.01)
+    assert sched.stats()["a"]["expired"] == 1 and budgets == budgets[:1]  # q1 was never sent
+    assert remaining(30.0) == 30.0  # outside a scheduled call
+
+    wide = Scheduler([Backend("a", stuck), Backend("b", stuck)], callers=4)
+    assert wide._pool._max_workers == 8
+
+
+def test_reset_shuts_down_the_search_scheduler():
+    sched = search_mod._search_scheduler()
+    runtime.reset()
+    assert sched._pool._shutdown and search_mod._search_scheduler() is not sched
+
+
+def test_web_search_falls_back_when_tavily_errors(monkeypatch):
+    monkeypatch.setenv("SEARCH_CACHE", "0")
+    monkeypatch.setenv("SEARCH_MODE", "fallback")
+    monkeypatch.setattr(search_mod, "_tavily", _boom)
+    monkeypatch.setattr(search_mod, "_serpapi", lambda q, k: [{"title": "t", "url": "https://site.org/", "snippet": ""}])
+
+    assert search_mod.web_search("q")[0]["url"] == "https://site.org/"
+    stats = search_mod.search_backend_stats()
+    assert stats["tavily"]["errors"] == 1 and stats["serpapi"]["wins"] == 1
@@ -0,0 +1,46 @@
+# tests/test_batch.py
+from __future__ import annotations
+
+import json
+
+import batch
+
+
+class _FakeGraph:
+    def __init__(self):
+        self.seen = []
+
+    def stream(self, state, stream_mode=None):
+        self.seen.append(state["query"])
+        if state["query"] == "boom":
+            raise RuntimeError("backend down")
+        yield "updates", {"gather": {}}
+        yield "updates", {"write": {}}
+        yield "values", dict(state, draft=f"# Draft\n\n{state['query']}\n", docs=[{}, {}])
+
+
+def test_batch_writes_drafts_results_and_resumes(tmp_path):
+    lines = [
+        json.dumps({"query": "first question", "depth": "deep"}),
+        "second question",
+        json.dumps({"question": "boom"}),
+        "second question",  # duplicate
+        "",
+    ]
+    items = batch.read_items(lines)
+    assert [it["query"] for it in items] == ["first question", "second question", "boom"]
+    assert items[0]["depth"] == "deep" and items[1]["depth"] == "standard"
+
+    results = tmp_path / "results.jsonl"
+    graph = _FakeGraph()
+    summary = batch.run_batch(items, results, tmp_path / "drafts", workers=2, graph=graph)
+
+    assert summary["ok"] == 2 and summary["failed"] == 1 and summary["questions_per_minute"] > 0
+    recs = {r["query"]: r for r in map(json.loads, results.read_text().splitlines())}
+    assert recs["boom"]["status"] == "error" and "backend down" in recs["boom"]["error"]
+    assert set(recs["first question"]["stages"]) == {"gather", "write"}
+    assert (tmp_path / "drafts" / f"{items[0]['id']}.md").read_text().startswith("# Draft")
+
+    graph = _FakeGraph()
+    summary = batch.run_batch(items, results, tmp_path / "drafts", workers=2, graph=graph)
+    assert graph.seen == ["boom"] and summary["skipped"] == 2
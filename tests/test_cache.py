@@ -0,0 +1,249 @@
+# tests/test_cache.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from tools import http_pool, scrape as scrape_mod
+from tools.diskcache import DiskCache
+
+
+PAGE = b"<html><head><title>Cached</title></head><body><main><p>cached body</p></main></body></html>"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = {"200": 0, "304": 0}
+
+    def do_GET(self):
+        if self.headers.get("If-None-Match") == '"v1"':
+            _Handler.hits["304"] += 1
+            self.send_response(304)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        _Handler.hits["200"] += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    _Handler.hits.update({"200": 0, "304": 0})
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(scrape_mod, "_cache", None)
+    monkeypatch.setattr(scrape_mod, "_revalidated", 0)
+
+
+def test_diskcache_lru_eviction(tmp_path):
+    cache = DiskCache("t", max_bytes=2_000, path=tmp_path / "t.sqlite")
+    for i in range(20):
+        cache.set(f"k{i}", {"blob": os.urandom(200).hex()})
+        cache.get("k0")  # keep k0 hot
+    stats = cache.stats()
+    assert stats["bytes"] <= 2_000
+    assert stats["evictions"] > 0
+    assert cache.get("k0") is not None
+    assert cache.get("k1") is None
+
+
+def test_scrape_cache_hit_and_revalidation(server, monkeypatch):
+    url = f"{server}/page?utm_source=x"
+    first = scrape_mod.scrape(url)
+    assert first["title"] == "Cached"
+
+    again = scrape_mod.scrape(f"{server}/page")  # canonical URL drops tracking params
+    assert again["text"] == first["text"]
+    assert _Handler.hits == {"200": 1, "304": 0}
+
+    monkeypatch.setenv("SCRAPE_CACHE_TTL", "0")
+    stale = scrape_mod.scrape(url)
+    assert stale["text"] == "cached body"
+    assert _Handler.hits == {"200": 1, "304": 1}
+    assert scrape_mod.scrape_cache_stats()["revalidated"] == 1
+
+
+def test_pool_reports_the_negotiated_protocol_and_forgets_idle_hosts(server):
+    http_pool.reset_stats()
+    for i in range(3):
+        http_pool.get(f"{server}/page{i}")
+    stats = http_pool.pool_stats()
+    assert stats["http_versions"] == {"HTTP/1.1": 3} and stats["http2"] is False
+    assert len(http_pool._host_limiter) == 0
+
+    limiter = http_pool.KeyedLimiter(2)
+    inside, peak, lock = {}, {}, threading.Lock()
+
+    def hold(key):
+        with limiter.hold(key):
+            with lock:
+                inside[key] = inside.get(key, 0) + 1
+                peak[key] = max(peak.get(key, 0), inside[key])
+                peak["all"] = max(peak.get("all", 0), sum(inside.values()))
+            time.sleep(0.02)
+            with lock:
+                inside[key] -= 1
+
+    threads = [threading.Thread(target=hold, args=("same.host",)) for _ in range(6)]
+    threads += [threading.Thread(target=hold, args=(f"host{i}",)) for i in range(50)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert peak["same.host"] == 2 and peak["all"] > 2  # hosts are limited separately
+    assert len(limiter) == 0  # no semaphore left behind per host
+
+
+def test_scrape_cache_bypass(server, monkeypatch):
+    monkeypatch.setenv("SCRAPE_CACHE", "0")
+    scrape_mod.scrape(f"{server}/a")
+    scrape_mod.scrape(f"{server}/a")
+    assert _Handler.hits["200"] == 2
+
+
+def test_search_cache_normalizes_and_serves_smaller_k(monkeypatch):
+    from tools import search as search_mod
+
+    calls = []
+
+    def fake_tavily(query, k):
+        calls.append((query, k))
+        return [{"title": f"t{i}", "url": f"https://site{i}.org/", "snippet": ""} for i in range(k)]
+
+    monkeypatch.setattr(search_mod, "_cache", None)
+    monkeypatch.setattr(search_mod, "_tavily", fake_tavily)
+
+    assert len(search_mod.web_search("What is  Quantum Annealing?", k=8)) == 8
+    assert len(search_mod.web_search("what is quantum annealing", k=3)) == 3
+    assert calls == [("What is  Quantum Annealing?", 8)]
+
+    search_mod.web_search("what is quantum annealing", k=10)
+    assert len(calls) == 2
+
+
+def test_llm_response_cache_exact_semantic_and_temperature(tmp_path):
+    from tools.llm_cache import LocalResponseCache
+
+    cache = LocalResponseCache(store=DiskCache("llm", path=tmp_path / "llm.sqlite"), semantic=True, threshold=0.9)
+    req = {"model": "m", "temperature": 0.2, "max_tokens": 100, "system": "s",
+           "user": "Compare quantum annealing with gate-model quantum computing in detail"}
+    assert cache.get(req) is None
+    cache.put(req, "answer")
+    assert cache.get(dict(req)) == "answer"
+
+    near = dict(req, user="Compare quantum annealing with gate model quantum computing in detail!")
+    assert cache.get(near) == "answer"
+    assert cache.get(dict(req, system="other")) is None
+
+    hot = dict(req, temperature=0.9)
+    cache.put(hot, "random")
+    assert cache.get(hot) is None
+
+    stats = cache.stats()
+    assert stats["exact_hits"] == 1 and stats["semantic_hits"] == 1 and stats["skipped"] == 1
+
+
+class _MixedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    big = b"<html><body><main>" + b"<p>word " * 50_000 + b"</main></body></html>"
+
+    def do_HEAD(self):
+        self._headers()
+
+    def do_GET(self):
+        body = self._headers()
+        self.wfile.write(body)
+
+    def _headers(self):
+        if self.path.endswith(".pdf"):
+            body, ctype = b"%PDF-1.4" + b"0" * 5000, "application/pdf"
+        elif self.path == "/notes":
+            body, ctype = "café notes".encode("latin-1"), "text/plain; charset=latin-1"
+        else:
+            body, ctype = self.big, "text/html"
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        return body
+
+    def log_message(self, *args):
+        pass
+
+
+def test_download_cap_and_content_type_gating(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _MixedHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{srv.server_port}"
+    monkeypatch.setenv("SCRAPE_CACHE", "0")
+    before = scrape_mod.download_stats()
+    try:
+        page = scrape_mod.scrape(f"{base}/big", max_bytes=10_000)
+        assert 0 < len(page["text"]) < 10_000
+        assert scrape_mod.scrape(f"{base}/notes")["text"] == "café notes"
+        with pytest.raises(scrape_mod.NonHTMLContent):
+            scrape_mod.scrape(f"{base}/paper.pdf")
+    finally:
+        srv.shutdown()
+
+    after = scrape_mod.download_stats()
+    assert after["truncated"] - before["truncated"] == 1
+    assert after["skipped_non_html"] - before["skipped_non_html"] == 1
+    assert after["head_checks"] - before["head_checks"] == 1
+    assert after["bytes_saved"] - before["bytes_saved"] > 300_000
+
+
+class _TrickleHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(100 * 1024))
+        self.end_headers()
+        try:
+            for _ in range(100):  # 1 KB every 50 ms: 5 s for the whole page
+                self.wfile.write(b"<p>" + b"x" * 1017 + b"</p>")
+                self.wfile.flush()
+                time.sleep(0.05)
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+def test_cancel_closes_a_download_mid_body(monkeypatch):
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), _TrickleHandler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    monkeypatch.setenv("SCRAPE_CACHE", "0")
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    before = scrape_mod.download_stats()["cancelled"]
+    t0 = time.perf_counter()
+    try:
+        with pytest.raises(scrape_mod.FetchCancelled):
+            scrape_mod.scrape(f"http://127.0.0.1:{srv.server_port}/slow", cancel=cancel)
+    finally:
+        srv.shutdown()
+    assert time.perf_counter() - t0 < 1.0
+    assert scrape_mod.download_stats()["cancelled"] == before + 1
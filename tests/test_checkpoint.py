@@ -0,0 +1,143 @@
+# tests/test_checkpoint.py
+from __future__ import annotations
+
+from unittest.mock import patch
+
+import pytest
+
+from agent.checkpoint import SqliteSaver, prepare_run, resume_run
+from agent.graph import build_app, stream_events
+
+
+def _search(query, k=6, **kwargs):
+    return [{"title": f"Hit {i}", "url": f"https://site{i}.org/page", "snippet": f"Snippet {i}."} for i in range(4)]
+
+
+class _Tools:
+    def __init__(self, fail_writes: int = 0):
+        self.scrapes = 0
+        self.writes = 0
+        self.fail_writes = fail_writes
+        tools = self
+
+        class LLM:
+            def __init__(self, *_, max_tokens: int = 700, deadline=None, **__):
+                self.model = "gpt-4o-mini"
+                self.max_tokens = max_tokens
+
+            def chat(self, system: str, user: str) -> str:
+                tools.writes += 1
+                if tools.fail_writes:
+                    tools.fail_writes -= 1
+                    raise RuntimeError("model unavailable")
+                return "A drafted answer [1]."
+
+        self.LLM = LLM
+
+    def scrape(self, url, deadline=None, **kwargs):
+        self.scrapes += 1
+        return {"url": url, "title": "Page", "text": f"Long page text from {url}. " * 60}
+
+    def patched(self):
+        return (patch("agent.nodes.real_search", side_effect=_search),
+                patch("agent.nodes.real_scrape", side_effect=self.scrape),
+                patch("agent.nodes.LLM", self.LLM))
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SqliteSaver(tmp_path / "checkpoints.sqlite")
+
+
+def test_failed_run_resumes_from_last_completed_node(saver):
+    tools = _Tools(fail_writes=1)
+    a, b, c = tools.patched()
+    with a, b, c:
+        graph = build_app(checkpointer=saver)
+        config, state, reused = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, saver=saver)
+        assert reused is None
+        with pytest.raises(RuntimeError):
+            graph.invoke(state, config)
+        assert graph.get_state(config).next == ("write",)
+        fetched = tools.scrapes
+
+        run_id = config["configurable"]["thread_id"]
+        config, state = resume_run(graph, run_id, saver=saver)
+        out = graph.invoke(state, config)
+
+    assert "drafted answer" in out["draft"]
+    assert tools.scrapes == fetched  # nothing before the writer ran again
+    with pytest.raises(KeyError):
+        resume_run(graph, run_id, saver=saver)  # finished
+    with pytest.raises(KeyError):
+        resume_run(graph, "no-such-run", saver=saver)
+
+
+def test_new_input_on_a_run_thread_is_not_mistaken_for_re_entry(saver):
+    tools = _Tools()
+    a, b, c = tools.patched()
+    with a, b, c:
+        graph = build_app(checkpointer=saver)
+        config, state, _ = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, run_id="r1", saver=saver)
+        graph.invoke(state, config)
+        with pytest.raises(ValueError):
+            prepare_run(graph, {"query": "what is y", "depth": "shallow"}, run_id="r1", saver=saver)
+
+        out = graph.invoke({"query": "what is y", "depth": "shallow"}, config)
+    assert out["query"] == "what is y" and "drafted answer" in out["draft"]
+
+
+def test_same_question_reuses_search_and_docs(saver):
+    tools = _Tools()
+    a, b, c = tools.patched()
+    with a, b, c:
+        graph = build_app(checkpointer=saver)
+        config, state, _ = prepare_run(graph, {"query": "What is X?", "depth": "shallow"}, saver=saver)
+        first = graph.invoke(state, config)
+        fetched = tools.scrapes
+
+        config, state, reused = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, saver=saver)
+        assert reused and state is None
+        events = list(stream_events(state, graph=graph, config=config))
+        second = events[-1]["state"]
+        assert {e["stage"] for e in events if e.get("type") == "stage"} == {"write"}
+
+        _, state, reused = prepare_run(graph, {"query": "what is x", "depth": "deep"}, saver=saver)
+        assert reused is None and state["depth"] == "deep"  # different research, no reuse
+        _, _, reused = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, reuse=False, saver=saver)
+        assert reused is None
+
+    assert tools.scrapes == fetched and tools.writes == 2
+    assert second["docs"] == first["docs"] and second["query"] == "what is x"
+
+
+def test_runs_cut_short_by_their_budget_are_not_reused(saver):
+    tools = _Tools()
+    a, b, c = tools.patched()
+    with a, b, c:
+        graph = build_app(checkpointer=saver)
+        config, state, _ = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, saver=saver)
+        graph.invoke(state, config)
+        graph.update_state(config, {"degraded": ["fetches_cancelled"]}, as_node="dedupe")  # as a budgeted run ends
+
+        _, state, reused = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, saver=saver)
+    assert reused is None and state is not None
+
+
+def test_doc_text_is_stored_once_and_compressed(saver):
+    tools = _Tools()
+    a, b, c = tools.patched()
+    with a, b, c:
+        graph = build_app(checkpointer=saver)
+        config, state, _ = prepare_run(graph, {"query": "what is x", "depth": "shallow"}, saver=saver)
+        out = graph.invoke(state, config)
+
+    stats = saver.stats()
+    texts = {d["text"] for d in out["docs"]}
+    assert stats["texts"] >= len(texts) and stats["checkpoints"] >= 4
+    raw = sum(len(t) for t in texts)
+    # every checkpoint carries the docs, yet the whole store is smaller than one plain copy
+    assert stats["stored_bytes"] < raw
+
+    saver.delete_thread(config["configurable"]["thread_id"])
+    assert saver.stats()["texts"] == 0 and saver.get_tuple(config) is None
@@ -0,0 +1,36 @@
+# tests/test_context.py
+from __future__ import annotations
+
+from tools.context import context_budget, count_tokens, pack_context, split_chunks
+
+
+def test_pack_context_prefers_relevant_chunks_within_budget():
+    boiler = "Subscribe to our newsletter. Cookie settings and privacy policy apply. " * 30
+    docs = [
+        {"url": "https://a.org", "title": "A", "text": boiler},
+        {"url": "https://b.org", "title": "B", "text": boiler + "\n\n" + boiler},
+        {"url": "https://c.org", "title": "C",
+         "text": boiler + "\n\nQuantum annealing minimises an Ising energy landscape, "
+                          "unlike gate-model quantum computers which apply universal gates."},
+    ]
+    ids = {d["url"]: i for i, d in enumerate(docs, start=1)}
+    blocks = pack_context("how does quantum annealing differ from gate-model computing", docs, ids, 300)
+
+    assert any(b.startswith("(Source 3: C)") and "Ising" in b for b in blocks)
+    assert len(blocks) < sum(len(split_chunks(d["text"])) for d in docs)
+    assert count_tokens("\n\n---\n\n".join(blocks)) <= 300
+
+
+def test_pack_context_matches_urls_with_stray_whitespace():
+    docs = [{"url": " https://a.org\n", "title": "A ", "text": "Annealing finds low-energy states."}]
+    blocks = pack_context("annealing", docs, {"https://a.org": 1}, 300)
+    assert blocks == ["(Source 1: A)\nAnnealing finds low-energy states."]
+
+
+def test_split_chunks_and_budget_bounds():
+    text = "First paragraph here.\n\n" + " ".join(f"Sentence number {i} ends." for i in range(200))
+    chunks = split_chunks(text, target_chars=300)
+    assert all(len(c) <= 300 for c in chunks)
+    assert chunks[0].startswith("First paragraph here.")
+    assert context_budget("gpt-4", max_tokens=8000, prompt_overhead=100) == 28
+    assert context_budget("gpt-4o-mini-2024-07-18", max_tokens=700) == 3000
@@ -0,0 +1,151 @@
+# tests/test_deadline.py
+from __future__ import annotations
+
+import math
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from agent import nodes
+from agent.graph import build_app
+from bench.stubs import StubConfig, Stubs
+from tools import scrape as scrape_mod
+from tools.deadline import Deadline, DeadlineExceeded
+from tools.llm import LLM
+
+
+def test_deadline_round_trips_through_state_and_bounds_timeouts(monkeypatch):
+    monkeypatch.delenv("RUN_BUDGET_S", raising=False)
+    assert not Deadline.of({}).bounded
+
+    state = {"budget_s": 10}
+    dl = Deadline.of(state)
+    assert state["deadline"]["at"] - state["deadline"]["start"] == pytest.approx(10)
+    assert Deadline.of(state).at == dl.at  # later nodes see the same deadline
+    assert dl.timeout(20) <= 10 and dl.timeout(3) == 3
+    assert dl.share(0.5, 100) == pytest.approx(5, abs=0.1)
+
+    spent = Deadline(seconds=1, start=time.time() - 2)
+    assert spent.expired() and spent.fraction_left() == 0.0
+    with pytest.raises(DeadlineExceeded):
+        spent.timeout(5)
+    assert Deadline().share(0.5, 7) == 7 and Deadline().remaining() == math.inf
+
+
+def test_host_timeout_adapts_to_observed_latency():
+    lat = scrape_mod.HostLatency()
+    assert lat.timeout("a.org", 20, 2) == 20  # no history: the caller's cap
+    for secs in (0.4, 0.5, 0.45, 0.5):
+        lat.observe("a.org", secs)
+    assert 2 <= lat.timeout("a.org", 20, 2) < 3
+    for secs in (3.0, 6.0, 9.0):
+        lat.observe("slow.org", secs)
+    assert lat.timeout("slow.org", 20, 2) > 10
+
+
+def test_fetch_retries_only_transient_errors(monkeypatch):
+    calls = []
+
+    def fake_download(url, timeout, headers, max_bytes, deadline=None, cancel=None):
+        calls.append(timeout)
+        code = 503 if "busy" in url else 404
+        request = httpx.Request("GET", url)
+        raise httpx.HTTPStatusError("bad", request=request, response=httpx.Response(code, request=request))
+
+    monkeypatch.setattr(scrape_mod, "_download", fake_download)
+    monkeypatch.setenv("SCRAPE_ATTEMPTS", "3")
+    monkeypatch.setenv("SCRAPE_BACKOFF_S", "0.01")
+
+    with pytest.raises(RuntimeError):
+        scrape_mod._fetch("https://gone.org/x")
+    assert len(calls) == 1
+    calls.clear()
+    with pytest.raises(RuntimeError):
+        scrape_mod._fetch("https://busy.org/x")
+    assert len(calls) == 3
+    with pytest.raises(DeadlineExceeded):
+        scrape_mod._fetch("https://busy.org/x", deadline=Deadline(seconds=1, start=time.time() - 5))
+
+
+class _BudgetLLM:
+    def __init__(self, *_, max_tokens: int = 700, deadline=None, **__):
+        self.model = "gpt-4o-mini"
+        self.max_tokens = max_tokens
+        self.deadline = deadline
+
+    def chat(self, system: str, user: str) -> str:
+        return "A drafted answer [1]."
+
+
+def _search(query, k=6, **kwargs):
+    return [{"title": f"Hit {i}", "url": f"https://site{i}.org/{abs(hash(query)) % 97}",
+             "snippet": f"Snippet {i} about {query}."} for i in range(6)]
+
+
+def _scrape(url, deadline=None, **kwargs):
+    if "site0" not in url:
+        time.sleep(min(5.0, deadline.remaining() + 0.5 if deadline else 5.0))  # hangs past the budget
+    return {"url": url, "title": "Page", "text": "Plenty of text about the question. " * 20}
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+def test_budget_cuts_fetches_and_still_answers(monkeypatch, pipelined):
+    monkeypatch.setenv("AGENT_PIPELINE", "1" if pipelined else "0")
+    with patch("agent.nodes.real_search", side_effect=_search), \
+         patch("agent.nodes.real_scrape", side_effect=_scrape), \
+         patch("agent.nodes.LLM", _BudgetLLM):
+        t0 = time.perf_counter()
+        out = build_app(pipelined=pipelined).invoke({"query": "budgeted question", "depth": "shallow", "budget_s": 4})
+        elapsed = time.perf_counter() - t0
+
+    assert elapsed < 4.5
+    assert "fetches_cancelled" in out["degraded"] and "short_answer" in out["degraded"]
+    assert "drafted answer" in out["draft"]
+    assert any(s.get("cancelled") for s in out["fetch_stats"])
+
+
+@pytest.mark.parametrize("pipelined", [True, False])
+def test_small_budget_still_leaves_the_writer_time_for_the_llm(monkeypatch, pipelined):
+    monkeypatch.setenv("AGENT_PIPELINE", "1" if pipelined else "0")
+    with patch("agent.nodes.real_search", side_effect=_search), \
+         patch("agent.nodes.real_scrape", side_effect=_scrape), \
+         patch("agent.nodes.LLM", _BudgetLLM):
+        # below WRITE_MIN_S / WRITE_RESERVE the minimum reserve is what the writer gets
+        out = build_app(pipelined=pipelined).invoke({"query": "small budget", "depth": "shallow", "budget_s": 2})
+
+    assert "snippets_only" not in out["degraded"]
+    assert "drafted answer" in out["draft"]
+
+
+def test_writer_answers_from_snippets_when_time_is_up():
+    state = {
+        "query": "q",
+        "deadline": Deadline(seconds=5, start=time.time() - 4.8).as_dict(),
+        "docs": [{"url": "https://a.org/", "title": "A", "text": "long text", "snippet": "Key finding from A."}],
+    }
+    with patch("agent.nodes.LLM", _BudgetLLM):
+        out = nodes.write(state)
+    assert "snippets_only" in out["degraded"]
+    assert "Key finding from A. [1]" in out["draft"]
+
+
+def test_llm_calls_stop_at_the_deadline_against_a_slow_model(monkeypatch, tmp_path):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    for name in ("SCRAPE_CACHE", "SEARCH_CACHE", "LLM_CACHE"):
+        monkeypatch.setenv(name, "0")
+    with Stubs(StubConfig(llm_ttft_ms=3000)) as stubs:
+        for key, value in stubs.env().items():
+            monkeypatch.setenv(key, value)
+
+        t0 = time.perf_counter()
+        with pytest.raises(Exception):
+            LLM(cache=None, deadline=Deadline(seconds=1.0)).chat("system", "user")
+        assert time.perf_counter() - t0 < 1.5
+        assert stubs.stats()["llm_requests"] == 1  # no SDK retries behind the deadline's back
+
+        t0 = time.perf_counter()
+        out = build_app().invoke({"query": "slow model question", "depth": "standard", "budget_s": 0.5})
+        assert time.perf_counter() - t0 < 1.0
+        assert out["degraded"]
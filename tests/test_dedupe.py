@@ -0,0 +1,53 @@
+# tests/test_dedupe.py
+from __future__ import annotations
+
+import random
+
+import numpy as np
+
+from agent import nodes
+from tools.dedupe import _PRIME, MinHasher, collapse_duplicates, near_duplicate_groups
+
+_WORDS = "annealing qubit energy landscape cohort exposure tissue polymer policy carbon trial risk model".split()
+
+
+def _article(seed: int, n: int = 400) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_WORDS) + str(rng.randint(0, 50)) for _ in range(n))
+
+
+def test_near_duplicates_grouped_and_distinct_docs_kept():
+    base = _article(1)
+    mirror = "Reprinted from Wire Service. " + base + " Share this story."
+    edited = base.replace(base.split()[10], "changed", 1)
+    texts = [base, _article(2), mirror, _article(3), edited, "short snippet about annealing"]
+
+    groups = near_duplicate_groups(texts, threshold=0.8)
+
+    assert [0, 2, 4] in groups
+    assert sorted(i for g in groups for i in g) == list(range(len(texts)))
+    assert len(groups) == 4
+
+
+def test_minhash_matches_exact_modular_arithmetic():
+    hasher = MinHasher(64)
+    hashes = np.array([0, 12345, 2**31, 2**32 - 1], dtype=np.uint64)
+    p = int(_PRIME)
+    expected = [min((int(a) * int(x) + int(b)) % p for x in hashes) for a, b in zip(hasher.a[:, 0], hasher.b[:, 0])]
+    assert hasher.signature(hashes).tolist() == expected
+
+
+def test_dedupe_node_keeps_longest_and_alternate_urls():
+    body = _article(7)
+    docs = [
+        {"url": "https://a.example/story", "title": "A", "text": body},
+        {"url": "https://b.example/other", "title": "B", "text": _article(8)},
+        {"url": "https://c.example/mirror", "title": "C", "text": body + " Related: more news."},
+    ]
+    state = nodes.dedupe({"docs": docs})
+
+    kept, removed = collapse_duplicates(docs)
+    assert removed == 1
+    assert [d["url"] for d in state["docs"]] == ["https://c.example/mirror", "https://b.example/other"]
+    assert state["docs"][0]["alt_urls"] == ["https://a.example/story"]
+    assert kept == state["docs"]
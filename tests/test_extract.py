@@ -0,0 +1,83 @@
+# tests/test_extract.py
+from __future__ import annotations
+
+import pytest
+
+from tools import extract as extract_mod
+from tools.extract import extract, extract_bs4, extract_lxml
+
+PAGE = """<!doctype html>
+<html><head>
+  <title>Fish &amp; Chips &mdash; A&nbsp;Guide</title>
+  <style>body { color: red }</style>
+  <script>var tracking = "SCRIPT";</script>
+</head><body>
+  <header>Site header HEADER</header>
+  <nav><a href="/">Home</a> NAV links</nav>
+  <main>
+    <h1>Frying</h1>
+    <p>Batter needs &lt;cold&gt; water &amp; flour.<script>inline()</script> Tail after the script.</p>
+    <noscript>NOSCRIPT fallback</noscript>
+    <p>Serve hot.</p>
+  </main>
+  <aside>Outside main.</aside>
+  <footer>FOOTER &copy; 2024</footer>
+</body></html>
+"""
+
+
+def test_title_and_entities_are_decoded():
+    out = extract_lxml(PAGE)
+    assert out["title"] == "Fish & Chips — A Guide"  # &nbsp; collapses like any whitespace
+    assert "Batter needs <cold> water & flour." in out["text"]
+
+
+def test_boilerplate_is_dropped_and_main_preferred():
+    text = extract_lxml(PAGE)["text"]
+    for junk in ("SCRIPT", "inline()", "color: red", "HEADER", "NAV", "NOSCRIPT", "FOOTER", "Outside main"):
+        assert junk not in text
+    assert text.startswith("Frying") and text.endswith("Serve hot.")
+
+    no_main = extract_lxml("<html><body><nav>NAV</nav><p>Only body text.</p><footer>FOOTER</footer></body></html>")
+    assert no_main["text"] == "Only body text."
+
+
+def test_tail_text_after_skipped_elements_is_kept():
+    html = "<p>Before<script>x()</script> after<style>p{}</style>, and <b>bold</b><svg><text>S</text></svg> end.</p>"
+    assert extract_lxml(html)["text"].split() == ["Before", "after", ",", "and", "bold", "end."]
+
+
+def test_matches_the_bs4_extractor_on_a_plain_page():
+    assert extract_lxml(PAGE)["text"].split() == extract_bs4(PAGE)["text"].split()
+
+
+def test_stops_feeding_once_max_chars_is_filled(monkeypatch):
+    seen = []
+
+    class Spy(extract_mod._Target):
+        def data(self, data):
+            seen.append(len(data))
+            super().data(data)
+
+    monkeypatch.setattr(extract_mod, "_Target", Spy)
+    html = "<html><body><main>" + "<p>Some sentence of article text here.</p>" * 20000 + "</main></body></html>"
+    out = extract_lxml(html, max_chars=500)
+    assert len(out["text"]) == 500 and out["text"].startswith("Some sentence")
+    assert sum(seen) < len(html) / 10  # parsing stopped after the first chunk(s)
+
+
+def test_falls_back_to_lxml_when_an_extractor_is_missing_or_empty(monkeypatch):
+    monkeypatch.setitem(extract_mod._REGISTRY, "bs4", lambda html, max_chars: {"title": "From bs4", "text": ""})
+    out = extract(PAGE, extractor="bs4")
+    assert out["title"] == "From bs4" and out["text"].startswith("Frying")
+
+    def missing(html, max_chars):
+        raise ImportError("not installed")
+
+    monkeypatch.setitem(extract_mod._REGISTRY, "trafilatura", missing)
+    monkeypatch.setenv("SCRAPE_EXTRACTOR", "trafilatura")
+    out = extract(PAGE, max_chars=20)
+    assert out["title"].startswith("Fish & Chips") and out["text"] == "Frying Batter needs "
+
+    with pytest.raises(ValueError):
+        extract(PAGE, extractor="nope")
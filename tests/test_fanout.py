@@ -0,0 +1,173 @@
+# tests/test_fanout.py
+from __future__ import annotations
+
+import re
+import threading
+import time
+
+import pytest
+
+from agent import nodes
+from tools.search import RateLimiter
+
+
+class _NoLLM:
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError("no API key")
+
+
+def test_plan_uses_depth_and_falls_back_without_llm(monkeypatch):
+    monkeypatch.setattr(nodes, "LLM", _NoLLM)
+    assert nodes.plan({"query": "microplastics", "depth": "shallow"})["subtasks"] == ["microplastics"]
+
+    subs = nodes.plan({"query": "microplastics", "depth": "deep"})["subtasks"]
+    assert subs[0] == "microplastics" and len(subs) == 6 and len(set(subs)) == 6
+
+
+def test_web_search_fans_out_concurrently_and_honours_deadline(monkeypatch):
+    calls = []
+    lock = threading.Lock()
+
+    def fake_search(query, **kwargs):
+        with lock:
+            calls.append(query)
+        if query == "slow":
+            time.sleep(1.0)
+        time.sleep(0.2)
+        return [{"url": f"https://{query.replace(' ', '-')}.org/{i}", "title": query, "snippet": ""} for i in range(3)]
+
+    monkeypatch.setattr(nodes, "real_search", fake_search)
+    monkeypatch.setattr(nodes, "SEARCH_DEADLINE_S", 0.6)
+    state = {"query": "q", "depth": "standard", "subtasks": ["q", "q two", "slow"]}
+
+    t0 = time.perf_counter()
+    out = nodes.web_search(state)
+    elapsed = time.perf_counter() - t0
+
+    assert sorted(calls) == ["q", "q two", "slow"]
+    assert elapsed < 0.9  # concurrent, and the slow sub-query was dropped at the deadline
+    urls = [r["url"] for r in out["search_results"].values()]
+    assert urls == ["https://q.org/0", "https://q-two.org/0"]  # interleaved, one per domain
+
+
+def test_rate_limiter_spaces_out_acquisitions():
+    limiter = RateLimiter(rate=20, burst=2)
+    t0 = time.perf_counter()
+    for _ in range(6):
+        limiter.acquire()
+    assert 0.15 <= time.perf_counter() - t0 < 0.6
+
+
+def test_gather_overlaps_fetches_and_cancels_stragglers(monkeypatch):
+    def fake_search(query, **kwargs):
+        time.sleep(0.3 if query == "late" else 0.05)
+        return [{"url": f"https://{query}-{i}.org/", "title": query, "snippet": f"snippet {query} {i}"} for i in range(2)]
+
+    def fake_scrape(url, **kwargs):
+        time.sleep(2.0 if url.startswith("https://fast-1") else 0.05)
+        return {"url": url, "title": url, "text": "evidence " * 60}
+
+    monkeypatch.setattr(nodes, "real_search", fake_search)
+    monkeypatch.setattr(nodes, "real_scrape", fake_scrape)
+    monkeypatch.setattr(nodes, "PIPELINE_MIN_DOCS", 3)
+    state = {"query": "fast", "depth": "standard", "subtasks": ["fast", "late"]}
+
+    t0 = time.perf_counter()
+    out = nodes.gather(state)
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 1.0  # neither waited for the 2 s page nor ran the stages back to back
+    stats = {s["url"]: s for s in out["fetch_stats"]}
+    assert stats["https://fast-1.org/"].get("cancelled")
+    slow = next(d for d in out["docs"] if d["url"] == "https://fast-1.org/")
+    assert slow["text"] == "snippet fast 1"
+    assert sum(1 for d in out["docs"] if d["text"].startswith("evidence")) == 3
+
+
+class _NotesLLM:
+    prompts: list = []
+
+    def __init__(self, temperature=None, max_tokens=None, **kwargs):
+        self.max_tokens = max_tokens or 700
+        self.model = "gpt-4o-mini"
+
+    def chat(self, system, user):
+        time.sleep(0.2)
+        sid = system.split("citation [")[1].split("]")[0]
+        return "NONE" if sid == "3" else f"- fact from source {sid} [{sid}]"
+
+    def stream(self, system, user):
+        _NotesLLM.prompts.append(user)
+        yield "answer"
+
+
+def test_map_reduce_writer_condenses_docs_in_parallel(monkeypatch):
+    monkeypatch.setattr(nodes, "LLM", _NotesLLM)
+    monkeypatch.setenv("WRITER_MODE", "auto")
+    docs = [{"url": f"https://s{i}.org", "title": f"S{i}", "text": f"source {i} microplastics evidence " * 40} for i in range(1, 7)]
+
+    t0 = time.perf_counter()
+    out = nodes.write({"query": "microplastics evidence", "depth": "deep", "docs": docs})
+    elapsed = time.perf_counter() - t0
+
+    assert elapsed < 0.6  # six 0.2 s note calls ran concurrently
+    assert len(out["notes"]) == 5 and out["notes"][0].startswith("(Source 1: S1)")
+    reduce_prompt = _NotesLLM.prompts[-1]
+    assert "fact from source 6 [6]" in reduce_prompt and "source 3" not in reduce_prompt
+    assert "answer" in out["draft"]
+
+
+class _LongNotesLLM:
+    prompts: list = []
+
+    def __init__(self, temperature=None, max_tokens=None, **kwargs):
+        self.max_tokens = max_tokens or 700
+        self.model = "gpt-4o-mini"
+
+    def chat(self, system, user):
+        if system.startswith("You merge"):
+            cites = sorted(set(re.findall(r"\[\d+\]", user)), key=lambda c: int(c[1:-1]))
+            return "- merged evidence " + " ".join(cites)
+        sid = system.split("citation [")[1].split("]")[0]
+        return f"- long finding from source {sid} " + "with supporting detail " * 60 + f"[{sid}]"
+
+    def stream(self, system, user):
+        _LongNotesLLM.prompts.append(user)
+        yield "answer"
+
+
+@pytest.mark.parametrize("notes_budget", [16000, 900])
+def test_every_source_reaches_the_reduce_prompt_on_a_deep_run(monkeypatch, notes_budget):
+    monkeypatch.setattr(nodes, "LLM", _LongNotesLLM)
+    monkeypatch.setattr(nodes, "NOTES_MAX_TOKENS", notes_budget)  # 900: notes overflow and get merged
+    monkeypatch.setenv("WRITER_MODE", "auto")
+    docs = [{"url": f"https://s{i}.org", "title": f"S{i}", "text": f"source {i} evidence " * 40} for i in range(1, 17)]
+
+    out = nodes.write({"query": "evidence", "depth": "deep", "docs": docs})
+
+    prompt = _LongNotesLLM.prompts[-1]
+    assert all(f"[{i}]" in prompt for i in range(1, 17))
+    assert "notes_dropped" not in (out.get("degraded") or [])
+
+
+def test_gather_cancels_straggling_fetches_when_it_hands_over(monkeypatch):
+    stopped = []
+
+    def fake_search(query, **kwargs):
+        return [{"url": f"https://h{i}.org/", "title": "t", "snippet": f"snippet {i}"} for i in range(4)]
+
+    def fake_scrape(url, cancel=None, **kwargs):
+        if url != "https://h0.org/":
+            if cancel.wait(5.0):  # a slow body that stops as soon as gather gives up on it
+                stopped.append(url)
+                raise nodes.FetchCancelled(url)
+        return {"url": url, "title": url, "text": "evidence " * 60}
+
+    monkeypatch.setattr(nodes, "real_search", fake_search)
+    monkeypatch.setattr(nodes, "real_scrape", fake_scrape)
+    monkeypatch.setattr(nodes, "PIPELINE_MIN_DOCS", 1)
+    out = nodes.gather({"query": "q", "depth": "standard", "subtasks": ["q"]})
+
+    time.sleep(0.1)
+    assert sorted(stopped) == ["https://h1.org/", "https://h2.org/", "https://h3.org/"]
+    assert sum(1 for s in out["fetch_stats"] if s.get("cancelled")) == 3
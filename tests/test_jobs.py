@@ -0,0 +1,104 @@
+# tests/test_jobs.py
+from __future__ import annotations
+
+import asyncio
+import threading
+
+import pytest
+
+from agent.jobs import JobManager, QueueFull
+
+
+def _fake_run(calls, gate):
+    def run(state):
+        calls.append(state["query"])
+        yield {"type": "stage", "stage": "search", "status": "start"}
+        gate.wait(2)
+        yield {"type": "token", "text": "hello"}
+        yield {"type": "final", "state": {"draft": f"# {state['query']}", "docs": [{"url": "https://a.org"}]}}
+    return run
+
+
+def test_identical_questions_coalesce_and_stream():
+    calls, gate = [], threading.Event()
+
+    async def scenario():
+        jm = JobManager(run=_fake_run(calls, gate), workers=1, queue_max=4)
+        await jm.start()
+        a, coalesced_a = jm.submit("Trending  question?", "standard")
+        b, coalesced_b = jm.submit("trending question", "standard")
+        c, _ = jm.submit("trending question", "deep")
+        assert b is a and not coalesced_a and coalesced_b and c is not a
+
+        async def collect(job):
+            return [ev async for ev in job.follow()]
+
+        followers = [asyncio.create_task(collect(a)), asyncio.create_task(collect(a))]
+        await asyncio.sleep(0.05)
+        gate.set()
+        streams = await asyncio.gather(*followers)
+        while c.status not in ("done", "error"):
+            await asyncio.sleep(0.01)
+        await jm.stop()
+        return jm, a, streams
+
+    jm, job, streams = asyncio.run(scenario())
+    assert calls == ["Trending  question?", "trending question"]
+    assert job.status == "done" and job.result["draft"] == "# Trending  question?"
+    for events in streams:
+        kinds = [e["type"] for e in events]
+        assert kinds[0] == "status" and kinds[-1] == "end"
+        assert "token" in kinds and "final" not in kinds
+    assert jm.stats()["coalesced"] == 1 and jm.stats()["completed"] == 2
+
+
+def test_admission_control_rejects_when_queue_full():
+    calls, gate = [], threading.Event()
+
+    async def scenario():
+        jm = JobManager(run=_fake_run(calls, gate), workers=1, queue_max=1)
+        await jm.start()
+        jm.submit("first")
+        await asyncio.sleep(0.05)  # worker picks it up
+        jm.submit("second")
+        with pytest.raises(QueueFull):
+            jm.submit("third")
+        gate.set()
+        await jm.stop()
+        return jm
+
+    jm = asyncio.run(scenario())
+    assert jm.stats()["rejected"] == 1
+
+
+def test_finished_jobs_are_evicted_by_count_and_age():
+    gate = threading.Event()
+
+    def run(state):
+        if state["query"] == "slow":
+            gate.wait(2)
+        yield {"type": "final", "state": {"draft": state["query"]}}
+
+    async def finish(job):
+        while job.status not in ("done", "error"):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0)
+
+    async def scenario():
+        jm = JobManager(run=run, workers=2, history=3, retention_s=3600)
+        await jm.start()
+        slow, _ = jm.submit("slow")
+        for i in range(5):
+            job, _ = jm.submit(f"q{i}")
+            await finish(job)
+        kept_by_count = [j.query for j in jm.jobs.values()]
+
+        jm.retention_s = 0
+        gate.set()
+        await finish(slow)
+        await jm.stop()
+        return jm, kept_by_count
+
+    jm, kept_by_count = asyncio.run(scenario())
+    assert kept_by_count == ["slow", "q3", "q4"]  # a running job at the front doesn't block eviction
+    assert not jm.jobs and jm.stats()["evicted"] == 6
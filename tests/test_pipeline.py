@@ -2,17 +2,19 @@
 from __future__ import annotations
 
 from unittest.mock import patch
-from agent.graph import app
 
+from agent.graph import app, build_app
+from bench.stubs import StubConfig, Stubs
 
-def _fake_search(query: str, k: int = 6):
+
+def _fake_search(query: str, k: int = 6, **kwargs):
     return [
         {"title": "Paper 1", "url": "https://example.org/p1", "snippet": "quantum annealing overview"},
-        {"title": "Paper 2", "url": "https://example.org/p2", "snippet": "gate-model vs annealing"},
+        {"title": "Paper 2", "url": "https://example.net/p2", "snippet": "gate-model vs annealing"},
     ]
 
 
-def _fake_scrape(url: str):
+def _fake_scrape(url: str, **kwargs):
     return {
         "url": url,
         "title": "Mock Page",
@@ -20,12 +22,15 @@ def _fake_scrape(url: str):
             "Quantum annealing optimizes Ising models via energy minimization, "
             "while gate-model quantum computing uses universal gates and circuits. "
             "They differ in control, universality, and error models."
-        ),
+        ) + (" Example.org" if "example.org" in url else " Example.net") * 60,
     }
 
 
 class _DummyLLM:
-    def __init__(self, *_, **__): ...
+    def __init__(self, *_, **__):
+        self.model = "gpt-4o-mini"
+        self.max_tokens = 700
+
     def chat(self, system: str, user: str) -> str:
         return "Here is a concise draft comparing quantum annealing and gate-model QC."
 
@@ -44,12 +49,32 @@ def test_basic():
         "quality": {"score": 0, "iterations": 0},
     }
 
-    with patch("agent.nodes.web_search", side_effect=_fake_search), \
-         patch("agent.nodes.scrape", side_effect=_fake_scrape), \
-         patch("tools.search.web_search", side_effect=_fake_search), \
-         patch("tools.scrape.scrape", side_effect=_fake_scrape), \
-         patch("tools.llm.LLM", _DummyLLM):
+    # nodes imports these names directly, so patch them where they are looked up
+    with patch("agent.nodes.real_search", side_effect=_fake_search), \
+         patch("agent.nodes.real_scrape", side_effect=_fake_scrape), \
+         patch("agent.nodes.LLM", _DummyLLM):
 
         out = app.invoke(state)
 
     assert out.get("draft"), "Pipeline produced no draft"
+    assert "concise draft" in out["draft"]
+    assert "https://example.org/p1" in out["draft"] and "https://example.net/p2" in out["draft"]
+
+
+def test_offline_end_to_end_against_stubs(monkeypatch, tmp_path):
+    config = StubConfig(hosts=4, latency_ms=5, slow_pct=0, fail_pct=25, search_ms=5, llm_ttft_ms=5, llm_token_ms=0)
+    with Stubs(config) as stubs:
+        for key, value in stubs.env().items():
+            monkeypatch.setenv(key, value)
+        for key in ("SCRAPE_CACHE", "SEARCH_CACHE", "LLM_CACHE"):
+            monkeypatch.setenv(key, "0")
+        monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+
+        for graph in (app, build_app(pipelined=False)):
+            out = graph.invoke({"query": "Impacts of microplastics on human health", "depth": "standard"})
+            assert len(out["subtasks"]) == 3
+            assert out["docs"] and any(len(d["text"]) > 1000 for d in out["docs"])
+            assert "[1]" in out["draft"] and "## References" in out["draft"]
+        stats = stubs.stats()
+
+    assert stats["search_requests"] >= 3 and stats["llm_requests"] >= 2 and stats["web_failures"] >= 1
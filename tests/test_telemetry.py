@@ -0,0 +1,74 @@
+# tests/test_telemetry.py
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from tools import telemetry
+
+
+@pytest.fixture
+def traced_to(tmp_path, monkeypatch):
+    monkeypatch.setattr(telemetry, "_exporters", [])
+    monkeypatch.setattr(telemetry, "registry", telemetry.Registry())
+    path = tmp_path / "trace.jsonl"
+    telemetry.configure(jsonl=str(path), quiet=True)
+    yield path
+    telemetry.configure(enabled=False, quiet=False)
+    for exp in telemetry._exporters:
+        if isinstance(exp, telemetry.JsonlExporter):
+            exp.close()
+
+
+@telemetry.traced("tool.inner")
+def _inner(x):
+    telemetry.count("bytes", 10, kind="test")
+    return x * 2
+
+
+@telemetry.traced("tool.gen")
+def _gen(n):
+    for i in range(n):
+        yield _inner(i)
+
+
+def test_disabled_is_passthrough():
+    assert not telemetry.enabled()
+    assert telemetry.span("x") is telemetry._NO_SPAN
+    assert _inner(2) == 4 and list(_gen(2)) == [0, 2]
+
+
+def test_spans_counters_and_exporters(traced_to):
+    with telemetry.span("node.outer", depth="deep"):
+        assert list(_gen(3)) == [0, 2, 4]
+        telemetry.bind(_inner)(1)
+    telemetry.log("browse", "done", docs=3)
+
+    records = [json.loads(line) for line in traced_to.read_text().splitlines()]
+    spans = {r["name"]: r for r in records if r["kind"] == "span" and r["name"] != "tool.inner"}
+    inner = [r for r in records if r.get("name") == "tool.inner"]
+    assert spans["tool.gen"]["parent"] == spans["node.outer"]["id"]
+    assert spans["node.outer"]["attrs"] == {"depth": "deep"}
+    assert len(inner) == 4 and all(r["parent"] for r in inner)
+    assert any(r["kind"] == "log" and r["node"] == "browse" and r["docs"] == 3 for r in records)
+
+    text = telemetry.prometheus_text()
+    assert 'deep_research_span_seconds_count{span="tool.inner",error="false"} 4' in text
+    assert 'deep_research_bytes{kind="test"} 40' in text
+
+
+def test_batch_items_tag_their_records_with_their_id(traced_to, tmp_path):
+    from batch import run_batch
+
+    class Graph:
+        def stream(self, state, stream_mode=None):
+            telemetry.log("plan", f"planning {state['query']}")
+            yield "values", {**state, "draft": "# Draft"}
+
+    items = [{"id": f"q{i}", "query": f"question {i}", "depth": "shallow"} for i in range(4)]
+    run_batch(items, tmp_path / "results.jsonl", tmp_path / "out", workers=2, graph=Graph())
+    logs = [json.loads(line) for line in traced_to.read_text().splitlines()]
+    logs = [r for r in logs if r["kind"] == "log" and r["node"] == "plan"]
+    assert sorted((r["run"], r["msg"]) for r in logs) == [(f"q{i}", f"planning question {i}") for i in range(4)]
+    assert telemetry._run.get() is None
@@ -0,0 +1,131 @@
+# tests/test_vectorstore.py
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from tools import embeddings as embeddings_mod
+from tools.embeddings import HashingBackend, OpenAIBackend
+from tools.vectorestore import VectorStore
+
+
+class _RandomStore(VectorStore):
+    """VectorStore with a deterministic, offline embedder."""
+
+    def __init__(self, dim: int = 32, **kwargs) -> None:
+        super().__init__(dim=dim, **kwargs)
+        self._dim = dim
+
+    def _embed(self, texts):
+        out = []
+        for t in texts:
+            rng = np.random.default_rng(abs(hash(t)) % (2**32))
+            out.append(rng.standard_normal(self._dim))
+        return np.array(out, dtype=np.float32)
+
+
+@pytest.fixture(autouse=True)
+def _api_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test")
+
+
+@pytest.fixture(autouse=True)
+def _isolated_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(embeddings_mod, "_cache", None)
+
+
+def test_growth_and_normalised_rows():
+    vs = _RandomStore()
+    for i in range(100):
+        vs.add([f"t{i}"])
+    assert len(vs) == 100 and vs.vectors.shape == (100, 32)
+    assert vs._buf.shape[0] >= 100
+    assert np.allclose(np.linalg.norm(vs.vectors, axis=1), 1.0, atol=1e-5)
+
+
+def test_topk_matches_bruteforce_and_batched_search():
+    vs = _RandomStore()
+    texts = [f"doc {i}" for i in range(200)]
+    vs.add(texts)
+
+    hits = vs.similarity_search("doc 17", k=5)
+    assert hits[0]["text"] == "doc 17"
+    assert [h["score"] for h in hits] == sorted((h["score"] for h in hits), reverse=True)
+
+    many = vs.similarity_search_many(["doc 17", "doc 42", "doc 199"], k=3)
+    assert [m[0]["text"] for m in many] == ["doc 17", "doc 42", "doc 199"]
+    assert [h["text"] for h in many[0]] == [h["text"] for h in hits[:3]]
+
+
+@pytest.mark.parametrize("index", ["numpy", "flat", "hnsw"])
+def test_save_load_roundtrip(tmp_path, index):
+    if index != "numpy":
+        pytest.importorskip("faiss")
+    vs = _RandomStore(dim=16, index=index)
+    vs.add([f"doc {i}" for i in range(50)], [{"i": i} for i in range(50)])
+    vs.save(tmp_path / "store")
+
+    loaded = _RandomStore.load(tmp_path / "store")
+    assert loaded.dim == 16 and len(loaded) == 50
+    assert isinstance(loaded.vectors, np.memmap) or isinstance(loaded._buf, np.memmap)
+    assert loaded.texts[7] == "doc 7" and loaded.metas[7] == {"i": 7}
+
+    hit = loaded.similarity_search("doc 7", k=1)[0]
+    assert hit["text"] == "doc 7" and hit["metadata"] == {"i": 7}
+
+    loaded.add(["extra"], [{"i": 50}])
+    assert len(loaded) == 51 and loaded.texts[50] == "extra"
+    assert loaded.similarity_search("extra", k=1)[0]["text"] == "extra"
+
+
+def test_embedding_pipeline_dedupes_caches_and_keeps_order(tmp_path):
+    from tools.diskcache import DiskCache
+    from tools.embeddings import EmbeddingPipeline
+
+    calls = []
+
+    def fake_embed(batch):
+        calls.append(list(batch))
+        return np.array([[len(t), i] for i, t in enumerate(batch)], dtype=np.float32)
+
+    cache = DiskCache("emb", path=tmp_path / "emb.sqlite")
+    pipe = EmbeddingPipeline(fake_embed, model="m", cache=cache, batch_size=2, workers=3)
+    texts = ["aa", "b", "aa", "cccc", "b", "dd"]
+    out = pipe.embed(texts)
+
+    assert out.shape == (6, 2)
+    assert list(out[:, 0]) == [2, 1, 2, 4, 1, 2]
+    assert np.array_equal(out[0], out[2]) and np.array_equal(out[1], out[4])
+    assert sorted(t for b in calls for t in b) == ["aa", "b", "cccc", "dd"]
+    assert all(len(b) <= 2 for b in calls)
+
+    again = EmbeddingPipeline(fake_embed, model="m", cache=cache).embed(["dd", "aa"])
+    assert len(calls) == 2 and list(again[:, 0]) == [2, 2]
+
+
+def test_hashing_backend_offline_store():
+    vs = VectorStore(backend="hashing")
+    vs.add([
+        "Quantum annealing minimises the energy of an Ising model.",
+        "Gate-model quantum computers apply universal gate sequences.",
+        "Microplastics accumulate in marine food webs.",
+    ])
+    assert vs.dim == vs.backend.dim
+    top = vs.similarity_search("ising model energy annealing", k=1)[0]
+    assert top["text"].startswith("Quantum annealing")
+
+
+def test_load_restores_the_embedding_backend_model_and_dim(tmp_path, monkeypatch):
+    monkeypatch.setenv("EMBED_MODEL", "text-embedding-3-small")
+    vs = VectorStore(backend=HashingBackend(dim=64))
+    vs.add(["Quantum annealing minimises Ising energy.", "Microplastics accumulate in food webs."])
+    loaded = VectorStore.load(vs.save(tmp_path / "hashing"))
+    assert loaded.backend.model == "hashing-64"
+    assert loaded.similarity_search("ising energy", k=1)[0]["text"].startswith("Quantum")
+    with pytest.raises(ValueError):
+        VectorStore.load(tmp_path / "hashing", backend=HashingBackend(dim=128))
+
+    api = VectorStore(backend=OpenAIBackend("text-embedding-3-large"))
+    api.add_vectors(np.eye(4, dtype=np.float32), [f"t{i}" for i in range(4)])
+    assert VectorStore.load(api.save(tmp_path / "openai")).backend.model == "text-embedding-3-large"
@@ -0,0 +1,258 @@
+# tools/backends.py
+"""
+Scheduling over interchangeable backends (search providers) with per-backend
+circuit breakers and health stats.
+
+  CircuitBreaker   closed -> open after `failures` consecutive errors; while open
+                   calls are skipped at once; after `cooldown_s` one probe call is
+                   let through (half-open) and its outcome closes or re-opens it
+  Scheduler.call   runs backends in priority order under one of three modes:
+                     fallback  next backend only after the previous one came back
+                               empty or failed
+                     hedge     as fallback, but also fire the next backend once the
+                               current one has been running longer than its usual
+                               latency (a percentile of its recent successes)
+                     race      fire every backend at once
+                   and returns the first good answer.
+  remaining(s)     inside a backend call: seconds left before the caller gives up,
+                   so a backend can cap its own request timeout and a hedged or
+                   raced loser frees its worker when the caller stops waiting
+
+Backends signal failure by raising; an empty answer is not a failure (e.g. no
+API key configured) but is not accepted either.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, Sequence, Tuple
+
+from tools import telemetry
+
+MODES = ("fallback", "hedge", "race")
+
+_call = threading.local()  # deadline of the Scheduler.call a worker thread is serving
+
+
+def remaining(default: float) -> float:
+    """Seconds the current backend call may take: `default`, capped by its caller's deadline."""
+    deadline = getattr(_call, "deadline", None)
+    if deadline is None:
+        return default
+    return max(0.1, min(default, deadline - time.monotonic()))
+
+
+def _pct(values: Sequence[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class CircuitBreaker:
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+    def __init__(self, failures: int = 3, cooldown_s: float = 60.0, clock: Callable[[], float] = time.monotonic) -> None:
+        self.failures = max(1, int(failures))
+        self.cooldown_s = float(cooldown_s)
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive = 0
+        self.opened_at = 0.0
+        self.opens = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go ahead now (claims the probe slot when half-open)."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and self.clock() - self.opened_at >= self.cooldown_s:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def success(self) -> None:
+        with self._lock:
+            self.state, self.consecutive, self._probing = self.CLOSED, 0, False
+
+    def failure(self) -> None:
+        with self._lock:
+            self.consecutive += 1
+            if self.state == self.HALF_OPEN or self.consecutive >= self.failures:
+                if self.state != self.OPEN:
+                    self.opens += 1
+                self.state, self.opened_at, self._probing = self.OPEN, self.clock(), False
+
+
+class Backend:
+    def __init__(self, name: str, fn: Callable[..., Any], breaker: Optional[CircuitBreaker] = None, window: int = 100) -> None:
+        self.name = name
+        self.fn = fn
+        self.breaker = breaker or CircuitBreaker()
+        self.latencies: Deque[float] = deque(maxlen=window)  # ms, successful calls only
+        self.counters: Dict[str, int] = {
+            "calls": 0, "ok": 0, "empty": 0, "errors": 0, "short_circuited": 0, "hedges": 0, "wins": 0,
+            "expired": 0,
+        }
+        self._lock = threading.Lock()
+
+    def bump(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def record(self, ms: float, ok: bool, good: bool) -> None:
+        with self._lock:
+            if ok:
+                self.latencies.append(ms)
+                self.counters["ok" if good else "empty"] += 1
+            else:
+                self.counters["errors"] += 1
+        (self.breaker.success if ok else self.breaker.failure)()
+
+    def latency(self, q: float) -> Optional[float]:
+        with self._lock:
+            values = list(self.latencies)
+        return _pct(values, q) if values else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.counters)
+        p50, p95 = self.latency(0.5), self.latency(0.95)
+        out.update(
+            state=self.breaker.state,
+            consecutive_errors=self.breaker.consecutive,
+            opens=self.breaker.opens,
+            p50_ms=round(p50, 1) if p50 is not None else None,
+            p95_ms=round(p95, 1) if p95 is not None else None,
+        )
+        return out
+
+
+class Scheduler:
+    """
+    mode         fallback | hedge | race
+    hedge_pct    percentile of the running backend's recent latency after which
+                 the next backend is fired (hedge mode)
+    hedge_min_ms / hedge_max_ms
+                 clamp on that delay; hedge_max_ms is also used until a backend
+                 has `hedge_samples` successful calls on record
+    timeout_s    overall budget per call; whatever is still running is abandoned
+                 (backends see the caller's deadline through remaining())
+    callers      concurrent call()s that can each have every backend in flight;
+                 the pool is sized from it so hedges never queue behind losers
+    """
+
+    def __init__(
+        self,
+        backends: Sequence[Backend],
+        mode: str = "hedge",
+        hedge_pct: float = 90.0,
+        hedge_min_ms: float = 500.0,
+        hedge_max_ms: float = 4000.0,
+        hedge_samples: int = 5,
+        timeout_s: float = 30.0,
+        callers: int = 8,
+    ) -> None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+        self.backends = list(backends)
+        self.mode = mode
+        self.hedge_pct = float(hedge_pct)
+        self.hedge_min_ms = float(hedge_min_ms)
+        self.hedge_max_ms = float(hedge_max_ms)
+        self.hedge_samples = int(hedge_samples)
+        self.timeout_s = float(timeout_s)
+        workers = max(1, callers) * max(1, len(self.backends))
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backend")
+
+    def hedge_delay(self, backend: Backend) -> float:
+        """Seconds to give `backend` before the next one is fired alongside it."""
+        if len(backend.latencies) < self.hedge_samples:
+            ms = self.hedge_max_ms
+        else:
+            ms = backend.latency(self.hedge_pct / 100.0) or self.hedge_max_ms
+        return min(max(ms, self.hedge_min_ms), self.hedge_max_ms) / 1000.0
+
+    def _run(self, backend: Backend, accept: Callable[[Any], bool], deadline: float, args: Tuple,
+             kwargs: Dict) -> Tuple[bool, Any]:
+        if time.monotonic() >= deadline:  # the caller gave up before a worker was free
+            backend.bump("expired")
+            return False, None
+        backend.bump("calls")
+        t0 = time.perf_counter()
+        _call.deadline = deadline
+        try:
+            result = backend.fn(*args, **kwargs)
+        except Exception as e:
+            backend.record((time.perf_counter() - t0) * 1000.0, ok=False, good=False)
+            telemetry.count("backend_calls", backend=backend.name, outcome="error")
+            telemetry.log("backends", f"{backend.name} failed: {type(e).__name__}: {e}"[:200])
+            return False, None
+        finally:
+            _call.deadline = None
+        good = bool(accept(result))
+        backend.record((time.perf_counter() - t0) * 1000.0, ok=True, good=good)
+        telemetry.count("backend_calls", backend=backend.name, outcome="ok" if good else "empty")
+        return good, result
+
+    def call(self, *args: Any, accept: Callable[[Any], bool] = bool, timeout_s: Optional[float] = None,
+             **kwargs: Any) -> Tuple[Optional[str], Any]:
+        """
+        (winning backend name, result), or (None, None) when nothing gave a good
+        answer within min(timeout_s, self.timeout_s).
+        """
+        queue = list(self.backends)
+        running: Dict[Future, Backend] = {}
+        budget = self.timeout_s if timeout_s is None else min(self.timeout_s, timeout_s)
+        deadline = time.monotonic() + budget
+        next_fire = 0.0  # monotonic time at which the next backend may be started
+
+        def fire(hedge: bool) -> bool:
+            nonlocal next_fire
+            while queue:
+                backend = queue.pop(0)
+                if not backend.breaker.allow():
+                    backend.bump("short_circuited")
+                    continue
+                if hedge:
+                    backend.bump("hedges")
+                    telemetry.count("backend_hedges", backend=backend.name)
+                running[self._pool.submit(telemetry.bind(self._run), backend, accept, deadline, args, kwargs)] = backend
+                next_fire = time.monotonic() + self.hedge_delay(backend)
+                return True
+            return False
+
+        if self.mode == "race":
+            while fire(False):
+                pass
+        else:
+            fire(False)
+
+        while running:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            timeout = deadline - now
+            if self.mode == "hedge" and queue:
+                timeout = min(timeout, max(0.0, next_fire - now))
+            done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+            for fut in done:
+                backend = running.pop(fut)
+                good, result = fut.result()
+                if good:
+                    backend.bump("wins")
+                    return backend.name, result
+            if not running or (not done and self.mode == "hedge"):
+                fire(hedge=bool(running))
+        return None, None
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {b.name: b.stats() for b in self.backends}
+
+    def shutdown(self) -> None:
+        """Stop the worker pool; calls still queued are dropped, running ones finish on their own."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,182 @@
+# tools/context.py
+"""
+Token-budgeted, relevance-ranked context packing for the writer.
+
+Docs are split into paragraph/sentence-aware chunks, scored against the query
+with BM25, and packed greedily (best first) until an exact token budget,
+measured with tiktoken, is full. The chosen chunks are then put back in
+document order so the prompt reads naturally.
+"""
+from __future__ import annotations
+
+import math
+import os
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+# Context windows (tokens) for the models we use; unknown models get the default.
+CONTEXT_WINDOWS = {
+    "gpt-4o": 128_000,
+    "gpt-4o-mini": 128_000,
+    "gpt-4.1": 1_047_576,
+    "gpt-4.1-mini": 1_047_576,
+    "gpt-4-turbo": 128_000,
+    "gpt-4": 8_192,
+    "gpt-3.5-turbo": 16_385,
+}
+DEFAULT_CONTEXT_WINDOW = 8_192
+
+_SENT_SPLIT = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"'(\[])")
+_WORD = re.compile(r"\w+")
+_STOP = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "what which who will with how why does do".split()
+)
+
+
+@lru_cache(maxsize=8)
+def _encoder(model: str) -> Optional[Callable[[str], List[int]]]:
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        enc = tiktoken.encoding_for_model(model)
+    except KeyError:
+        try:
+            enc = tiktoken.get_encoding("o200k_base")
+        except Exception:
+            return None
+    except Exception:  # encoding file not cached and no network
+        return None
+    return enc.encode_ordinary
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Exact count with tiktoken; ~4 chars/token estimate when it is unavailable."""
+    enc = _encoder(model)
+    if enc is None:
+        return max(1, math.ceil(len(text) / 4)) if text else 0
+    return len(enc(text))
+
+
+def context_window(model: str) -> int:
+    if model in CONTEXT_WINDOWS:
+        return CONTEXT_WINDOWS[model]
+    # dated snapshots, e.g. gpt-4o-mini-2024-07-18 -> gpt-4o-mini
+    for name in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+        if model.startswith(name):
+            return CONTEXT_WINDOWS[name]
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def context_budget(model: str, max_tokens: int, prompt_overhead: int = 0, cap: Optional[int] = None) -> int:
+    """
+    Tokens available for context: the model window minus the completion
+    reservation and the fixed prompt, capped by `cap` or CONTEXT_MAX_TOKENS
+    (default 3000) because more context costs latency long before it hits
+    the window.
+    """
+    cap = int(os.getenv("CONTEXT_MAX_TOKENS", "3000")) if cap is None else int(cap)
+    room = context_window(model) - int(max_tokens) - int(prompt_overhead) - 64
+    return max(0, min(cap, room))
+
+
+def split_chunks(text: str, target_chars: int = 900) -> List[str]:
+    """Split on paragraphs, then sentences, packing pieces up to ~target_chars."""
+    pieces: List[str] = []
+    for para in re.split(r"\n\s*\n", text or ""):
+        para = " ".join(para.split())
+        if not para:
+            continue
+        if len(para) <= target_chars:
+            pieces.append(para)
+            continue
+        for sent in _SENT_SPLIT.split(para):
+            # hard-wrap run-on "sentences" (scraped text often has no punctuation)
+            while len(sent) > target_chars:
+                cut = sent.rfind(" ", 0, target_chars)
+                cut = cut if cut > target_chars // 2 else target_chars
+                pieces.append(sent[:cut].strip())
+                sent = sent[cut:].strip()
+            if sent:
+                pieces.append(sent)
+
+    chunks: List[str] = []
+    buf = ""
+    for p in pieces:
+        if buf and len(buf) + 1 + len(p) > target_chars:
+            chunks.append(buf)
+            buf = p
+        else:
+            buf = f"{buf} {p}" if buf else p
+    if buf:
+        chunks.append(buf)
+    return chunks
+
+
+def _terms(text: str) -> List[str]:
+    return [w for w in _WORD.findall(text.casefold()) if w not in _STOP]
+
+
+def bm25_scores(query: str, texts: List[str], k1: float = 1.5, b: float = 0.75) -> List[float]:
+    docs = [Counter(_terms(t)) for t in texts]
+    if not docs:
+        return []
+    lens = [sum(d.values()) for d in docs]
+    avg = (sum(lens) / len(lens)) or 1.0
+    n = len(docs)
+    scores = [0.0] * n
+    for term in set(_terms(query)):
+        df = sum(1 for d in docs if term in d)
+        if not df:
+            continue
+        idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        for i, d in enumerate(docs):
+            tf = d.get(term, 0)
+            if tf:
+                scores[i] += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * lens[i] / avg))
+    return scores
+
+
+def pack_context(
+    query: str,
+    docs: List[Dict[str, Any]],
+    source_ids: Dict[str, int],
+    budget_tokens: int,
+    model: str = "gpt-4o-mini",
+    separator: str = "\n\n---\n\n",
+) -> List[str]:
+    """
+    Return context blocks "(Source n: title)\\n<chunk>" whose total token count
+    (separators included) fits `budget_tokens`.
+    """
+    cands: List[Dict[str, Any]] = []
+    for di, d in enumerate(docs):
+        url = (d.get("url") or "").strip()  # keyed like the writer's reference list
+        cid = source_ids.get(url)
+        if cid is None:
+            continue
+        title = (d.get("title") or url).strip()
+        for ci, ch in enumerate(split_chunks(d.get("text", ""))):
+            cands.append({"doc": di, "pos": ci, "block": f"(Source {cid}: {title})\n{ch}", "text": ch})
+    if not cands or budget_tokens <= 0:
+        return []
+
+    for c, s in zip(cands, bm25_scores(query, [c["text"] for c in cands])):
+        # tiny lead bias so ties (and zero-score queries) prefer earlier text
+        c["score"] = s - 1e-3 * c["pos"] - 1e-4 * c["doc"]
+
+    sep_tokens = count_tokens(separator, model)
+    used, chosen = 0, []
+    for c in sorted(cands, key=lambda c: c["score"], reverse=True):
+        cost = count_tokens(c["block"], model) + (sep_tokens if chosen else 0)
+        if used + cost > budget_tokens:
+            continue
+        chosen.append(c)
+        used += cost
+
+    chosen.sort(key=lambda c: (c["doc"], c["pos"]))
+    return [c["block"] for c in chosen]
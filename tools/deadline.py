@@ -0,0 +1,90 @@
+# tools/deadline.py
+"""
+Whole-run latency budget.
+
+A run's deadline lives in AgentState as plain numbers
+(state["deadline"] = {"start": epoch s, "at": epoch s}) so it survives
+checkpoints; Deadline.of(state) gives the helper object nodes pass to tools.
+
+  remaining()           seconds left (inf when the run has no budget)
+  timeout(cap)          min(cap, remaining); raises DeadlineExceeded once spent
+  share(frac, cap)      a slice of what is left, for one stage
+  fraction_left()       1.0 at the start, 0.0 at the deadline
+
+The budget comes from state["budget_s"] (cli --budget, the API's budget_s) or
+RUN_BUDGET_S; 0 / unset means no overall budget, and every tool then falls
+back to its own fixed cap.
+"""
+from __future__ import annotations
+
+import math
+import os
+import time
+from typing import Any, Dict, Optional
+
+
+class DeadlineExceeded(TimeoutError):
+    """The run's budget is spent; callers should degrade instead of waiting."""
+
+
+class Deadline:
+    __slots__ = ("start", "at")
+
+    def __init__(self, seconds: Optional[float] = None, start: Optional[float] = None, at: Optional[float] = None) -> None:
+        self.start = time.time() if start is None else float(start)
+        if at is not None:
+            self.at = float(at)
+        else:
+            self.at = self.start + float(seconds) if seconds and seconds > 0 else math.inf
+
+    @classmethod
+    def of(cls, state: Optional[Dict[str, Any]]) -> "Deadline":
+        """The run's deadline, created (from budget_s / RUN_BUDGET_S) and stored on first call."""
+        if state is None:
+            return cls()
+        raw = state.get("deadline")
+        if isinstance(raw, Deadline):
+            return raw
+        if isinstance(raw, dict) and "at" in raw:
+            return cls(start=raw.get("start"), at=raw["at"])
+        budget = state.get("budget_s") or float(os.getenv("RUN_BUDGET_S", "0") or 0)
+        dl = cls(seconds=float(budget or 0))
+        state["deadline"] = dl.as_dict()
+        return dl
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"start": self.start, "at": self.at}
+
+    @property
+    def bounded(self) -> bool:
+        return self.at != math.inf
+
+    @property
+    def budget(self) -> float:
+        return self.at - self.start
+
+    def remaining(self) -> float:
+        return self.at - time.time()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def fraction_left(self) -> float:
+        if not self.bounded:
+            return 1.0
+        return max(0.0, min(1.0, self.remaining() / self.budget)) if self.budget > 0 else 0.0
+
+    def timeout(self, cap: float) -> float:
+        left = self.remaining()
+        if left <= 0:
+            raise DeadlineExceeded("run deadline passed")
+        return min(float(cap), left)
+
+    def share(self, frac: float, cap: float = math.inf) -> float:
+        """min(cap, frac * remaining), never negative; `cap` alone when unbounded."""
+        if not self.bounded:
+            return cap
+        return max(0.0, min(cap, frac * self.remaining()))
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.2f}s)" if self.bounded else "Deadline(unbounded)"
@@ -0,0 +1,130 @@
+# tools/dedupe.py
+"""
+Near-duplicate detection for fetched documents (syndicated / mirrored pages).
+
+Each text is reduced to a MinHash signature over word 5-gram shingles (char
+5-grams for very short texts such as snippet fallbacks). Signatures are split
+into LSH bands; only documents that share a band bucket are compared, so the
+cost is near-linear in the number of documents. Candidate pairs whose
+estimated Jaccard similarity reaches `threshold` are merged with union-find,
+and each cluster is collapsed to its longest text, which keeps the other URLs
+as `alt_urls`.
+
+Env:
+  DEDUPE=0               disable the stage
+  DEDUPE_THRESHOLD=0.8   estimated Jaccard similarity that counts as a duplicate
+"""
+from __future__ import annotations
+
+import os
+import re
+import zlib
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_PRIME = np.uint64(4294967311)  # smallest prime above 2**32
+_WORD = re.compile(r"\w+")
+
+
+def enabled() -> bool:
+    return os.getenv("DEDUPE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def shingles(text: str, k: int = 5) -> np.ndarray:
+    """crc32 of every k-word shingle (k-char shingles when the text has fewer than k words)."""
+    words = _WORD.findall((text or "").casefold())
+    if len(words) >= k:
+        grams = (" ".join(words[i : i + k]) for i in range(len(words) - k + 1))
+    else:
+        s = " ".join(words)
+        grams = (s[i : i + k] for i in range(max(1, len(s) - k + 1)))
+    return np.unique(np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64))
+
+
+class MinHasher:
+    """Universal-hash permutations (a*x + b) mod p over 32-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        # a < 2**32 (not p): with x a crc32 < 2**32, a*x <= (2**32 - 1)**2 fits in uint64
+        self.a = rng.integers(1, 2**32, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=(num_perm, 1), dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        if hashes.size == 0:
+            return np.full(self.num_perm, int(_PRIME), dtype=np.uint64)
+        # exact: a*x does not wrap (see __init__), and (a*x % p) + b < 2*p
+        perm = (self.a * hashes[None, :] % _PRIME + self.b) % _PRIME
+        return perm.min(axis=1)
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def near_duplicate_groups(
+    texts: Sequence[str],
+    threshold: Optional[float] = None,
+    num_perm: int = 128,
+    bands: int = 32,
+) -> List[List[int]]:
+    """
+    Group indices of near-identical texts. Every index appears in exactly one
+    group; groups are ordered by their first member and members ascend.
+    """
+    n = len(texts)
+    if n < 2:
+        return [[i] for i in range(n)]
+    threshold = float(threshold if threshold is not None else os.getenv("DEDUPE_THRESHOLD", "0.8"))
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    sigs = np.stack([hasher.signature(shingles(t)) for t in texts])
+
+    parent = list(range(n))
+    checked = set()
+    for band in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        block = np.ascontiguousarray(sigs[:, band * rows : (band + 1) * rows])
+        for i in range(n):
+            buckets[block[i].tobytes()].append(i)
+        for members in buckets.values():
+            for pos, j in enumerate(members[1:], start=1):
+                for i in members[:pos]:
+                    if _find(parent, i) == _find(parent, j) or (i, j) in checked:
+                        continue
+                    checked.add((i, j))
+                    if float(np.mean(sigs[i] == sigs[j])) >= threshold:
+                        parent[_find(parent, j)] = _find(parent, i)
+
+    groups: Dict[int, List[int]] = {}
+    for i in range(n):
+        groups.setdefault(_find(parent, i), []).append(i)
+    return sorted(groups.values(), key=lambda g: g[0])
+
+
+def collapse_duplicates(docs: List[Dict[str, Any]], threshold: Optional[float] = None) -> Tuple[List[Dict[str, Any]], int]:
+    """
+    Collapse near-duplicate docs. The longest text in each group is kept at the
+    position of the group's first doc; the other URLs go to its `alt_urls`.
+    Returns (docs, number removed).
+    """
+    groups = near_duplicate_groups([d.get("text") or "" for d in docs], threshold)
+    out: List[Dict[str, Any]] = []
+    for group in groups:
+        keep = max(group, key=lambda i: (len(docs[i].get("text") or ""), -i))
+        doc = dict(docs[keep])
+        alts = list(doc.get("alt_urls") or [])
+        for i in group:
+            for url in [docs[i].get("url")] + list(docs[i].get("alt_urls") or []):
+                if url and url != doc.get("url") and url not in alts:
+                    alts.append(url)
+        if alts:
+            doc["alt_urls"] = alts
+        out.append(doc)
+    return out, len(docs) - len(out)
@@ -0,0 +1,184 @@
+# tools/diskcache.py
+"""
+Small persistent key/value cache on SQLite.
+
+Values are JSON-serialised and zlib-compressed. Every entry remembers when it
+was stored (for TTL decisions made by the caller) and when it was last read
+(for LRU eviction once the store grows past `max_bytes`). One file per cache
+name lives under CACHE_DIR (default ./.cache).
+"""
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+def cache_dir() -> Path:
+    return Path(os.getenv("CACHE_DIR", ".cache"))
+
+
+def _encode(value: Any) -> bytes:
+    return zlib.compress(json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _decode(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+class DiskCache:
+    """
+    Thread-safe SQLite cache with size-bounded LRU eviction.
+    get() returns (value, age_seconds) so callers can apply their own TTL
+    (and still use a stale entry, e.g. for HTTP revalidation).
+    """
+
+    def __init__(self, name: str, max_bytes: int = 256 * 1024 * 1024, path: Optional[Path] = None) -> None:
+        self.name = name
+        self.max_bytes = int(max_bytes)
+        self.path = Path(path) if path else cache_dir() / f"{name}.sqlite"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries(accessed_at)")
+        row = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        self._bytes, self._count = int(row[0]), int(row[1])
+        self.counters: Dict[str, int] = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.counters["hits"] += 1
+        try:
+            return _decode(row[0]), max(0.0, now - row[1])
+        except Exception:
+            self.delete(key)
+            return None
+
+    def get_many(self, keys: List[str]) -> Dict[str, Tuple[Any, float]]:
+        """Batch get(): one query per 500 keys instead of one per key. Missing keys are omitted."""
+        now = time.time()
+        found: Dict[str, Tuple[Any, float]] = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                part = keys[i : i + 500]
+                marks = ",".join("?" * len(part))
+                for key, blob, stored_at in self._db.execute(
+                    f"SELECT key, value, stored_at FROM entries WHERE key IN ({marks})", part
+                ).fetchall():
+                    try:
+                        found[key] = (_decode(blob), max(0.0, now - stored_at))
+                    except Exception:
+                        continue
+            if found:
+                self._db.execute("BEGIN")
+                self._db.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?", [(now, k) for k in found])
+                self._db.execute("COMMIT")
+            self.counters["hits"] += len(found)
+            self.counters["misses"] += len(keys) - len(found)
+        return found
+
+    def set_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        """Batch set() in one transaction."""
+        rows = [(key, _encode(value)) for key, value in items]
+        if not rows:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for key, blob in rows:
+                    old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                        (key, blob, len(blob), now, now),
+                    )
+                    self._bytes += len(blob) - (old[0] if old else 0)
+                    self._count += 0 if old else 1
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+            self.counters["writes"] += len(rows)
+            self._evict()
+
+    def set(self, key: str, value: Any) -> None:
+        blob = _encode(value)
+        now = time.time()
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, stored_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._bytes += len(blob) - (old[0] if old else 0)
+            self._count += 0 if old else 1
+            self.counters["writes"] += 1
+            self._evict()
+
+    def touch(self, key: str) -> None:
+        """Mark an entry as freshly stored (e.g. after a 304 Not Modified)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._bytes -= old[0]
+                self._count -= 1
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """Iterate over all (key, value) pairs without touching LRU order."""
+        with self._lock:
+            rows = self._db.execute("SELECT key, value FROM entries").fetchall()
+        for key, blob in rows:
+            try:
+                yield key, _decode(blob)
+            except Exception:
+                continue
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._bytes = self._count = 0
+
+    def _evict(self) -> None:
+        # Caller holds the lock. Drop least-recently-read entries down to 90% of the cap.
+        if self._bytes <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at ASC").fetchall():
+            if self._bytes <= target:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._bytes -= size
+            self._count -= 1
+            self.counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.counters)
+            out.update(name=self.name, entries=self._count, bytes=self._bytes, max_bytes=self.max_bytes)
+        lookups = out["hits"] + out["misses"]
+        out["hit_rate"] = round(out["hits"] / lookups, 3) if lookups else 0.0
+        return out
@@ -0,0 +1,305 @@
+# tools/embeddings.py
+"""
+Embedding backends and the pipeline used by VectorStore._embed.
+
+Backends (EMBED_BACKEND):
+  openai                 OpenAI embeddings API (default; EMBED_MODEL)
+  hashing                local, no model download: signed feature hashing of
+                         words, word bigrams and char trigrams (EMBED_DIM)
+  sentence-transformers  local model via sentence-transformers
+                         (EMBED_ST_MODEL), loaded from local files only
+  local                  sentence-transformers if its model is available,
+                         otherwise hashing
+
+Pipeline:
+  1. deduplicate inputs by content hash
+  2. serve repeats from a persistent cache keyed by (model, text hash)
+  3. split the misses into count- and token-bounded batches, embedded
+     concurrently by a bounded worker pool with retry + backoff
+  4. reassemble the vectors in input order
+
+Env:
+  EMBED_CACHE=0              disable the persistent cache
+  EMBED_CACHE_MAX_MB=512     LRU size bound for the cache
+  EMBED_BATCH_SIZE=256       inputs per request
+  EMBED_BATCH_TOKENS=100000  tokens per request (API limit is 300k)
+  EMBED_WORKERS=4            concurrent requests
+  EMBED_RETRIES=3            attempts per batch
+"""
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from tools.context import count_tokens
+from tools.diskcache import DiskCache
+from tools.telemetry import log
+
+EmbedFn = Callable[[List[str]], np.ndarray]
+
+
+class EmbeddingBackend:
+    """texts -> float32 matrix. `model` names the vector space (and keys the cache)."""
+
+    name = "base"
+    model = ""
+    dim: Optional[int] = None  # None until known (API models)
+    cacheable = True  # worth a disk round trip per text?
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        raise NotImplementedError
+
+
+class OpenAIBackend(EmbeddingBackend):
+    name = "openai"
+
+    def __init__(self, model: Optional[str] = None) -> None:
+        self.model = model or os.getenv("EMBED_MODEL", "text-embedding-3-small")
+        self._client: Any = None
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            from tools.runtime import openai_client
+
+            self._client = openai_client()
+        return self._client
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        resp = self.client.embeddings.create(model=self.model, input=texts)
+        return np.array([d.embedding for d in resp.data], dtype=np.float32)
+
+
+_WORDS = re.compile(r"\w+")
+
+
+@lru_cache(maxsize=1 << 18)
+def _word_hashes(word: str) -> Tuple[int, ...]:
+    """crc32 of the word and of its boundary-marked char trigrams (memoised per word)."""
+    w = f"<{word}>"
+    feats = [word] + ["#" + w[i : i + 3] for i in range(len(w) - 2)]
+    return tuple(zlib.crc32(f.encode("utf-8")) for f in feats)
+
+
+class HashingBackend(EmbeddingBackend):
+    """
+    Offline embedder: words, word bigrams and char trigrams are hashed (crc32)
+    into `dim` signed buckets with sublinear log(1 + tf) weights, then rows
+    are L2-normalised. Deterministic across processes, no fitting, no download.
+    """
+
+    name = "hashing"
+    cacheable = False  # recomputing is cheaper than a cache lookup
+
+    def __init__(self, dim: Optional[int] = None) -> None:
+        self.dim = int(dim or os.getenv("EMBED_DIM", "768"))
+        self.model = f"hashing-{self.dim}"
+
+    def _hashes(self, text: str) -> List[int]:
+        words = _WORDS.findall(text.casefold())
+        out: List[int] = []
+        for w in words:
+            out.extend(_word_hashes(w))
+        out.extend(zlib.crc32(f"{a} {b}".encode("utf-8")) for a, b in zip(words, words[1:]))
+        return out
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        rows: List[int] = []
+        hashes: List[int] = []
+        for r, text in enumerate(texts):
+            hs = self._hashes(text)
+            rows.extend([r] * len(hs))
+            hashes.extend(hs)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        if hashes:
+            h = np.asarray(hashes, dtype=np.uint64)
+            r = np.asarray(rows, dtype=np.int64)
+            cols = (h % self.dim).astype(np.int64)
+            sign = np.where((h >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+            # term frequency per (row, signed bucket), then sublinear weighting
+            counts = np.bincount(r * self.dim + cols, weights=sign, minlength=len(texts) * self.dim)
+            counts = counts.reshape(len(texts), self.dim).astype(np.float32)
+            out = np.sign(counts) * np.log1p(np.abs(counts))
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return (out / np.maximum(norms, 1e-8)).astype(np.float32)
+
+
+class SentenceTransformersBackend(EmbeddingBackend):
+    name = "sentence-transformers"
+
+    def __init__(self, model: Optional[str] = None, batch_size: int = 64) -> None:
+        from sentence_transformers import SentenceTransformer  # optional dependency
+
+        name = model or os.getenv("EMBED_ST_MODEL", "all-MiniLM-L6-v2")
+        device = os.getenv("EMBED_DEVICE", "cpu")
+        self._model = SentenceTransformer(name, device=device, local_files_only=True)
+        self.model = f"st:{name}"
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vecs = self._model.encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.asarray(vecs, dtype=np.float32)
+
+
+BACKENDS = ("openai", "hashing", "sentence-transformers", "local")
+
+
+def get_backend(name: Optional[str] = None, model: Optional[str] = None, dim: Optional[int] = None) -> EmbeddingBackend:
+    """
+    Backend by name (EMBED_BACKEND). `model` is a backend's `model` string as
+    saved with a store (e.g. "text-embedding-3-large", "st:all-MiniLM-L6-v2")
+    and `dim` the hashing width; both default to the environment.
+    """
+    name = (name or os.getenv("EMBED_BACKEND", "openai")).lower()
+    if name == "openai":
+        return OpenAIBackend(model)
+    if name == "hashing":
+        return HashingBackend(dim)
+    if name in ("sentence-transformers", "local"):
+        try:
+            return SentenceTransformersBackend(model[3:] if model and model.startswith("st:") else model)
+        except Exception as e:
+            if name != "local":
+                raise
+            log("embeddings", f"sentence-transformers model unavailable ({type(e).__name__}); using hashing embedder")
+            return HashingBackend()
+    raise ValueError(f"unknown embedding backend {name!r}; expected one of {BACKENDS}")
+
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off")
+
+
+def embed_cache() -> Optional[DiskCache]:
+    global _cache
+    if not _env_flag("EMBED_CACHE", "1"):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_mb = float(os.getenv("EMBED_CACHE_MAX_MB", "512"))
+                _cache = DiskCache("embeddings", max_bytes=int(max_mb * 1024 * 1024))
+    return _cache
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _pack(vec: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(vec, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def _unpack(blob: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(blob), dtype=np.float32)
+
+
+class EmbeddingPipeline:
+    def __init__(
+        self,
+        embed_fn: EmbedFn,
+        model: str,
+        cache: Any = "default",
+        batch_size: Optional[int] = None,
+        batch_tokens: Optional[int] = None,
+        workers: Optional[int] = None,
+        retries: Optional[int] = None,
+    ) -> None:
+        self.embed_fn = embed_fn
+        self.model = model
+        self.cache: Optional[DiskCache] = embed_cache() if cache == "default" else cache
+        self.batch_size = batch_size or int(os.getenv("EMBED_BATCH_SIZE", "256"))
+        self.batch_tokens = batch_tokens or int(os.getenv("EMBED_BATCH_TOKENS", "100000"))
+        self.workers = workers or int(os.getenv("EMBED_WORKERS", "4"))
+        self.retries = retries or int(os.getenv("EMBED_RETRIES", "3"))
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {"inputs": 0, "unique": 0, "cache_hits": 0, "embedded": 0, "batches": 0}
+
+    def _key(self, h: str) -> str:
+        return f"{self.model}:{h}"
+
+    def _batches(self, texts: List[str]) -> List[List[str]]:
+        batches: List[List[str]] = []
+        cur: List[str] = []
+        cur_tokens = 0
+        for t in texts:
+            n = count_tokens(t, self.model)
+            if cur and (len(cur) >= self.batch_size or cur_tokens + n > self.batch_tokens):
+                batches.append(cur)
+                cur, cur_tokens = [], 0
+            cur.append(t)
+            cur_tokens += n
+        if cur:
+            batches.append(cur)
+        return batches
+
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        for attempt in range(self.retries):
+            try:
+                vecs = np.asarray(self.embed_fn(batch), dtype=np.float32)
+                if len(vecs) != len(batch):
+                    raise RuntimeError(f"embedding backend returned {len(vecs)} vectors for {len(batch)} inputs")
+                return vecs
+            except Exception:
+                if attempt + 1 >= self.retries:
+                    raise
+                time.sleep(min(8.0, 0.5 * 2 ** attempt))
+        raise RuntimeError("unreachable")
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        hashes = [text_hash(t) for t in texts]
+        unique: Dict[str, str] = {}
+        for h, t in zip(hashes, texts):
+            unique.setdefault(h, t)
+
+        vectors: Dict[str, np.ndarray] = {}
+        if self.cache is not None:
+            found = self.cache.get_many([self._key(h) for h in unique])
+            for h in unique:
+                hit = found.get(self._key(h))
+                if hit is not None:
+                    vectors[h] = _unpack(hit[0])
+
+        missing = [h for h in unique if h not in vectors]
+        batches = self._batches([unique[h] for h in missing])
+        if batches:
+            workers = max(1, min(self.workers, len(batches)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+                results = list(pool.map(self._embed_batch, batches))
+            fresh = [v for r in results for v in r]
+            for h, v in zip(missing, fresh):
+                vectors[h] = v
+            if self.cache is not None:
+                self.cache.set_many((self._key(h), _pack(vectors[h])) for h in missing)
+
+        with self._lock:
+            self.counters["inputs"] += len(texts)
+            self.counters["unique"] += len(unique)
+            self.counters["cache_hits"] += len(unique) - len(missing)
+            self.counters["embedded"] += len(missing)
+            self.counters["batches"] += len(batches)
+        return np.stack([vectors[h] for h in hashes]).astype(np.float32, copy=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters)
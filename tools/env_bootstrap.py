@@ -1,9 +1,5 @@
 # tools/env_bootstrap.py
-from pathlib import Path
-from dotenv import load_dotenv, find_dotenv
+# Entry points import this first so .env is in os.environ before anything reads it.
+from tools.runtime import load_env
 
-
-load_dotenv(Path.cwd() / ".env", override=False)
-
-
-load_dotenv(find_dotenv(), override=True)  
+load_env()
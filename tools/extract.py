@@ -0,0 +1,179 @@
+# tools/extract.py
+"""
+HTML -> {title, text} extractors used by tools.scrape.
+
+  lxml          (default) SAX-style lxml parser target: no tree is built, boilerplate
+                subtrees are skipped as they stream past, and feeding stops as soon
+                as the character budget is filled.
+  bs4           the original BeautifulSoup(lxml) + decompose + get_text path.
+  trafilatura   trafilatura.extract (optional dependency).
+  readability   readability-lxml Document.summary (optional dependency).
+
+Select with SCRAPE_EXTRACTOR or extract(..., extractor=...). Every extractor
+prefers <main> over <body>, drops script/style/nav/header/footer/noscript and
+returns whitespace-collapsed text of at most `max_chars` characters.
+"""
+from __future__ import annotations
+
+import os
+import re
+from typing import Callable, Dict, List, Optional
+
+EXTRACTORS = ("lxml", "bs4", "trafilatura", "readability")
+
+_SKIP = frozenset({"script", "style", "nav", "header", "footer", "noscript", "template", "svg", "iframe"})
+_FEED_CHUNK = 32 * 1024
+_WS = re.compile(r"\s+")
+
+
+def _clean(txt: str) -> str:
+    return _WS.sub(" ", (txt or "").strip())
+
+
+def _cap(text: str, max_chars: Optional[int]) -> str:
+    return text[:max_chars] if max_chars else text
+
+
+class _Target:
+    """lxml parser target collecting visible text; sets `full` once the budget is met."""
+
+    def __init__(self, max_chars: Optional[int]) -> None:
+        self.max_chars = max_chars
+        self.skip = 0
+        self.in_title = False
+        self.in_main = 0
+        self.seen_main = False
+        self.title: List[str] = []
+        self.main: List[str] = []
+        self.body: List[str] = []
+        self.main_len = self.body_len = 0
+        self.full = False
+
+    def start(self, tag, attrib) -> None:
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.skip or tag in _SKIP:
+            self.skip += 1
+        elif tag == "title":
+            self.in_title = True
+        elif tag == "main":
+            self.in_main += 1
+            self.seen_main = True
+        self._sep()
+
+    def end(self, tag) -> None:
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if self.skip:
+            self.skip -= 1
+        elif tag == "title":
+            self.in_title = False
+        elif tag == "main" and self.in_main:
+            self.in_main -= 1
+        self._sep()
+
+    def _sep(self) -> None:
+        if self.body and self.body[-1] != " ":
+            self.body.append(" ")
+        if self.in_main and self.main and self.main[-1] != " ":
+            self.main.append(" ")
+
+    def data(self, data: str) -> None:
+        if self.in_title:
+            self.title.append(data)
+            return
+        if self.skip or self.full:
+            return
+        self.body.append(data)
+        self.body_len += len(data)
+        if self.in_main:
+            self.main.append(data)
+            self.main_len += len(data)
+        if self.max_chars:
+            # Raw lengths over-count whitespace, so wait for 1.5x before stopping;
+            # without a <main> yet, keep going a little longer in case one follows.
+            need = int(self.max_chars * 1.5)
+            if self.main_len >= need or (not self.seen_main and self.body_len >= 2 * need):
+                self.full = True
+
+    def comment(self, text) -> None:
+        pass
+
+    def close(self) -> Dict[str, str]:
+        chunks = self.main if self.seen_main and self.main_len else self.body
+        return {"title": _clean("".join(self.title)), "text": _cap(_clean("".join(chunks)), self.max_chars)}
+
+
+def extract_lxml(html: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    from lxml import etree
+
+    target = _Target(max_chars)
+    parser = etree.HTMLParser(target=target, recover=True, remove_comments=True)
+    for i in range(0, len(html), _FEED_CHUNK):
+        parser.feed(html[i : i + _FEED_CHUNK])
+        if target.full:
+            break
+    try:
+        return parser.close()
+    except etree.XMLSyntaxError:
+        return target.close()
+
+
+def extract_bs4(html: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, "lxml")
+
+    main = soup.find("main") or soup.body or soup
+    for bad in main.select("script, style, nav, header, footer, noscript"):
+        bad.decompose()
+
+    title = _clean(soup.title.string if soup.title and soup.title.string else "")
+    text = _clean(main.get_text(" "))
+    return {"title": title, "text": _cap(text, max_chars)}
+
+
+def _title_only(html: str) -> str:
+    m = re.search(r"<title[^>]*>(.*?)</title>", html[:200_000], re.I | re.S)
+    return _clean(m.group(1)) if m else ""
+
+
+def extract_trafilatura(html: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    import trafilatura
+
+    text = trafilatura.extract(html, include_comments=False, include_tables=True, favor_precision=True) or ""
+    return {"title": _title_only(html), "text": _cap(_clean(text), max_chars)}
+
+
+def extract_readability(html: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    from lxml import html as lxml_html
+    from readability import Document
+
+    doc = Document(html)
+    summary = lxml_html.fromstring(doc.summary(html_partial=True))
+    return {"title": _clean(doc.short_title() or ""), "text": _cap(_clean(summary.text_content()), max_chars)}
+
+
+_REGISTRY: Dict[str, Callable[[str, Optional[int]], Dict[str, str]]] = {
+    "lxml": extract_lxml,
+    "bs4": extract_bs4,
+    "trafilatura": extract_trafilatura,
+    "readability": extract_readability,
+}
+
+
+def extract(html: str, max_chars: Optional[int] = None, extractor: Optional[str] = None) -> Dict[str, str]:
+    """
+    Extract {title, text}. Falls back to the lxml extractor if the chosen one is
+    not installed or yields nothing.
+    """
+    name = (extractor or os.getenv("SCRAPE_EXTRACTOR", "lxml")).lower()
+    fn = _REGISTRY.get(name)
+    if fn is None:
+        raise ValueError(f"unknown extractor {name!r}; expected one of {EXTRACTORS}")
+    try:
+        out = fn(html, max_chars)
+    except ImportError:
+        out = {}
+    if not out.get("text") and fn is not extract_lxml:
+        fallback = extract_lxml(html, max_chars)
+        out = {"title": out.get("title") or fallback["title"], "text": fallback["text"]}
+    return out
@@ -0,0 +1,243 @@
+# tools/http_pool.py
+"""
+Process-wide pooled HTTP client shared by tools.search and tools.scrape.
+
+One lazily-built httpx.Client keeps connections alive between calls (and
+between runs in a long-lived Gradio/CLI process), negotiates HTTP/2 when the
+optional `h2` package is installed, and advertises every compression scheme
+httpx can decode here. Reuse is measured with httpcore's trace hook: a request
+that did not open a TCP connection was served from the pool (a "hit").
+
+Tuning (env):
+  HTTP_POOL_MAX_CONNECTIONS  total open connections            (default 100)
+  HTTP_POOL_KEEPALIVE        idle connections kept warm        (default 20)
+  HTTP_POOL_PER_HOST         concurrent requests per host      (default 10)
+  HTTP_KEEPALIVE_EXPIRY      seconds an idle connection lives  (default 30)
+  HTTP2                      set to 0 to force HTTP/1.1        (default 1)
+"""
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from tools import telemetry
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except ValueError:
+        return default
+
+
+_client: Optional[httpx.Client] = None
+_client_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, int] = {"requests": 0, "hits": 0, "misses": 0, "errors": 0}
+_per_host: Dict[str, Dict[str, int]] = {}
+_versions: Dict[str, int] = {}  # negotiated protocol -> responses, e.g. {"HTTP/2": 12}
+
+
+def _accept_encoding() -> str:
+    encodings = ["gzip", "deflate"]
+    try:
+        import brotli  # noqa: F401  (tools.brotli_patch may alias brotlicffi here)
+        encodings.append("br")
+    except Exception:
+        try:
+            import brotlicffi  # noqa: F401
+            encodings.append("br")
+        except Exception:
+            pass
+    try:
+        import zstandard  # noqa: F401
+        encodings.append("zstd")
+    except Exception:
+        pass
+    return ", ".join(encodings)
+
+
+def _http2_available() -> bool:
+    if os.getenv("HTTP2", "1").lower() in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def client() -> httpx.Client:
+    """Return the shared client, building it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                limits = httpx.Limits(
+                    max_connections=_env_int("HTTP_POOL_MAX_CONNECTIONS", 100),
+                    max_keepalive_connections=_env_int("HTTP_POOL_KEEPALIVE", 20),
+                    keepalive_expiry=float(_env_int("HTTP_KEEPALIVE_EXPIRY", 30)),
+                )
+                _client = httpx.Client(
+                    http2=_http2_available(),
+                    limits=limits,
+                    follow_redirects=True,
+                    headers={"Accept-Encoding": _accept_encoding()},
+                )
+    return _client
+
+
+def close() -> None:
+    """Close the shared client; the next request builds a fresh one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+def _host(url: str) -> str:
+    return (urlsplit(url).hostname or "").lower()
+
+
+class KeyedLimiter:
+    """
+    At most `limit` concurrent holders per key (e.g. per host). A key's
+    semaphore only exists while someone holds or waits on it, so a crawl over
+    many hosts does not leave one behind per host.
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = max(1, int(limit))
+        self._lock = threading.Lock()
+        self._slots: Dict[str, List[Any]] = {}  # key -> [semaphore, holders + waiters]
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[None]:
+        with self._lock:
+            entry = self._slots.get(key)
+            if entry is None:
+                entry = self._slots[key] = [threading.BoundedSemaphore(self.limit), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._slots[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._slots)
+
+
+_host_limiter = KeyedLimiter(_env_int("HTTP_POOL_PER_HOST", 10))
+
+
+def _record(host: str, outcome: str, resp: Optional[httpx.Response] = None) -> None:
+    with _stats_lock:
+        _stats["requests"] += 1
+        _stats[outcome] += 1
+        h = _per_host.setdefault(host, {"hits": 0, "misses": 0, "errors": 0})
+        h[outcome] += 1
+        if resp is not None:
+            _versions[resp.http_version] = _versions.get(resp.http_version, 0) + 1
+
+
+class _ConnectTracer:
+    """httpcore trace callback; notes whether the request opened a new socket."""
+
+    __slots__ = ("connected",)
+
+    def __init__(self) -> None:
+        self.connected = False
+
+    def __call__(self, event: str, info: Dict[str, Any]) -> None:
+        if event.startswith("connection.connect_tcp") or event.startswith("connection.connect_unix"):
+            self.connected = True
+
+
+def request(method: str, url: str, **kwargs: Any) -> httpx.Response:
+    """
+    Send one request through the shared pool.
+    Accepts the usual httpx keyword arguments (headers, params, json, timeout, ...).
+    """
+    host = _host(url)
+    tracer = _ConnectTracer()
+    extensions = dict(kwargs.pop("extensions", None) or {})
+    extensions["trace"] = tracer
+    with _host_limiter.hold(host):
+        try:
+            resp = client().request(method, url, extensions=extensions, **kwargs)
+        except Exception:
+            _record(host, "errors")
+            raise
+    _record(host, "misses" if tracer.connected else "hits", resp)
+    return resp
+
+
+@contextmanager
+def stream(method: str, url: str, **kwargs: Any) -> Iterator[httpx.Response]:
+    """
+    Like request(), but the body is not read: iterate resp.iter_bytes() and
+    stop whenever you like. Leaving the block early closes the connection
+    instead of returning it to the pool.
+    """
+    host = _host(url)
+    tracer = _ConnectTracer()
+    extensions = dict(kwargs.pop("extensions", None) or {})
+    extensions["trace"] = tracer
+    with _host_limiter.hold(host):
+        opened = False
+        try:
+            with client().stream(method, url, extensions=extensions, **kwargs) as resp:
+                opened = True
+                _record(host, "misses" if tracer.connected else "hits", resp)
+                yield resp
+        except Exception:
+            if not opened:
+                _record(host, "errors")
+            raise
+
+
+def get(url: str, **kwargs: Any) -> httpx.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs: Any) -> httpx.Response:
+    return request("POST", url, **kwargs)
+
+
+def pool_stats() -> Dict[str, Any]:
+    """
+    Counters for connection reuse: hits = served on a warm connection.
+    http_versions counts responses per negotiated protocol; http2 is true once
+    any response actually came back over HTTP/2.
+    """
+    with _stats_lock:
+        out: Dict[str, Any] = dict(_stats)
+        out["per_host"] = {h: dict(c) for h, c in _per_host.items()}
+        out["http_versions"] = dict(_versions)
+    total = out["hits"] + out["misses"]
+    out["hit_rate"] = round(out["hits"] / total, 3) if total else 0.0
+    out["http2"] = out["http_versions"].get("HTTP/2", 0) > 0
+    return out
+
+
+def reset_stats() -> None:
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+        _per_host.clear()
+        _versions.clear()
+
+
+telemetry.register_collector("http_pool", pool_stats)
@@ -2,16 +2,35 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import random
+import time
+from typing import Any, Dict, Iterator, Optional
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from tools import runtime, telemetry
+from tools.deadline import Deadline
+from tools.llm_cache import ResponseCache, default_cache, llm_cache_stats
+
+_DEFAULT = object()
+
+
+def _retryable(e: Exception) -> bool:
+    """Connection errors, timeouts, 408/409/429 and 5xx (what the SDK itself would retry)."""
+    code = getattr(e, "status_code", None)
+    if code is not None:
+        return code >= 500 or code in (408, 409, 429)
+    return type(e).__name__ in ("APIConnectionError", "APITimeoutError")
 
 
 class LLM:
     """
     Minimal wrapper around OpenAI Chat Completions.
     Reads defaults from environment, but allows explicit overrides.
+    Responses go through a ResponseCache (tools.llm_cache); pass cache=None
+    to disable it for one instance. Each request is bounded by `timeout`
+    (LLM_TIMEOUT_S) and by `deadline`; stream() stops at the deadline and
+    returns what it has. Under a bounded deadline the SDK's retries are off and
+    _create() retries itself (LLM_ATTEMPTS=2), each attempt capped by what is
+    left of the run.
     """
 
     def __init__(
@@ -19,10 +38,11 @@ class LLM:
         model: Optional[str] = None,
         temperature: Optional[float] = None,
         max_tokens: Optional[int] = None,
+        cache: Any = _DEFAULT,
+        timeout: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
     ) -> None:
-        load_dotenv()  # load .env before reading any env vars
-
-        self.client = OpenAI()
+        runtime.load_env()  # .env before reading any env vars (no-op after the first call)
 
         self.model = model or os.getenv("OPENAI_MODEL", "gpt-4o-mini")
         self.temperature = float(
@@ -31,9 +51,57 @@ class LLM:
         self.max_tokens = int(
             os.getenv("MAX_TOKENS", "2000") if max_tokens is None else max_tokens
         )
+        self.cache: Optional[ResponseCache] = default_cache() if cache is _DEFAULT else cache
+        self.timeout = float(os.getenv("LLM_TIMEOUT_S", "60") if timeout is None else timeout)
+        self.deadline = deadline or Deadline()
+
+    @property
+    def client(self) -> Any:
+        """Shared process-wide OpenAI client (built, and openai imported, on first use)."""
+        return runtime.openai_client()
+
+    def _create(self, **kwargs: Any) -> Any:
+        if not self.deadline.bounded:
+            return self.client.chat.completions.create(timeout=self.timeout, **kwargs)
+        client = runtime.openai_client(max_retries=0)
+        attempts = max(1, int(os.getenv("LLM_ATTEMPTS", "2")))
+        for attempt in range(attempts):
+            try:
+                return client.chat.completions.create(timeout=self.deadline.timeout(self.timeout), **kwargs)
+            except Exception as e:
+                if not _retryable(e) or attempt + 1 == attempts:
+                    raise
+                pause = random.uniform(0, 0.5 * 2 ** attempt)
+                if pause >= self.deadline.remaining():
+                    raise
+                telemetry.count("llm_retries", model=self.model)
+                time.sleep(pause)
+
+    def _request(self, system: str, user: str) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "temperature": self.temperature,
+            "max_tokens": self.max_tokens,
+            "system": system,
+            "user": user,
+        }
+
+    def _usage(self, usage: Any) -> None:
+        if usage is None:
+            return
+        telemetry.count("llm_prompt_tokens", getattr(usage, "prompt_tokens", 0) or 0, model=self.model)
+        telemetry.count("llm_completion_tokens", getattr(usage, "completion_tokens", 0) or 0, model=self.model)
 
+    @telemetry.traced("llm.chat")
     def chat(self, system: str, user: str) -> str: 
-        resp = self.client.chat.completions.create(
+        request = self._request(system, user)
+        if self.cache is not None:
+            hit = self.cache.get(request)
+            if hit is not None:
+                telemetry.count("llm_cache_hits", model=self.model)
+                return hit
+
+        resp = self._create(
              model=self.model, 
              temperature=self.temperature, 
              max_tokens=self.max_tokens,
@@ -42,4 +110,51 @@ class LLM:
                    {"role": "user", "content": user},
                      ],
                 ) 
-        return (resp.choices[0].message.content or "").strip()
\ No newline at end of file
+        self._usage(getattr(resp, "usage", None))
+        text = (resp.choices[0].message.content or "").strip()
+        if self.cache is not None:
+            self.cache.put(request, text)
+        return text
+
+    @telemetry.traced("llm.stream")
+    def stream(self, system: str, user: str) -> Iterator[str]:
+        """Like chat(), but yields the answer as it is generated."""
+        request = self._request(system, user)
+        if self.cache is not None:
+            hit = self.cache.get(request)
+            if hit is not None:
+                telemetry.count("llm_cache_hits", model=self.model)
+                yield hit
+                return
+
+        parts, cut = [], False
+        response = self._create(
+            model=self.model,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            messages=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            stream=True,
+            stream_options={"include_usage": True},
+        )
+        for chunk in response:
+            if self.deadline.expired():
+                cut = True
+                telemetry.count("llm_deadline_cuts", model=self.model)
+                getattr(response, "close", lambda: None)()  # give the connection back now
+                break
+            self._usage(getattr(chunk, "usage", None))
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content or ""
+            if delta:
+                parts.append(delta)
+                yield delta
+
+        if self.cache is not None and not cut:
+            self.cache.put(request, "".join(parts).strip())
+
+
+telemetry.register_collector("llm_cache", llm_cache_stats)
@@ -0,0 +1,202 @@
+# tools/llm_cache.py
+"""
+Response cache for tools.llm.LLM.chat.
+
+Two levels, both local:
+  - exact:    SHA-256 of (model, temperature, max_tokens, system, user) -> response
+  - semantic: optional; reuses a response whose user prompt is near-identical
+              (cosine of hashed word/bigram vectors >= threshold) under the same
+              model, sampling settings and system prompt.
+
+Only deterministic / low-temperature calls are cached unless configured.
+
+Env:
+  LLM_CACHE=0                         disable the cache
+  LLM_CACHE_MAX_TEMPERATURE=0.3       highest temperature that is cached
+  LLM_CACHE_TTL=604800                seconds a cached response stays valid
+  LLM_CACHE_MAX_MB=64                 LRU size bound
+  LLM_CACHE_SEMANTIC=1                enable the semantic level
+  LLM_CACHE_SEMANTIC_THRESHOLD=0.95   minimum cosine similarity for a reuse
+  LLM_CACHE_SEMANTIC_MAX=5000         prompts kept in the in-memory index
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from tools.diskcache import DiskCache
+
+if TYPE_CHECKING:
+    import numpy as np
+
+_DIM = 1024
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in ("0", "false", "no", "off")
+
+
+def request_key(request: Dict[str, Any]) -> str:
+    blob = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _partition(request: Dict[str, Any]) -> str:
+    # Everything except the user prompt must match exactly for a semantic reuse.
+    return request_key({k: v for k, v in request.items() if k != "user"})
+
+
+def _sketch(text: str) -> np.ndarray:
+    """Unit-length hashed bag of words + bigrams; cheap and needs no model."""
+    import numpy as np  # semantic mode only; keeps numpy off the start-up path
+
+    words = re.findall(r"\w+", text.casefold())
+    v = np.zeros(_DIM, dtype=np.float32)
+    for tok in words + [a + " " + b for a, b in zip(words, words[1:])]:
+        v[zlib.crc32(tok.encode("utf-8")) % _DIM] += 1.0
+    n = float(np.linalg.norm(v))
+    return v / n if n else v
+
+
+class ResponseCache:
+    """Interface: plug any object with these methods into LLM(cache=...)."""
+
+    def get(self, request: Dict[str, Any]) -> Optional[str]:
+        return None
+
+    def put(self, request: Dict[str, Any], response: str) -> None:
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class LocalResponseCache(ResponseCache):
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl: float = 7 * 24 * 3600,
+        max_temperature: float = 0.3,
+        semantic: bool = False,
+        threshold: float = 0.95,
+        semantic_max: int = 5000,
+        store: Optional[DiskCache] = None,
+    ) -> None:
+        self.store = store or DiskCache("llm", max_bytes=max_bytes)
+        self.ttl = float(ttl)
+        self.max_temperature = float(max_temperature)
+        self.semantic = semantic
+        self.threshold = float(threshold)
+        self.semantic_max = int(semantic_max)
+        self._lock = threading.Lock()
+        self._index: Optional[List[Tuple[str, str, np.ndarray]]] = None  # (partition, key, vec)
+        self.counters: Dict[str, int] = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "skipped": 0}
+
+    def cacheable(self, request: Dict[str, Any]) -> bool:
+        return float(request.get("temperature") or 0.0) <= self.max_temperature
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self.counters[name] += 1
+
+    def _lookup(self, key: str) -> Optional[str]:
+        hit = self.store.get(key)
+        if not hit or hit[1] > self.ttl:
+            return None
+        return hit[0].get("response")
+
+    def _semantic_index(self) -> List[Tuple[str, str, np.ndarray]]:
+        # Caller holds the lock. Built lazily from the persisted entries.
+        if self._index is None:
+            self._index = [
+                (_partition(v["request"]), key, _sketch(v["request"].get("user", "")))
+                for key, v in self.store.items()
+                if isinstance(v, dict) and "request" in v
+            ][-self.semantic_max:]
+        return self._index
+
+    def get(self, request: Dict[str, Any]) -> Optional[str]:
+        if not self.cacheable(request):
+            self._bump("skipped")
+            return None
+        key = request_key(request)
+        found = self._lookup(key)
+        if found is not None:
+            self._bump("exact_hits")
+            return found
+
+        if self.semantic:
+            part, q = _partition(request), _sketch(request.get("user", ""))
+            with self._lock:
+                candidates = [(k, v) for p, k, v in self._semantic_index() if p == part and k != key]
+            if candidates:
+                import numpy as np
+
+                sims = np.stack([v for _, v in candidates]) @ q
+                best = int(np.argmax(sims))
+                if float(sims[best]) >= self.threshold:
+                    found = self._lookup(candidates[best][0])
+                    if found is not None:
+                        self._bump("semantic_hits")
+                        return found
+
+        self._bump("misses")
+        return None
+
+    def put(self, request: Dict[str, Any], response: str) -> None:
+        if not response or not self.cacheable(request):
+            return
+        key = request_key(request)
+        self.store.set(key, {"request": request, "response": response})
+        if self.semantic:
+            with self._lock:
+                index = self._semantic_index()
+                index.append((_partition(request), key, _sketch(request.get("user", ""))))
+                if len(index) > self.semantic_max:
+                    del index[: len(index) - self.semantic_max]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = dict(self.counters)
+        lookups = out["exact_hits"] + out["semantic_hits"] + out["misses"]
+        hits = out["exact_hits"] + out["semantic_hits"]
+        out["hit_rate"] = round(hits / lookups, 3) if lookups else 0.0
+        out["semantic"] = self.semantic
+        out["store"] = self.store.stats()
+        return out
+
+
+_default: Optional[ResponseCache] = None
+_default_lock = threading.Lock()
+
+
+def default_cache() -> Optional[ResponseCache]:
+    """Process-wide cache configured from the environment (None when disabled)."""
+    global _default
+    if not _env_flag("LLM_CACHE", "1"):
+        return None
+    if _default is None:
+        with _default_lock:
+            if _default is None:
+                _default = LocalResponseCache(
+                    max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "64")) * 1024 * 1024),
+                    ttl=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+                    max_temperature=float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3")),
+                    semantic=_env_flag("LLM_CACHE_SEMANTIC", "0"),
+                    threshold=float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0.95")),
+                    semantic_max=int(os.getenv("LLM_CACHE_SEMANTIC_MAX", "5000")),
+                )
+    return _default
+
+
+def llm_cache_stats() -> Dict[str, Any]:
+    if _default is None:
+        return {"enabled": _env_flag("LLM_CACHE", "1"), "lookups": 0}
+    out = _default.stats()
+    out["enabled"] = _env_flag("LLM_CACHE", "1")
+    return out
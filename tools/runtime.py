@@ -0,0 +1,87 @@
+# tools/runtime.py
+"""
+Process-wide registry of things that should be built once, on first use.
+
+  load_env()           .env loading (cwd/.env without override, then the repo
+                       .env with override, each file at most once per process)
+  openai_client()      one OpenAI client per (base URL, API key), shared by the
+                       LLM wrapper and the embedding backend; the openai
+                       package is only imported here
+  shared(name, build)  generic build-once slot (e.g. the compiled graph, the
+                       search scheduler); peek(name) without building
+  reset()              drop everything built so far (tests start from a clean slate),
+                       shutting down what owns threads (the search scheduler)
+"""
+from __future__ import annotations
+
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+_lock = threading.RLock()
+_env_loaded = False
+_shared: Dict[Any, Any] = {}
+
+REPO_ENV = Path(__file__).resolve().parent.parent / ".env"
+
+
+def load_env() -> None:
+    global _env_loaded
+    if _env_loaded:
+        return
+    with _lock:
+        if _env_loaded:
+            return
+        from dotenv import load_dotenv
+
+        local = Path.cwd() / ".env"
+        if local.is_file() and local.resolve() != REPO_ENV:
+            load_dotenv(local, override=False)
+        if REPO_ENV.is_file():
+            load_dotenv(REPO_ENV, override=True)
+        _env_loaded = True
+
+
+def shared(name: Any, build: Callable[[], Any]) -> Any:
+    """Return the object registered under `name`, building it on first call."""
+    try:
+        return _shared[name]
+    except KeyError:
+        pass
+    with _lock:
+        if name not in _shared:
+            _shared[name] = build()
+        return _shared[name]
+
+
+def peek(name: Any) -> Optional[Any]:
+    """The object registered under `name`, or None if nothing built it yet."""
+    return _shared.get(name)
+
+
+def openai_client(max_retries: Optional[int] = None) -> Any:
+    """The shared client; max_retries overrides the SDK's own retries (a sibling sharing its connection pool)."""
+    load_env()
+    key: Tuple[str, str, str] = ("openai", os.getenv("OPENAI_BASE_URL", ""), os.getenv("OPENAI_API_KEY", ""))
+
+    def build() -> Any:
+        from openai import OpenAI
+
+        return OpenAI()
+
+    client = shared(key, build)
+    if max_retries is None:
+        return client
+    return shared(key + (max_retries,), lambda: client.with_options(max_retries=max_retries))
+
+
+def reset() -> None:
+    """Drop everything built so far (tests); objects owning worker pools are shut down."""
+    with _lock:
+        built = list(_shared.values())
+        _shared.clear()
+    for obj in built:
+        shutdown = getattr(obj, "shutdown", None)
+        if callable(shutdown):
+            shutdown()
@@ -1,9 +1,15 @@
 # tools/scrape.py
 from __future__ import annotations
-import re, time
-from typing import Dict, Optional
-import requests
-from bs4 import BeautifulSoup
+import codecs, hashlib, os, random, re, threading, time
+from typing import Any, Dict, NamedTuple, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+from tools import http_pool, telemetry
+from tools.deadline import Deadline, DeadlineExceeded
+from tools.diskcache import DiskCache
+from tools.extract import extract
 
 HEADERS = {
     "User-Agent": (
@@ -12,29 +18,365 @@ HEADERS = {
     )
 }
 
+# Scrape cache knobs (read on each call so the CLI can flip them at runtime).
+#   SCRAPE_CACHE=0            bypass the cache entirely
+#   SCRAPE_CACHE_TTL=86400    seconds before an entry must be revalidated
+#   SCRAPE_CACHE_MAX_MB=256   LRU size bound for the on-disk store
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid", "ref_src")
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+_revalidated = 0
+
+# Download knobs.
+#   SCRAPE_MAX_BYTES=2000000  stop reading a body after this many (decoded) bytes
+# Only HTML/XHTML is parsed; text/plain is taken as-is; anything else (PDF,
+# images, archives, JSON...) is skipped as soon as its headers arrive. URLs
+# whose extension already says "binary" get a cheap HEAD first so the
+# connection can go back to the pool instead of being torn down mid-body.
+_HTML_TYPES = ("text/html", "application/xhtml+xml")
+_TEXT_TYPES = ("text/plain",)
+_BINARY_EXT = (
+    ".pdf", ".zip", ".gz", ".tgz", ".rar", ".7z", ".exe", ".dmg", ".iso", ".bin",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".epub",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".svg", ".mp3", ".mp4", ".mov", ".avi", ".webm",
+)
+_META_CHARSET = re.compile(rb"<meta[^>]+charset=[\"']?([A-Za-z0-9_\-]+)", re.I)
+
+_stats_lock = threading.Lock()
+_download_stats: Dict[str, int] = {
+    "fetched": 0,
+    "bytes_downloaded": 0,
+    "bytes_saved": 0,
+    "truncated": 0,
+    "skipped_non_html": 0,
+    "head_checks": 0,
+    "cancelled": 0,  # bodies abandoned mid-stream because the caller gave up
+}
+
+
+# Fetch timeouts and retries.
+#   SCRAPE_ATTEMPTS=2         tries per URL (transport errors, 5xx, 408 and 429 only)
+#   SCRAPE_BACKOFF_S=0.25     base of the exponential backoff between tries (full jitter)
+#   SCRAPE_MIN_TIMEOUT_S=2    floor for the adaptive per-host timeout
+# The timeout passed to scrape() is a cap: once a host has answered a few
+# times, requests to it use srtt + 4 * rttvar of its fetch latency (the TCP
+# retransmission estimator), doubled on each retry, and never run past the
+# caller's deadline.
+class HostLatency:
+    def __init__(self, alpha: float = 0.125, beta: float = 0.25, k: float = 4.0, min_samples: int = 3) -> None:
+        self.alpha, self.beta, self.k, self.min_samples = alpha, beta, k, min_samples
+        self._hosts: Dict[str, list] = {}  # host -> [srtt, rttvar, samples]
+        self._lock = threading.Lock()
+
+    def observe(self, host: str, secs: float) -> None:
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None:
+                self._hosts[host] = [secs, secs / 2.0, 1]
+                return
+            h[1] = (1 - self.beta) * h[1] + self.beta * abs(h[0] - secs)
+            h[0] = (1 - self.alpha) * h[0] + self.alpha * secs
+            h[2] += 1
+
+    def timeout(self, host: str, cap: float, floor: float) -> float:
+        with self._lock:
+            h = self._hosts.get(host)
+            if h is None or h[2] < self.min_samples:
+                return cap
+            return min(cap, max(floor, h[0] + self.k * h[1]))
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {host: {"srtt_ms": round(h[0] * 1000, 1), "rttvar_ms": round(h[1] * 1000, 1), "samples": h[2]}
+                    for host, h in self._hosts.items()}
+
+
+host_latency = HostLatency()
+
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, httpx.HTTPStatusError):
+        code = e.response.status_code
+        return code >= 500 or code in (408, 429)
+    return isinstance(e, httpx.TransportError)
+
+
+class NonHTMLContent(RuntimeError):
+    """The URL serves something we don't parse (PDF, image, binary...)."""
+
+
+class FetchCancelled(RuntimeError):
+    """The caller set the fetch's `cancel` event; the response was closed mid-body."""
+
+
+class Fetched(NamedTuple):
+    status: int
+    text: str
+    content_type: str
+    headers: httpx.Headers
+    truncated: bool
+
+
+def _bump(**counts: int) -> None:
+    with _stats_lock:
+        for k, v in counts.items():
+            _download_stats[k] += v
+
+
+def download_stats() -> Dict[str, int]:
+    with _stats_lock:
+        return dict(_download_stats)
+
+
+def _max_bytes() -> int:
+    return int(os.getenv("SCRAPE_MAX_BYTES", "2000000"))
+
+
+def cache_enabled() -> bool:
+    return os.getenv("SCRAPE_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def _scrape_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_mb = float(os.getenv("SCRAPE_CACHE_MAX_MB", "256"))
+                _cache = DiskCache("scrape", max_bytes=int(max_mb * 1024 * 1024))
+    return _cache
+
+
+def scrape_cache_stats() -> Dict[str, Any]:
+    if _cache is None and not cache_enabled():
+        return {"name": "scrape", "enabled": False}
+    out = _scrape_cache().stats()
+    out["enabled"] = cache_enabled()
+    out["revalidated"] = _revalidated
+    return out
+
+
+def canonical_url(url: str) -> str:
+    """Normalise a URL so trivially different spellings share one cache entry."""
+    parts = urlsplit(url.strip())
+    scheme = (parts.scheme or "http").lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    query = sorted(
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith(_TRACKING_PARAMS)
+    )
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+def _cache_key(url: str) -> str:
+    return hashlib.sha256(canonical_url(url).encode("utf-8")).hexdigest()
+
+
 def _clean(txt: str) -> str:
     return re.sub(r"\s+", " ", (txt or "").strip())
 
-def fetch_html(url: str, timeout: int = 20) -> str:
+def _media_type(headers: Any) -> str:
+    return (headers.get("Content-Type") or "").split(";")[0].strip().lower()
+
+
+def _charset(headers: Any, head: bytes) -> str:
+    ctype = headers.get("Content-Type") or ""
+    m = re.search(r"charset=[\"']?([A-Za-z0-9_\-]+)", ctype, re.I)
+    if not m:
+        m = _META_CHARSET.search(head[:4096])
+    name = m.group(1) if m else "utf-8"
+    if isinstance(name, bytes):
+        name = name.decode("ascii", "ignore")
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return "utf-8"
+
+
+def _content_length(headers: Any) -> int:
+    try:
+        return int(headers.get("Content-Length") or 0)
+    except ValueError:
+        return 0
+
+
+def _head_check(url: str, timeout: float) -> None:
+    """HEAD a URL that looks binary; raise NonHTMLContent if the server agrees."""
+    _bump(head_checks=1)
+    try:
+        r = http_pool.request("HEAD", url, headers=HEADERS, timeout=timeout)
+    except Exception:
+        return  # let the GET decide
+    mtype = _media_type(r.headers)
+    if r.status_code < 400 and mtype and mtype not in _HTML_TYPES + _TEXT_TYPES:
+        _bump(skipped_non_html=1, bytes_saved=_content_length(r.headers))
+        raise NonHTMLContent(f"{url} is {mtype}")
+
+
+@telemetry.traced("http.download")
+def _download(url: str, timeout: float, headers: Dict[str, str], max_bytes: int,
+              deadline: Optional[Deadline] = None, cancel: Optional[threading.Event] = None) -> Fetched:
+    if cancel is not None and cancel.is_set():
+        raise FetchCancelled(url)
+    with http_pool.stream("GET", url, headers=headers, timeout=timeout) as r:
+        if r.status_code == 304:
+            return Fetched(304, "", "", httpx.Headers(r.headers), False)
+        r.raise_for_status()
+
+        mtype = _media_type(r.headers)
+        if mtype and mtype not in _HTML_TYPES + _TEXT_TYPES:
+            _bump(skipped_non_html=1, bytes_saved=_content_length(r.headers))
+            raise NonHTMLContent(f"{url} is {mtype}")
+
+        decoder = None
+        parts, size, truncated = [], 0, False
+        for chunk in r.iter_bytes():
+            if cancel is not None and cancel.is_set():
+                _bump(cancelled=1)
+                raise FetchCancelled(url)  # leaving the with-block closes the stream
+            if deadline is not None and deadline.expired() and parts:
+                truncated = True  # out of time: extract what has arrived
+                break
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(_charset(r.headers, chunk))(errors="replace")
+            room = max_bytes - size
+            if len(chunk) >= room:
+                parts.append(decoder.decode(chunk[:room], final=True))
+                size += room
+                truncated = True
+                break
+            parts.append(decoder.decode(chunk))
+            size += len(chunk)
+        if decoder is not None and not truncated:
+            parts.append(decoder.decode(b"", final=True))
+
+        downloaded = r.num_bytes_downloaded
+        saved = max(0, _content_length(r.headers) - downloaded) if truncated else 0
+        _bump(fetched=1, bytes_downloaded=downloaded, truncated=int(truncated), bytes_saved=saved)
+        telemetry.count("http_bytes_downloaded", downloaded)
+        return Fetched(r.status_code, "".join(parts), mtype or "text/html", httpx.Headers(r.headers), truncated)
+
+
+def _fetch(
+    url: str,
+    timeout: float = 20,
+    headers: Optional[Dict[str, str]] = None,
+    max_bytes: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Fetched:
+    deadline = deadline or Deadline()
+    host = (urlsplit(url).hostname or "").lower()
+    adaptive = host_latency.timeout(host, float(timeout), float(os.getenv("SCRAPE_MIN_TIMEOUT_S", "2")))
+    if urlsplit(url).path.lower().endswith(_BINARY_EXT):
+        _head_check(url, deadline.timeout(adaptive))
+    attempts = max(1, int(os.getenv("SCRAPE_ATTEMPTS", "2")))
+    backoff = float(os.getenv("SCRAPE_BACKOFF_S", "0.25"))
     last: Optional[Exception] = None
-    for _ in range(2):
+    for attempt in range(attempts):
+        t0 = time.perf_counter()
         try:
-            r = requests.get(url, headers=HEADERS, timeout=timeout)
-            r.raise_for_status()
-            return r.text
+            r = _download(url, deadline.timeout(min(float(timeout), adaptive * 2 ** attempt)),
+                          {**HEADERS, **(headers or {})}, max_bytes or _max_bytes(), deadline, cancel)
+            host_latency.observe(host, time.perf_counter() - t0)
+            return r
+        except (NonHTMLContent, DeadlineExceeded, FetchCancelled):
+            raise
         except Exception as e:
             last = e
-            time.sleep(0.8)
+            if not _retryable(e) or attempt + 1 == attempts:
+                break
+            pause = random.uniform(0, backoff * 2 ** attempt)
+            if pause >= deadline.remaining():
+                break
+            if cancel is not None:
+                if cancel.wait(pause):
+                    raise FetchCancelled(url)
+            else:
+                time.sleep(pause)
     raise RuntimeError(f"Failed to fetch {url}: {last}")
 
-def scrape(url: str, timeout: int = 20) -> Dict[str, str]:   # ← accept timeout
-    html = fetch_html(url, timeout=timeout)                   # ← pass through
-    soup = BeautifulSoup(html, "lxml")
+@telemetry.traced("tool.fetch_html")
+def fetch_html(url: str, timeout: float = 20, max_bytes: Optional[int] = None,
+               deadline: Optional[Deadline] = None) -> str:
+    return _fetch(url, timeout=timeout, max_bytes=max_bytes, deadline=deadline).text
+
+@telemetry.traced("tool.extract")
+def _extract(html: str, url: str, max_chars: Optional[int] = None) -> Dict[str, str]:
+    page = extract(html, max_chars=max_chars)
+    return {"url": url, "title": page.get("title", ""), "text": page.get("text", "")}
+
+def _cached_doc(entry: Dict[str, Any], url: str, max_chars: Optional[int]) -> Dict[str, str]:
+    # The stored doc may have been cut to a smaller budget; re-extract from the raw HTML then.
+    have = entry.get("max_chars")
+    if have and (not max_chars or max_chars > have) and len(entry["doc"].get("text", "")) >= have:
+        return _extract(entry.get("html", ""), url, max_chars)
+    doc = dict(entry["doc"], url=url)
+    if max_chars:
+        doc["text"] = doc.get("text", "")[:max_chars]
+    return doc
+
+@telemetry.traced("tool.scrape")
+def scrape(
+    url: str,
+    timeout: float = 20,   # ← accept timeout (a cap; see HostLatency)
+    use_cache: bool = True,
+    max_chars: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    deadline: Optional[Deadline] = None,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, str]:
+    """
+    Fetch and extract {url, title, text}. `max_chars` lets the extractor stop
+    as soon as that much text is collected (SCRAPE_EXTRACTOR picks the engine);
+    `max_bytes` caps the download (default SCRAPE_MAX_BYTES). Raises
+    NonHTMLContent for PDFs, images and other bodies we don't parse, and
+    DeadlineExceeded once `deadline` has passed (a body still arriving at the
+    deadline is cut off and extracted as is), and FetchCancelled as soon as the
+    caller sets `cancel` (the connection is closed, nothing is kept).
+    """
+    global _revalidated
+    cache = _scrape_cache() if use_cache and cache_enabled() else None
+    key = _cache_key(url) if cache else ""
+    cached = cache.get(key) if cache else None
+    headers: Dict[str, str] = {}
+
+    if cached:
+        entry, age = cached
+        if age < float(os.getenv("SCRAPE_CACHE_TTL", "86400")):
+            return _cached_doc(entry, url, max_chars)
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    r = _fetch(url, timeout=timeout, headers=headers, max_bytes=max_bytes, deadline=deadline, cancel=cancel)
+    if cached and r.status == 304:
+        cache.touch(key)
+        with _cache_lock:
+            _revalidated += 1
+        return _cached_doc(cached[0], url, max_chars)
+
+    html = r.text
+    if r.content_type in _TEXT_TYPES:
+        text = _clean(html)
+        doc = {"url": url, "title": "", "text": text[:max_chars] if max_chars else text}
+    else:
+        doc = _extract(html, url, max_chars)
+    if cache and not (deadline is not None and deadline.expired()):  # may be cut short; don't keep it
+        cache.set(key, {
+            "url": canonical_url(url),
+            "html": html,
+            "doc": doc,
+            "max_chars": max_chars,
+            "etag": r.headers.get("ETag", ""),
+            "last_modified": r.headers.get("Last-Modified", ""),
+        })
+    return doc
 
-    main = soup.find("main") or soup.body or soup
-    for bad in main.select("script, style, nav, header, footer, noscript"):
-        bad.decompose()
 
-    title = _clean(soup.title.string if soup.title and soup.title.string else "")
-    text = _clean(main.get_text(" "))
-    return {"url": url, "title": title, "text": text}
+telemetry.register_collector("scrape_cache", scrape_cache_stats)
+telemetry.register_collector("downloads", download_stats)
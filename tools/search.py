@@ -2,11 +2,55 @@
 from __future__ import annotations
 
 import os
-from typing import Dict, List
-import requests
-from dotenv import load_dotenv
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
 
-load_dotenv()
+from tools import http_pool, runtime
+from tools import telemetry
+from tools.backends import Backend, CircuitBreaker, Scheduler, remaining
+from tools.deadline import Deadline
+from tools.diskcache import DiskCache
+from tools.runtime import load_env
+
+load_env()
+
+# Search cache knobs (read on each call).
+#   SEARCH_CACHE=0             bypass the cache
+#   SEARCH_CACHE_TTL=21600     freshness window in seconds
+#   SEARCH_CACHE_MAX_MB=32     LRU size bound for the on-disk store
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+
+class RateLimiter:
+    """Token bucket: at most `rate` acquisitions per second, bursts of up to `burst`."""
+
+    def __init__(self, rate: float, burst: int = 1) -> None:
+        self.rate = max(float(rate), 1e-6)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0:
+                    self._tokens -= 1.0
+                    return
+                wait = (1.0 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+# Shared by every thread calling a search backend (cache hits are not limited).
+#   SEARCH_RATE=4    backend requests per second
+#   SEARCH_BURST=4   requests allowed back to back
+_limiter = RateLimiter(float(os.getenv("SEARCH_RATE", "4")), int(os.getenv("SEARCH_BURST", "4")))
 
 
 def _serpapi_key() -> str:
@@ -18,21 +62,26 @@ class SearchError(RuntimeError):
     pass
 
 
+def _timeout() -> float:
+    return float(os.getenv("SEARCH_TIMEOUT_S", "25"))
+
+
 def _tavily(query: str, k: int) -> List[Dict[str, str]]:
     key = os.getenv("TAVILY_API_KEY", "")
     if not key:
         return []
+    _limiter.acquire()
 
     try:
-        r = requests.post(
-            "https://api.tavily.com/search",
+        r = http_pool.post(
+            os.getenv("TAVILY_URL", "https://api.tavily.com/search"),
             json={"api_key": key, "query": query, "max_results": k},
-            timeout=25,
+            timeout=remaining(_timeout()),
         )
         r.raise_for_status()
         data = r.json()
-    except Exception:
-        return []
+    except Exception as e:
+        raise SearchError(f"tavily: {type(e).__name__}: {e}") from e
 
     out: List[Dict[str, str]] = []
     for r in (data.get("results") or []):
@@ -50,14 +99,15 @@ def _serpapi(query: str, k: int) -> List[Dict[str, str]]:
     key = _serpapi_key()
     if not key:
         return []
+    _limiter.acquire()
 
     try:
         params = {"engine": "google", "q": query, "num": str(k), "api_key": key}
-        r = requests.get("https://serpapi.com/search", params=params, timeout=25)
+        r = http_pool.get(os.getenv("SERPAPI_URL", "https://serpapi.com/search"), params=params, timeout=remaining(_timeout()))
         r.raise_for_status()
         data = r.json()
-    except Exception:
-        return []
+    except Exception as e:
+        raise SearchError(f"serpapi: {type(e).__name__}: {e}") from e
 
     organic = data.get("organic_results") or []
     out: List[Dict[str, str]] = []
@@ -72,26 +122,135 @@ def _serpapi(query: str, k: int) -> List[Dict[str, str]]:
     return out
 
 
-def web_search(query: str, k: int = 6) -> List[Dict[str, str]]:
+def _strip_examples(items: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    return [it for it in items if it.get("url") and "example.com" not in it["url"]]
+
+
+# Backend scheduling (read once, when the first uncached search runs).
+#   SEARCH_MODE=hedge              fallback | hedge | race (see tools/backends.py)
+#   SEARCH_HEDGE_PCT=90            fire SerpAPI once Tavily is slower than its own p90 ...
+#   SEARCH_HEDGE_MIN_MS=500        ... but never sooner than this
+#   SEARCH_HEDGE_MAX_MS=4000       ... nor later than this (also the delay before there is history)
+#   SEARCH_BREAKER_FAILURES=3      consecutive errors that open a backend's circuit
+#   SEARCH_BREAKER_COOLDOWN_S=60   how long an open backend is skipped before one probe call
+#   SEARCH_TIMEOUT_S=25            per request, and the budget for one web_search()
+#   SEARCH_CALLERS=8               concurrent web_search() calls that can each have both backends in flight
+def _build_scheduler() -> Scheduler:
+    failures = int(os.getenv("SEARCH_BREAKER_FAILURES", "3"))
+    cooldown = float(os.getenv("SEARCH_BREAKER_COOLDOWN_S", "60"))
+    # Looked up at call time so tests can monkeypatch _tavily/_serpapi.
+    backends = [
+        Backend("tavily", lambda q, k: _strip_examples(_tavily(q, k)), CircuitBreaker(failures, cooldown)),
+        Backend("serpapi", lambda q, k: _strip_examples(_serpapi(q, k)), CircuitBreaker(failures, cooldown)),
+    ]
+    return Scheduler(
+        backends,
+        mode=os.getenv("SEARCH_MODE", "hedge").lower(),
+        hedge_pct=float(os.getenv("SEARCH_HEDGE_PCT", "90")),
+        hedge_min_ms=float(os.getenv("SEARCH_HEDGE_MIN_MS", "500")),
+        hedge_max_ms=float(os.getenv("SEARCH_HEDGE_MAX_MS", "4000")),
+        timeout_s=_timeout(),
+        callers=int(os.getenv("SEARCH_CALLERS", "8")),
+    )
+
+
+def _search_scheduler() -> Scheduler:
+    return runtime.shared("search.scheduler", _build_scheduler)
+
+
+def search_backend_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-backend health: breaker state, calls/ok/empty/errors/short_circuited/hedges/wins/expired, p50/p95 ms."""
+    scheduler = runtime.peek("search.scheduler")
+    return scheduler.stats() if scheduler is not None else {}
+
+
+def _backend_gauges() -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for name, st in search_backend_stats().items():
+        out[f"{name}_open"] = int(st["state"] != CircuitBreaker.CLOSED)
+        out.update({f"{name}_{k}": v for k, v in st.items() if k != "state"})
+    return out
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, drop punctuation and collapse whitespace: 'What is X?' == 'what is  x'."""
+    q = re.sub(r"[^\w\s]+", " ", (query or "").casefold())
+    return " ".join(q.split())
+
+
+def cache_enabled() -> bool:
+    return os.getenv("SEARCH_CACHE", "1").lower() not in ("0", "false", "no", "off")
+
+
+def _search_cache() -> DiskCache:
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                max_mb = float(os.getenv("SEARCH_CACHE_MAX_MB", "32"))
+                _cache = DiskCache("search", max_bytes=int(max_mb * 1024 * 1024))
+    return _cache
+
+
+def search_cache_stats() -> Dict[str, Any]:
+    if _cache is None and not cache_enabled():
+        return {"name": "search", "enabled": False}
+    out = _search_cache().stats()
+    out["enabled"] = cache_enabled()
+    return out
+
+
+def _cache_get(backend: str, query: str, k: int) -> Optional[List[Dict[str, str]]]:
+    # One entry per (backend, normalized query); an answer fetched with a
+    # larger k also serves any smaller k.
+    try:
+        hit = _search_cache().get(f"{backend}:{normalize_query(query)}")
+    except Exception:
+        return None
+    if not hit:
+        return None
+    entry, age = hit
+    if age > float(os.getenv("SEARCH_CACHE_TTL", "21600")) or int(entry.get("k", 0)) < k:
+        return None
+    return entry.get("items", [])[:k]
+
+
+def _cache_put(backend: str, query: str, k: int, items: List[Dict[str, str]]) -> None:
+    try:
+        _search_cache().set(f"{backend}:{normalize_query(query)}", {"k": k, "items": items})
+    except Exception:
+        pass
+
+
+@telemetry.traced("tool.web_search")
+def web_search(query: str, k: int = 6, deadline: Optional[Deadline] = None) -> List[Dict[str, str]]:
     """
     Public API used by nodes.web_search().
     Returns a list of {title, url, snippet}. Never raises; returns [] on failure.
-    Prefers Tavily; falls back to SerpAPI.
+    Prefers Tavily; SerpAPI is hedged in when Tavily is slow, and used
+    directly while Tavily's circuit is open (SEARCH_MODE, tools/backends.py).
+    Gives up (returns []) when `deadline` passes.
     """
     k = max(1, min(int(k or 6), 20))  # simple bounds
+    use_cache = cache_enabled()
 
-    def _strip_examples(items: List[Dict[str, str]]) -> List[Dict[str, str]]:
-        return [it for it in items if it.get("url") and "example.com" not in it["url"]]
+    # Any fresh cached answer beats a network round trip, whichever backend produced it
+    if use_cache:
+        for name in ("tavily", "serpapi"):
+            items = _cache_get(name, query, k)
+            if items:
+                return items
 
-    # Try Tavily (if key present)
-    items = _strip_examples(_tavily(query, k))
-    if items:
-        return items
+    if deadline is not None and deadline.expired():
+        return []
+    name, items = _search_scheduler().call(query, k, timeout_s=deadline.remaining() if deadline else None)
+    if name is None:
+        # No keys, both failed or both circuits open → [] (nodes handle this gracefully)
+        return []
+    if use_cache:
+        _cache_put(name, query, k, items)
+    return items
 
-    # Fallback: SerpAPI (if key present)
-    items = _strip_examples(_serpapi(query, k))
-    if items:
-        return items
 
-    # No keys or both failed → return [] (nodes handle this gracefully)
-    return []
+telemetry.register_collector("search_cache", search_cache_stats)
+telemetry.register_collector("search_backends", _backend_gauges)
@@ -0,0 +1,323 @@
+# tools/telemetry.py
+"""
+Lightweight tracing and metrics.
+
+  span(name, **attrs)    context manager timing a block (graph node, tool call)
+  traced(name)           decorator form; generators are timed until exhausted
+  count(name, n, **lbl)  monotonically increasing counter (bytes, tokens, ...)
+  log(node, msg, **kv)   the "[node] msg" console line, also exported as an event
+
+Everything is off unless TELEMETRY=1 or TELEMETRY_JSONL=<path> is set (or
+configure() is called); when off, span/traced/count cost one flag check and
+log() only prints. Finished spans, counters and log events go to exporters:
+
+  JsonlExporter(path)    one JSON object per line (TELEMETRY_JSONL)
+  registry               in-process aggregate, rendered by prometheus_text()
+                         (served by server.py at /metrics)
+
+Set TELEMETRY_QUIET=1 to silence the console lines while still exporting them.
+"""
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_enabled = False
+_quiet = False
+_exporters: List[Callable[[Dict[str, Any]], None]] = []
+_parent: contextvars.ContextVar = contextvars.ContextVar("telemetry_span", default=None)
+_run: contextvars.ContextVar = contextvars.ContextVar("telemetry_run", default=None)
+_ids = iter(range(1, 1 << 62))
+_ids_lock = threading.Lock()
+
+
+def _next_id() -> int:
+    with _ids_lock:
+        return next(_ids)
+
+
+class JsonlExporter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        parent = os.path.dirname(os.path.abspath(path))
+        os.makedirs(parent, exist_ok=True)
+        self._fh = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._fh.write(line + "\n")
+            self._fh.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._fh.close()
+
+
+class Registry:
+    """Aggregates spans (duration histograms) and counters for Prometheus."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self.spans: Dict[Tuple[str, bool], List[float]] = {}  # (name, error) -> [count, sum, *buckets]
+        self.collectors: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+    def __call__(self, record: Dict[str, Any]) -> None:
+        kind = record.get("kind")
+        if kind == "span":
+            key = (record["name"], bool(record.get("error")))
+            secs = record["ms"] / 1000.0
+            with self._lock:
+                agg = self.spans.setdefault(key, [0.0, 0.0] + [0.0] * len(_BUCKETS))
+                agg[0] += 1
+                agg[1] += secs
+                for i, b in enumerate(_BUCKETS):
+                    if secs <= b:
+                        agg[2 + i] += 1
+        elif kind == "count":
+            key = (record["name"], tuple(sorted((k, str(v)) for k, v in (record.get("labels") or {}).items())))
+            with self._lock:
+                self.counters[key] = self.counters.get(key, 0.0) + record["value"]
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.spans.clear()
+
+
+registry = Registry()
+
+
+def _metric(name: str) -> str:
+    return "deep_research_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _labels(pairs: Any) -> str:
+    items = [f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs]
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def prometheus_text() -> str:
+    """Prometheus text exposition of the registry plus registered collectors (cache stats)."""
+    lines: List[str] = []
+    with registry._lock:
+        spans = {k: list(v) for k, v in registry.spans.items()}
+        counters = dict(registry.counters)
+        collectors = dict(registry.collectors)
+    if spans:
+        lines.append("# TYPE deep_research_span_seconds histogram")
+    for (name, error), agg in sorted(spans.items()):
+        base = [("span", name), ("error", str(error).lower())]
+        for b, n in zip(_BUCKETS, agg[2:]):
+            lines.append(f"deep_research_span_seconds_bucket{_labels(base + [('le', b)])} {n:g}")
+        lines.append(f"deep_research_span_seconds_bucket{_labels(base + [('le', '+Inf')])} {agg[0]:g}")
+        lines.append(f"deep_research_span_seconds_sum{_labels(base)} {agg[1]:.6f}")
+        lines.append(f"deep_research_span_seconds_count{_labels(base)} {agg[0]:g}")
+    typed = set()
+    for (name, labels), value in sorted(counters.items()):
+        metric = _metric(name)
+        if metric not in typed:
+            lines.append(f"# TYPE {metric} counter")
+            typed.add(metric)
+        lines.append(f"{metric}{_labels(labels)} {value:g}")
+    for cname, fn in sorted(collectors.items()):
+        try:
+            stats = fn() or {}
+        except Exception:
+            continue
+        for key, value in sorted(stats.items()):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = _metric(f"{cname}_{key}")
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value:g}")
+    return "\n".join(lines) + "\n"
+
+
+def register_collector(name: str, fn: Callable[[], Dict[str, Any]]) -> None:
+    """Expose a stats() dict (numeric values) as gauges named <name>_<key>."""
+    registry.collectors[name] = fn
+
+
+def configure(enabled: Optional[bool] = None, jsonl: Optional[str] = None, quiet: Optional[bool] = None) -> None:
+    global _enabled, _quiet
+    if jsonl:
+        for exp in [e for e in _exporters if isinstance(e, JsonlExporter)]:
+            _exporters.remove(exp)
+            exp.close()
+        _exporters.append(JsonlExporter(jsonl))
+        enabled = True if enabled is None else enabled
+    if registry not in _exporters:
+        _exporters.append(registry)
+    if enabled is not None:
+        _enabled = bool(enabled)
+    if quiet is not None:
+        _quiet = bool(quiet)
+
+
+def add_exporter(fn: Callable[[Dict[str, Any]], None]) -> None:
+    """Receive every span/count/log record (called inline; keep it cheap)."""
+    _exporters.append(fn)
+
+
+def remove_exporter(fn: Callable[[Dict[str, Any]], None]) -> None:
+    if fn in _exporters:
+        _exporters.remove(fn)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def _export(record: Dict[str, Any]) -> None:
+    for exp in list(_exporters):
+        try:
+            exp(record)
+        except Exception:
+            pass  # telemetry must never break a run
+
+
+class _Span:
+    __slots__ = ("name", "attrs", "id", "parent", "start", "wall", "token")
+
+    def __init__(self, name: str, attrs: Dict[str, Any]) -> None:
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "_Span":
+        self.id = _next_id()
+        self.parent = _parent.get()
+        self.token = _parent.set(self.id)
+        self.wall = time.time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        ms = (time.perf_counter() - self.start) * 1000.0
+        try:
+            _parent.reset(self.token)
+        except ValueError:
+            pass  # generator span resumed in another context
+        record = {
+            "kind": "span",
+            "name": self.name,
+            "id": self.id,
+            "parent": self.parent,
+            "run": _run.get(),
+            "ts": self.wall,
+            "ms": round(ms, 3),
+            "thread": threading.current_thread().name,
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        if self.attrs:
+            record["attrs"] = self.attrs
+        _export(record)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs: Any) -> Any:
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(name, attrs)
+
+
+def traced(name: str) -> Callable[[Callable], Callable]:
+    def deco(fn: Callable) -> Callable:
+        if inspect.isgeneratorfunction(fn):
+
+            @functools.wraps(fn)
+            def gen_wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not _enabled:
+                    return (yield from fn(*args, **kwargs))
+                with _Span(name, {}):
+                    return (yield from fn(*args, **kwargs))
+
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Span(name, {}):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return deco
+
+
+def count(name: str, value: float = 1, **labels: Any) -> None:
+    if not _enabled or not value:
+        return
+    _export({"kind": "count", "name": name, "value": value, "labels": labels, "run": _run.get(), "ts": time.time()})
+
+
+def log(node: str, msg: str, **fields: Any) -> None:
+    if not _quiet:
+        print(f"[{node}] {msg}")
+    if _enabled:
+        _export({"kind": "log", "node": node, "msg": msg, "run": _run.get(), "ts": time.time(), **fields})
+
+
+def bind(fn: Callable) -> Callable:
+    """Carry the caller's span/run context into pool threads (identity when disabled)."""
+    if not _enabled:
+        return fn
+    ctx = contextvars.copy_context()
+
+    @functools.wraps(fn)
+    def run_in_context(*args: Any, **kwargs: Any) -> Any:
+        return ctx.copy().run(fn, *args, **kwargs)
+
+    return run_in_context
+
+
+def set_run(run_id: Optional[str]) -> contextvars.Token:
+    """Tag records from this thread/context with a run id (see run_scope to undo it)."""
+    return _run.set(run_id)
+
+
+@contextlib.contextmanager
+def run_scope(run_id: Optional[str]) -> Iterator[None]:
+    """set_run for the duration of a block; for worker threads that run one job after another."""
+    token = _run.set(run_id)
+    try:
+        yield
+    finally:
+        _run.reset(token)
+
+
+if os.getenv("TELEMETRY", "0").lower() not in ("0", "false", "no", "off", "") or os.getenv("TELEMETRY_JSONL"):
+    configure(enabled=True, jsonl=os.getenv("TELEMETRY_JSONL") or None)
+if os.getenv("TELEMETRY_QUIET", "0").lower() not in ("0", "false", "no", "off", ""):
+    _quiet = True
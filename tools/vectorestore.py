@@ -1,51 +1,348 @@
 # tools/vectorstore.py
 from __future__ import annotations
 
+import json
+import math
 import os
-from typing import Iterable, List, Tuple
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
 
 import numpy as np
-from dotenv import load_dotenv
-from openai import OpenAI
 
-load_dotenv()
-_EMBED_MODEL = os.getenv("EMBED_MODEL", "text-embedding-3-small")
+from tools import telemetry
+from tools.runtime import load_env
+from tools.embeddings import EmbeddingBackend, EmbeddingPipeline, get_backend
+
+load_env()
+
+# Index backends: "numpy" (exact, in-process) or, with faiss-cpu installed,
+# "flat" (exact), "ivf" (inverted lists) or "hnsw" (graph). VECTOR_INDEX sets the default.
+INDEX_KINDS = ("numpy", "flat", "ivf", "hnsw")
+
+_VECTORS_FILE = "vectors.npy"
+_ROWS_FILE = "rows.sqlite"
+_MANIFEST_FILE = "store.json"
+_FAISS_FILE = "index.faiss"
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    m = np.asarray(m, dtype=np.float32)
+    norms = np.linalg.norm(m, axis=-1, keepdims=True)
+    return m / np.maximum(norms, 1e-8)
+
+
+def _topk_rows(sims: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest entries of each row, best first (O(n) select + O(k log k) sort)."""
+    n = sims.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty(sims.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-sims, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), sims.shape[:-1] + (n,))
+    order = np.argsort(-np.take_along_axis(sims, part, axis=-1), axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+class _Column:
+    """
+    List-like view of one column of a saved store's rows.sqlite. Rows are read
+    on access, so opening a large store costs no RAM; rows added after load
+    are kept in memory until the next save().
+    """
+
+    def __init__(self, db: sqlite3.Connection, lock: threading.Lock, column: str, count: int, decode: Any = None) -> None:
+        self._db, self._lock, self._column, self._count = db, lock, column, count
+        self._decode = decode or (lambda v: v)
+        self._tail: List[Any] = []
+
+    def __len__(self) -> int:
+        return self._count + len(self._tail)
+
+    def __getitem__(self, i: int) -> Any:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        if i >= self._count:
+            return self._tail[i - self._count]
+        with self._lock:
+            row = self._db.execute(f"SELECT {self._column} FROM rows WHERE id = ?", (i,)).fetchone()
+        return self._decode(row[0])
+
+    def __iter__(self) -> Iterator[Any]:
+        with self._lock:
+            rows = self._db.execute(f"SELECT {self._column} FROM rows ORDER BY id").fetchall()
+        for (v,) in rows:
+            yield self._decode(v)
+        yield from self._tail
+
+    def extend(self, items: Iterable[Any]) -> None:
+        self._tail.extend(items)
+
+    def append(self, item: Any) -> None:
+        self._tail.append(item)
+
+
+class _FaissIndex:
+    """Inner-product FAISS index over unit vectors (so scores are cosines)."""
+
+    def __init__(self, kind: str, dim: int) -> None:
+        import faiss  # optional dependency
+
+        self.faiss, self.kind, self.dim = faiss, kind, dim
+        self.index: Any = None
+        self.ntotal = 0
+        self.trained_on = 0
+
+    def build(self, vectors: np.ndarray) -> None:
+        faiss, n = self.faiss, len(vectors)
+        if self.kind == "hnsw":
+            index = faiss.IndexHNSWFlat(self.dim, int(os.getenv("FAISS_HNSW_M", "32")), faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efSearch = int(os.getenv("FAISS_EF_SEARCH", "64"))
+        elif self.kind == "ivf" and n >= 256:
+            nlist = max(1, min(65536, int(4 * math.sqrt(n)), n // 39))  # faiss wants >= 39 points per centroid
+            index = faiss.IndexIVFFlat(faiss.IndexFlatIP(self.dim), self.dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            sample = vectors if n <= 50 * nlist else vectors[np.random.default_rng(0).choice(n, 50 * nlist, replace=False)]
+            index.train(np.ascontiguousarray(sample))
+            index.nprobe = min(nlist, int(os.getenv("FAISS_NPROBE", "16")))
+            self.trained_on = n
+        else:  # "flat", or an IVF store still too small to train
+            index = faiss.IndexFlatIP(self.dim)
+        self.index, self.ntotal = index, 0
+        self.add(vectors)
+
+    def add(self, vectors: np.ndarray) -> None:
+        if len(vectors):
+            self.index.add(np.ascontiguousarray(vectors, dtype=np.float32))
+            self.ntotal += len(vectors)
+
+    def stale(self, n: int) -> bool:
+        # IVF centroids are retrained once the store has grown 4x since training
+        # (or first reaches a trainable size).
+        if self.index is None:
+            return True
+        if self.kind == "ivf":
+            return (self.trained_on == 0 and n >= 256) or (self.trained_on and n > 4 * self.trained_on)
+        return False
+
+    def search(self, Q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self.index.search(np.ascontiguousarray(Q, dtype=np.float32), k)
 
 
 class VectorStore:
     """
-    Tiny in-memory vector store using OpenAI embeddings.
+    Tiny vector store; embeds with OpenAI by default, or any
+    tools.embeddings backend (backend="hashing" works fully offline).
+    Rows are stored unit-normalised (float32) in a buffer that doubles its
+    capacity when full, so inserts are amortised O(1) and a query is one
+    matrix-vector product plus an argpartition top-k. The dimension comes
+    from the first batch of embeddings unless given.
+
+    save()/load() persist to a directory: vectors as a .npy that load()
+    memory-maps, texts and metadata in a SQLite sidecar read on demand.
+    With faiss-cpu installed, index="flat" | "ivf" | "hnsw" serves
+    similarity_search through FAISS instead of NumPy.
     """
 
-    def __init__(self) -> None:
-        self.client = OpenAI()
+    def __init__(
+        self,
+        dim: Optional[int] = None,
+        index: Optional[str] = None,
+        backend: EmbeddingBackend | str | None = None,
+    ) -> None:
+        self.backend = backend if isinstance(backend, EmbeddingBackend) else get_backend(backend)
         self.texts: List[str] = []
         self.metas: List[dict] = []
-        self.vectors: np.ndarray = np.empty((0, 1536), dtype=np.float32)
+        self._buf: np.ndarray = np.empty((0, dim or 0), dtype=np.float32)
+        self._n = 0
+        self.index_kind = self._check_index(index or os.getenv("VECTOR_INDEX", "numpy"))
+        self._faiss: Optional[_FaissIndex] = None
+        self.embedder = EmbeddingPipeline(self._embed_batch, model=self.backend.model)
+
+    @staticmethod
+    def _check_index(kind: str) -> str:
+        kind = (kind or "numpy").lower()
+        if kind not in INDEX_KINDS:
+            raise ValueError(f"unknown index kind {kind!r}; expected one of {INDEX_KINDS}")
+        if kind != "numpy":
+            try:
+                import faiss  # noqa: F401
+            except ImportError:
+                telemetry.log("vectorstore", f"faiss-cpu not installed; index={kind!r} falls back to numpy")
+                return "numpy"
+        return kind
 
+    @property
+    def dim(self) -> int:
+        return int(self._buf.shape[1])
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Unit-normalised embeddings, one row per stored text (a view, not a copy)."""
+        return self._buf[: self._n]
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _reserve(self, extra: int) -> None:
+        need = self._n + extra
+        if need <= self._buf.shape[0]:
+            return
+        cap = max(need, 2 * self._buf.shape[0], 64)
+        buf = np.empty((cap, self._buf.shape[1]), dtype=np.float32)
+        buf[: self._n] = self._buf[: self._n]  # also copies a memory-mapped store into RAM
+        self._buf = buf
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        return self.backend.embed(texts)
+
+    @telemetry.traced("tool.embed")
     def _embed(self, texts: Iterable[str]) -> np.ndarray:
-        texts = list(texts)
-        resp = self.client.embeddings.create(model=_EMBED_MODEL, input=texts)
-        return np.array([d.embedding for d in resp.data], dtype=np.float32)
+        if not self.backend.cacheable:
+            return self.backend.embed(list(texts))
+        # deduplicated, cached, batched and concurrent; see tools/embeddings.py
+        return self.embedder.embed(list(texts))
+
+    def add_vectors(self, vecs: np.ndarray, texts: List[str], metadatas: List[dict] | None = None) -> None:
+        vecs = _normalize(np.atleast_2d(vecs))
+        if vecs.shape[1] != self._buf.shape[1]:
+            if self._n:
+                raise ValueError(f"embedding dim {vecs.shape[1]} != store dim {self._buf.shape[1]}")
+            self._buf = np.empty((0, vecs.shape[1]), dtype=np.float32)
+            self._faiss = None
+        self._reserve(len(vecs))
+        self._buf[self._n : self._n + len(vecs)] = vecs
+        self._n += len(vecs)
+        self.texts.extend(texts)
+        self.metas.extend(metadatas or [{} for _ in texts])
 
     def add(self, texts: List[str], metadatas: List[dict] | None = None) -> None:
         if not texts:
             return
-        vecs = self._embed(texts)
-        self.vectors = vecs if self.vectors.size == 0 else np.vstack([self.vectors, vecs])
-        self.texts.extend(texts)
-        self.metas.extend(metadatas or [{} for _ in texts])
+        self.add_vectors(self._embed(texts), texts, metadatas)
+
+    def _index(self) -> Optional[_FaissIndex]:
+        """The FAISS index, built or topped up lazily so bulk adds stay cheap."""
+        if self.index_kind == "numpy" or self._n == 0:
+            return None
+        if self._faiss is None or self._faiss.stale(self._n):
+            self._faiss = self._faiss or _FaissIndex(self.index_kind, self.dim)
+            self._faiss.build(self.vectors)
+        elif self._faiss.ntotal < self._n:
+            self._faiss.add(self.vectors[self._faiss.ntotal :])
+        return self._faiss
+
+    def _search_matrix(self, Q: np.ndarray, k: int) -> List[List[Tuple[int, float]]]:
+        index = self._index()
+        if index is not None:
+            D, I = index.search(Q, min(k, self._n))
+            return [[(int(i), float(d)) for i, d in zip(ri, rd) if i >= 0] for ri, rd in zip(I, D)]
+        sims = Q @ self.vectors.T
+        idx = _topk_rows(sims, k)
+        return [[(int(i), float(sims[r, i])) for i in idx[r]] for r in range(len(Q))]
 
     def _cosine_topk(self, q: np.ndarray, k: int) -> List[Tuple[int, float]]:
-        if self.vectors.size == 0:
+        if self._n == 0:
             return []
-        A = self.vectors / (np.linalg.norm(self.vectors, axis=1, keepdims=True) + 1e-8)
-        qn = q / (np.linalg.norm(q) + 1e-8)
-        sims = A @ qn
-        idx = np.argsort(-sims)[:k]
-        return [(int(i), float(sims[i])) for i in idx]
+        return self._search_matrix(_normalize(np.atleast_2d(q)), k)[0]
+
+    def _hits(self, hits: List[Tuple[int, float]]) -> List[dict]:
+        return [{"text": self.texts[i], "metadata": self.metas[i], "score": s} for i, s in hits]
 
     def similarity_search(self, query: str, k: int = 5) -> List[dict]:
         qv = self._embed([query])[0]
-        hits = self._cosine_topk(qv, k)
-        return [{"text": self.texts[i], "metadata": self.metas[i], "score": s} for i, s in hits]
+        return self._hits(self._cosine_topk(qv, k))
+
+    def similarity_search_many(self, queries: List[str], k: int = 5) -> List[List[dict]]:
+        """Answer several queries with one embedding call and one matrix multiply."""
+        if not queries:
+            return []
+        if self._n == 0:
+            return [[] for _ in queries]
+        return [self._hits(h) for h in self._search_matrix(_normalize(self._embed(queries)), k)]
+
+    # ---- persistence -------------------------------------------------------
+
+    def save(self, path: str | Path) -> Path:
+        """Write vectors.npy, rows.sqlite, store.json (and index.faiss) under `path`."""
+        root = Path(path)
+        root.mkdir(parents=True, exist_ok=True)
+
+        tmp = root / (_VECTORS_FILE + ".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors))
+        os.replace(tmp, root / _VECTORS_FILE)
+
+        tmp = root / (_ROWS_FILE + ".tmp")
+        tmp.unlink(missing_ok=True)
+        db = sqlite3.connect(str(tmp))
+        db.execute("CREATE TABLE rows (id INTEGER PRIMARY KEY, text TEXT NOT NULL, meta TEXT NOT NULL)")
+        db.executemany(
+            "INSERT INTO rows (id, text, meta) VALUES (?, ?, ?)",
+            ((i, t, json.dumps(m, ensure_ascii=False)) for i, (t, m) in enumerate(zip(self.texts, self.metas))),
+        )
+        db.commit()
+        db.close()
+        os.replace(tmp, root / _ROWS_FILE)
+
+        index = self._index()
+        if index is not None:
+            index.faiss.write_index(index.index, str(root / _FAISS_FILE))
+        else:
+            (root / _FAISS_FILE).unlink(missing_ok=True)
+
+        manifest = {
+            "version": 1,
+            "dim": self.dim,
+            "count": self._n,
+            "embed_backend": self.backend.name,
+            "embed_model": self.backend.model,
+            "index": self.index_kind,
+        }
+        (root / _MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        return root
+
+    @classmethod
+    def load(
+        cls,
+        path: str | Path,
+        index: Optional[str] = None,
+        mmap: bool = True,
+        backend: EmbeddingBackend | str | None = None,
+    ) -> "VectorStore":
+        """
+        Open a saved store. With mmap=True vectors stay on disk until touched.
+        Queries are embedded with the backend and model the store was built
+        with unless another is given; ValueError if its dimension differs.
+        """
+        root = Path(path)
+        manifest = json.loads((root / _MANIFEST_FILE).read_text(encoding="utf-8"))
+        dim = int(manifest["dim"])
+        if not isinstance(backend, EmbeddingBackend):
+            if backend is None:
+                backend = get_backend(manifest.get("embed_backend"), model=manifest.get("embed_model"), dim=dim)
+            else:
+                backend = get_backend(backend, dim=dim)
+        if backend.dim is not None and backend.dim != dim:
+            raise ValueError(f"{backend.model} embeds into {backend.dim} dims, the store at {root} has {dim}")
+        store = cls(dim=dim, index=index or manifest.get("index"), backend=backend)
+        vecs = np.load(root / _VECTORS_FILE, mmap_mode="r" if mmap else None)
+        store._buf, store._n = vecs, int(vecs.shape[0])
+
+        db = sqlite3.connect(str(root / _ROWS_FILE), check_same_thread=False)
+        lock = threading.Lock()
+        store.texts = _Column(db, lock, "text", store._n)  # type: ignore[assignment]
+        store.metas = _Column(db, lock, "meta", store._n, decode=json.loads)  # type: ignore[assignment]
+
+        faiss_file = root / _FAISS_FILE
+        if store.index_kind == manifest.get("index") and store.index_kind != "numpy" and faiss_file.exists():
+            fi = _FaissIndex(store.index_kind, store.dim)
+            fi.index = fi.faiss.read_index(str(faiss_file))
+            fi.ntotal = int(fi.index.ntotal)
+            fi.trained_on = fi.ntotal if store.index_kind == "ivf" and fi.ntotal >= 256 else 0
+            store._faiss = fi
+        return store
@@ -3,29 +3,25 @@
 
 from __future__ import annotations
 
+from typing import Iterator
+
 from tools.brotli_patch import *   
 
 from tools.env_bootstrap import *  
 import gradio as gr
-from dotenv import load_dotenv
 
-from agent.graph import app
+from agent.graph import app, stream_events
 from agent.state import AgentState
 
-from agent.graph import build_app
-app = build_app()
-
-
-load_dotenv()
-
 STYLES = """
 #log {white-space: pre-wrap; font-family: ui-monospace, SFMono-Regular, Menlo, Monaco, Consolas, "Liberation Mono", "Courier New", monospace;}
 """
 
-def run(query: str, depth: str) -> str:
+def run(query: str, depth: str) -> Iterator[str]:
     query = (query or "").strip()
     if not query:
-        return "⚠️ Please enter a research question."
+        yield "⚠️ Please enter a research question."
+        return
 
     state: AgentState = {
         "query": query,
@@ -39,8 +35,20 @@ def run(query: str, depth: str) -> str:
         "draft": None,
         "quality": {"score": 0, "iterations": 0},
     }
-    out = app.invoke(state)
-    return out.get("draft", "❌ No draft produced.")
+    header = f"# Draft\n\n**Question.** {query}\n\n"
+    progress, body, out = [], "", {}
+    for ev in stream_events(state, graph=app):
+        kind = ev.get("type")
+        if kind == "stage":
+            progress.append(f"- `{ev['stage']}` {ev['status']}")
+            if not body:
+                yield header + "\n".join(progress)
+        elif kind == "token":
+            body += ev["text"]
+            yield header + body
+        elif kind == "final":
+            out = ev["state"]
+    yield out.get("draft") or "❌ No draft produced."
 
 with gr.Blocks(css=STYLES, title="Deep Research Agent") as demo:
     gr.Markdown("## 🔎 Deep Research Agent")